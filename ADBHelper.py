@@ -1,4 +1,5 @@
-import os, time
+import os
+import Clock, Trace
 
 # 获取设备列表，每一个为deviceID
 def getDevicesList():
@@ -17,32 +18,55 @@ def killADBServer():
     os.system("adb kill-server")
 
 # 设备屏幕截图，需给定did和本机截图保存路径
+# 追踪区间screencap包含adb进程启动和设备上的编码，pull包含传输
 def screenCapture(deviceID, capPath):
     a = "adb -s " + deviceID + " shell screencap -p sdcard/adb_screenCap.png"
-    b = "adb pull sdcard/adb_screenCap.png " + capPath
-    for row in [a, b]:
-        time.sleep(0.1)
-        os.system(row)
+    b = "adb -s " + deviceID + " pull sdcard/adb_screenCap.png " + capPath
+    for name, row in [("adb.screencap", a), ("adb.pull", b)]:
+        Clock.sleep(0.1)
+        with Trace.span(name, "capture", deviceID):
+            os.system(row)
     if os.path.exists(capPath) == True:
         return True
     else:
         return False
 
+# 获取设备屏幕分辨率，返回(w, h)，设置过分辨率覆盖(Override size)时以覆盖值为准
+def getScreenSize(deviceID):
+    content = os.popen("adb -s " + deviceID + " shell wm size").read()
+    size = None
+    for row in content.split('\n'):
+        if "size:" in row:
+            size = row.split("size:")[1].strip()
+    if size is None:
+        return None
+    w, h = size.split('x')
+    return (int(w), int(h))
+
 # 模拟点击屏幕，参数pos为目标坐标(x, y)
 def touch(deviceID, pos):
     x, y = pos
     a = "adb -s " + deviceID + " shell input touchscreen tap {0} {1}".format(x, y)
-    os.system(a)
+    with Trace.span("adb.tap", "input", deviceID):
+        os.system(a)
 
 # 模拟滑动屏幕，posStart为起始坐标(x, y)，posStop为终点坐标(x, y)，time为滑动时间
 def slide(deviceID, posStart, posStop, time):
     x1, y1 = posStart
     x2, y2 = posStop
     a = "adb -s " + deviceID + " shell input swipe {0} {1} {2} {3} {4}".format(x1, y1, x2, y2, time)
-    os.system(a)
+    with Trace.span("adb.swipe", "input", deviceID):
+        os.system(a)
 
 # 模拟长按屏幕，参数pos为目标坐标(x, y)，time为长按时间
 def longTouch(deviceID, pos, time):
     x, y = pos
     a = "adb -s " + deviceID + " shell input swipe {0} {1} {2} {3} {4}".format(x, y, x, y, time)
-    os.system(a)
+    with Trace.span("adb.longTouch", "input", deviceID):
+        os.system(a)
+
+# 模拟按键，参数key为按键码或按键名（如4或KEYCODE_BACK）
+def keyevent(deviceID, key):
+    a = "adb -s " + deviceID + " shell input keyevent " + str(key)
+    with Trace.span("adb.keyevent", "input", deviceID):
+        os.system(a)
@@ -4,6 +4,7 @@
 import RaphaelScriptHelper as gamer
 import multiprocessing
 import ResourceDictionary as rd
+import ResourceScaler
 import settings
 from enum import Enum
 
@@ -156,32 +157,47 @@ gamer.deviceType = 1
 # 全局标志位 勿改动
 isFightLose = False
 
-#屏幕分辨率 勿改动 请与此保持对齐
-screen_size = (2340, 1080)
+# 资源按 rd.resolution 截取，运行前由 load_resources 换算到设备实际分辨率
+screen_size = rd.resolution
+
+#按设备实际分辨率换算资源（首次在新分辨率上运行时生成缓存），只在主进程中调用，避免战斗子进程导入本脚本时重复查询设备
+def load_resources(resources=None):
+    global rd, screen_size
+    if resources is None:
+        resources = ResourceScaler.scaleResources(rd, ResourceScaler.getDeviceSize(gamer.deviceType, gamer.deviceID))
+    rd = resources
+    screen_size = rd.resolution
+
+#在子进程中使用主进程换算好的资源执行战斗
+def run_fight(target, resources):
+    load_resources(resources)
+    target()
 
 #战斗界面干员部署通用方法 三个参数分别是 干员 站位 朝向(0-3分别代表上下左右)
 def fight_agent_arrange(agent, pos, direction):
     screen_w, screen_h = screen_size
     x, y = pos
     shift = settings.touchPosRange
+    # 拖动方向上的距离按原分辨率的400像素换算
+    distance = rd.scaleLength(400)
 
     if direction == Direction.UP:
-        _y = y - 400
+        _y = y - distance
         if (_y < shift):
             _y = shift
         slide_final_pos = (x, _y)
     elif direction == Direction.DOWN:
-        _y = y + 400
+        _y = y + distance
         if (_y > screen_h - shift):
             _y = screen_h - shift
         slide_final_pos = (x, _y)
     elif direction == Direction.LEFT:
-        _x = x - 400
+        _x = x - distance
         if (_x < shift):
             _x = shift
         slide_final_pos = (_x, y)
     elif direction == Direction.RIGHT:
-        _x = x + 400
+        _x = x + distance
         if (_x > screen_w - shift):
             _x = screen_w - shift
         slide_final_pos = (_x, y)
@@ -249,25 +265,25 @@ def fight():
     isFightLose = False
     if gamer.find_pic_touch(rd.fight_lipaoxiaodui):
         process_before_fight()
-        t = multiprocessing.Process(target=fight_li_pao_xiao_dui)
+        t = multiprocessing.Process(target=run_fight, args=(fight_li_pao_xiao_dui, rd))
         t.start()
         gamer.delay(fight_li_pao_xiao_dui_duration)
         t.terminate()
     elif gamer.find_pic_touch(rd.fight_yuchongweiban):
         process_before_fight()
-        t = multiprocessing.Process(target=fight_yu_chong_wei_ban)
+        t = multiprocessing.Process(target=run_fight, args=(fight_yu_chong_wei_ban, rd))
         t.start()
         gamer.delay(fight_yu_chong_wei_ban_duration)
         t.terminate()
     elif gamer.find_pic_touch(rd.fight_xunshouxiaowu):
         process_before_fight()
-        t = multiprocessing.Process(target=fight_xun_shou_xiao_wu)
+        t = multiprocessing.Process(target=run_fight, args=(fight_xun_shou_xiao_wu, rd))
         t.start()
         gamer.delay(fight_xun_shou_xiao_wu_duration)
         t.terminate()
     elif gamer.find_pic_touch(rd.fight_yiwai):
         process_before_fight()
-        t = multiprocessing.Process(target=fight_yi_wai)
+        t = multiprocessing.Process(target=run_fight, args=(fight_yi_wai, rd))
         t.start()
         gamer.delay(fight_yi_wai_duration)
         t.terminate()
@@ -375,70 +391,72 @@ def exit_game():
     gamer.find_pic_touch(rd.giveup_confirm)
     skip_ending()
 
-# 干员编队部分，这里只要分辨率不变，操作是固定的
+# 干员编队部分，操作是固定的，坐标按资源分辨率换算
 def gan_yuan_bian_dui():
-    gamer.touch((2076,1026))
+    gamer.touch(rd.scale((2076,1026)))
     gamer.random_delay()
-    gamer.touch((1846, 60))
+    gamer.touch(rd.scale((1846, 60)))
     gamer.random_delay()
-    gamer.touch((987,242))
+    gamer.touch(rd.scale((987,242)))
     gamer.random_delay()
-    gamer.touch((987, 446))
+    gamer.touch(rd.scale((987, 446)))
     gamer.random_delay()
-    gamer.touch((987, 656))
+    gamer.touch(rd.scale((987, 656)))
     gamer.random_delay()
-    gamer.touch((2078, 1022))
+    gamer.touch(rd.scale((2078, 1022)))
     gamer.random_delay()
-    gamer.touch((195, 52))
+    gamer.touch(rd.scale((195, 52)))
 
 
 
 # 脚本从这里开始运行
-gamer.deviceType = 1
-
-while True:
-    if gamer.find_pic_touch(rd.rg_start):
-        gamer.random_delay()
-        init_front()
-        gamer.random_delay()
-        if gamer.find_pic_touch(rd.enter_game):
-            gamer.delay(5)
-            gan_yuan_bian_dui()
-
-            # 第一层只有四关，且第一关只能是战斗节点
-            # 1
-            fight()
+if __name__ == "__main__":
+    gamer.deviceType = 1
+    load_resources()
 
-            # TODO:可以考虑更智能的寻路算法，当前只支持按照固定优先级
-            # 2
-            gamer.random_delay()
-            if buqieryu() is False:
-                if fight() is False:
-                    if mujianyuxing() is False:
-                        exit_game()
-                        continue
-            if isFightLose:
-                continue
-
-            # 中场滑屏到后面，避免重复识别
-            gamer.slide(rd.bottom_slide_left)
-
-            # 3
+    while True:
+        if gamer.find_pic_touch(rd.rg_start):
             gamer.random_delay()
-            if buqieryu() is False:
-                if fight() is False:
-                    if mujianyuxing() is False:
-                        exit_game()
-                        continue
-
-            if isFightLose:
-                continue
-
-            # 第四关只能是诡异行商
-            # 4
-            guiyixingshang()
-            gamer.delay(5)
+            init_front()
             gamer.random_delay()
-            exit_game()
-    else:
-        break
+            if gamer.find_pic_touch(rd.enter_game):
+                gamer.delay(5)
+                gan_yuan_bian_dui()
+
+                # 第一层只有四关，且第一关只能是战斗节点
+                # 1
+                fight()
+
+                # TODO:可以考虑更智能的寻路算法，当前只支持按照固定优先级
+                # 2
+                gamer.random_delay()
+                if buqieryu() is False:
+                    if fight() is False:
+                        if mujianyuxing() is False:
+                            exit_game()
+                            continue
+                if isFightLose:
+                    continue
+
+                # 中场滑屏到后面，避免重复识别
+                gamer.slide(rd.bottom_slide_left)
+
+                # 3
+                gamer.random_delay()
+                if buqieryu() is False:
+                    if fight() is False:
+                        if mujianyuxing() is False:
+                            exit_game()
+                            continue
+
+                if isFightLose:
+                    continue
+
+                # 第四关只能是诡异行商
+                # 4
+                guiyixingshang()
+                gamer.delay(5)
+                gamer.random_delay()
+                exit_game()
+        else:
+            break
@@ -1,6 +1,6 @@
 # 请将此脚本、img文件夹和ResourceDictionary.py文件复制到项目根目录下再运行！
 
-import ADBHelper, RaphaelScriptHelper, ResourceDictionary
+import ADBHelper, RaphaelScriptHelper, ResourceDictionary, ResourceScaler
 
 deviceList = ADBHelper.getDevicesList()
 i = 0
@@ -13,6 +13,7 @@ delayTime = input("请输入关卡所耗时间（单位：秒）\n")
 
 RaphaelScriptHelper.deviceType = 1
 RaphaelScriptHelper.deviceID = deviceList[int(input_i)]
+ResourceDictionary = ResourceScaler.scaleResources(ResourceDictionary, ResourceScaler.getDeviceSize(1, RaphaelScriptHelper.deviceID))
 
 for i in range(0,100):
     j = 0
@@ -1,3 +1,6 @@
+#截取资源时的屏幕分辨率，其他分辨率的设备运行时会按此自动换算模板和坐标（见ResourceScaler）
+resolution = (2340, 1080)
+
 start = "./img/start.png"
 start1 = "./img/start1.png"
 finish = "./img/finish.png"
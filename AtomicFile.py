@@ -0,0 +1,25 @@
+import os, tempfile, contextlib
+
+# 原子写入：先写目标目录中的临时文件，写完后用os.replace替换目标文件，写入中途出错或退出不会留下写了一半的文件；
+# 每次写入使用tempfile.mkstemp生成各自的临时文件，多个线程或进程同时写入同一个文件时不会互相覆盖临时文件
+
+# 以mode打开path的临时文件用于写入，with块正常结束时替换path，出错时删除临时文件
+# 用法：with AtomicFile.open(path, "wb") as f: ...
+@contextlib.contextmanager
+def open(path, mode="w", encoding="utf-8"):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, encoding=None if "b" in mode else encoding) as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+# 把字符串或bytes整体写入path
+def write(path, data, encoding="utf-8"):
+    with open(path, "wb" if isinstance(data, bytes) else "w", encoding) as f:
+        f.write(data)
@@ -0,0 +1,233 @@
+"""
+场景识别性能测试
+用法（在项目根目录执行）：
+    python BrownDust2/benchmark.py capture          合成画面，对比每元素截图与单次截图的周期耗时
+    python BrownDust2/benchmark.py capture --real   使用真实屏幕（mss）
+    python BrownDust2/benchmark.py workers          完整识别周期耗时与线程数的关系
+    python BrownDust2/benchmark.py alloc            每周期截图的内存分配量
+    python BrownDust2/benchmark.py startup          冷启动导入耗时及加载的重量级依赖
+    python BrownDust2/benchmark.py bundle           逐张解码PNG与映射资源包的模板加载耗时
+    python BrownDust2/benchmark.py trace            关闭和开启热路径追踪（Trace）时的周期耗时
+
+合成画面没有真实截图调用的系统开销，可用 --grab-overhead 模拟每次截图调用的固定耗时（毫秒）
+"""
+
+import argparse
+import os
+import sys
+import time
+import statistics
+import subprocess
+import tempfile
+import tracemalloc
+import cv2
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from scene_config import SceneManager, Config, get_scene_elements, RESOURCES
+import DeviceBackend
+import ResourceBundle
+import ResourceScaler
+import Trace
+from window import GameWindow, FakeWindowProvider
+
+RESOLUTIONS = {'1440p': (2560, 1440), '4K': (3840, 2160)}
+
+def make_screen(size: tuple) -> np.ndarray:
+    """
+    生成合成画面：噪声背景，并把各元素模板贴到其ROI位置
+
+    模板和位置按与SceneManager相同的方式（ResourceScaler）换算到该分辨率，贴上的模板与识别时使用的模板大小一致
+    """
+    w, h = size
+    rng = np.random.default_rng(0)
+    screen = cv2.GaussianBlur(rng.integers(0, 255, (h, w, 3), dtype=np.uint8), (7, 7), 0)
+    resources = ResourceScaler.scaleResources(RESOURCES, size)
+    for image_path, pos_info, _ in get_scene_elements(resources).values():
+        template = cv2.imread(image_path) if image_path else None
+        if template is None or not pos_info:
+            continue
+        th, tw = template.shape[:2]
+        x0, y0 = int(pos_info['x0'] * w), int(pos_info['y0'] * h)
+        if x0 + tw <= w and y0 + th <= h:
+            screen[y0:y0 + th, x0:x0 + tw] = template
+    return cv2.cvtColor(screen, cv2.COLOR_BGR2BGRA)
+
+def identify_per_element(manager: SceneManager):
+    """改造前的识别：每个元素单独检查签名、截取ROI，并重新读取模板"""
+    w, h = manager.get_screen_size()
+    for image_path, pos_info, signature in get_scene_elements().values():
+        if signature and manager.check_signature(signature) is None:
+            continue
+        if image_path is None:
+            continue
+        img = manager.grab_region(manager.get_roi_from_relative_pos(pos_info) if pos_info else (0, 0, w, h))
+        template = cv2.imread(image_path)
+        if template is None or img.shape[0] < template.shape[0] or img.shape[1] < template.shape[1]:
+            continue
+        cv2.minMaxLoc(cv2.matchTemplate(img, template, cv2.TM_CCOEFF_NORMED))
+
+def capture_per_element(manager: SceneManager):
+    """改造前的截图部分：每个元素截取一次ROI"""
+    w, h = manager.get_screen_size()
+    for image_path, pos_info, _ in get_scene_elements().values():
+        if image_path is not None:
+            manager.grab_region(manager.get_roi_from_relative_pos(pos_info) if pos_info else (0, 0, w, h))
+
+def timeit(func, rounds: int) -> float:
+    func()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1000
+
+def make_managers(args):
+    """
+    依次生成各分辨率的场景管理器
+
+    SceneManager会按分辨率换算scene_config中的资源(rd)，因此需要测完一个再创建下一个
+    """
+    if args.real:
+        manager = SceneManager()
+        yield 'screen {0}x{1}'.format(*manager.get_screen_size()), manager
+        return
+    for name, size in RESOLUTIONS.items():
+        window = GameWindow(Config.WINDOW_TITLE, FakeWindowProvider({Config.WINDOW_TITLE: (0, 0) + size}))
+        backend = DeviceBackend.create('fake', screen=make_screen(size), overhead=args.grab_overhead / 1000)
+        yield name, SceneManager(backend, window=window)
+
+def bench_capture(args):
+    print("每周期耗时(ms)，截图列只统计截图和颜色转换，周期列为一次场景识别")
+    print(f"{'分辨率':<16}{'截图/改造前':>12}{'截图/改造后':>12}{'周期/改造前':>12}{'周期/改造后':>12}{'截取区域':>8}")
+    for name, manager in make_managers(args):
+        capture_before = timeit(lambda: capture_per_element(manager), args.rounds)
+        capture_after = timeit(lambda: manager.capture_frame().load_all(), args.rounds)
+        before = timeit(lambda: identify_per_element(manager), args.rounds)
+        after = timeit(manager.identify_scene, args.rounds)
+        print(f"{name:<16}{capture_before:>12.2f}{capture_after:>12.2f}{before:>12.2f}{after:>12.2f}"
+              f"{len(manager.get_capture_regions()):>8}")
+
+def bench_workers(args):
+    counts = [0] + [n for n in (1, 2, 4, 8, 16, 32) if n <= (os.cpu_count() or 1)]
+    print(f"CPU核数: {os.cpu_count()}，每周期完整识别全部元素的耗时(ms)，0为不使用线程池")
+    print(f"{'分辨率':<16}" + "".join(f"{n:>10}" for n in counts))
+    for name, manager in make_managers(args):
+        row = []
+        for n in counts:
+            manager.pool = ThreadPoolExecutor(max_workers=n) if n > 0 else None
+            row.append(timeit(lambda: manager.evaluate_all(manager.capture_frame()), args.rounds))
+        print(f"{name:<16}" + "".join(f"{t:>10.2f}" for t in row))
+
+def allocated(func, rounds: int) -> float:
+    """func每次调用后仍在使用加上调用期间峰值的内存分配（KB），不含第一次调用"""
+    func()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    for _ in range(rounds):
+        func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+def grab_copy(manager: SceneManager):
+    """改造前的做法：np.array复制截图后再cvtColor生成新图像"""
+    for x0, y0, x1, y1 in manager.get_capture_regions():
+        cv2.cvtColor(np.array(manager.backend.screen[y0:y1, x0:x1]), cv2.COLOR_BGRA2BGR)
+
+def bench_alloc(args):
+    print("每周期截图的内存分配峰值(KB)，合成画面没有截图本身的BGRA缓冲区，最大区域列为mss截取最大一块时的缓冲区大小")
+    print(f"{'分辨率':<16}{'改造前':>12}{'改造后':>12}{'最大区域':>12}")
+    for name, manager in make_managers(args):
+        raw = max((x1 - x0) * (y1 - y0) * 4 for x0, y0, x1, y1 in manager.get_capture_regions()) / 1024
+        before = allocated(lambda: grab_copy(manager), args.rounds)
+        after = allocated(lambda: manager.capture_frame().load_all(), args.rounds)
+        print(f"{name:<16}{before:>12.0f}{after:>12.0f}{raw:>12.0f}")
+
+HEAVY_MODULES = ('mss', 'pyautogui', 'pydirectinput', 'keyboard', 'tkinter')
+
+STARTUP_CASES = {
+    '解释器': 'pass',
+    '改造前的依赖': 'import mss, pyautogui, pydirectinput, keyboard, tkinter.messagebox',
+    'scene_config': 'import scene_config',
+    'RaphaelScript': 'import RaphaelScriptHelper',
+    'fake后端': 'import DeviceBackend; DeviceBackend.create("fake")',
+    'pc后端': 'import DeviceBackend; DeviceBackend.create("pc")',
+}
+
+def cold_start(code: str, rounds: int):
+    """在新进程中执行code，返回(耗时中位数ms, 加载的重量级依赖)，失败时返回(None, 错误信息)"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [root, os.path.join(root, 'BrownDust2'), env.get('PYTHONPATH')]))
+    report = f"\nimport sys; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    times, loaded = [], ''
+    for _ in range(rounds):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, '-c', code + report], cwd=root, env=env,
+                              capture_output=True, text=True)
+        times.append((time.perf_counter() - start) * 1000)
+        if proc.returncode != 0:
+            return None, proc.stderr.strip().splitlines()[-1]
+        loaded = proc.stdout.strip().splitlines()[-1] if proc.stdout.strip() else ''
+    return statistics.median(times), loaded
+
+def bench_startup(args):
+    rounds = min(args.rounds, 10)
+    print(f"冷启动耗时(ms)，每项启动{rounds}个新进程取中位数，包含解释器本身的启动时间")
+    print(f"{'项目':<16}{'耗时':>10}  加载的重量级依赖")
+    for name, code in STARTUP_CASES.items():
+        elapsed, loaded = cold_start(code, rounds)
+        if elapsed is None:
+            print(f"{name:<16}{'失败':>10}  {loaded}")
+        else:
+            print(f"{name:<16}{elapsed:>10.1f}  {loaded or '-'}")
+
+def bench_bundle(args):
+    paths = [p for p, _, _ in get_scene_elements().values() if p]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'resources.bundle')
+        ResourceBundle.build(RESOURCES, path)
+
+        def decode():
+            for p in paths:
+                cv2.imread(p).max()
+
+        def mapped():
+            bundle = ResourceBundle.load(path)
+            for p in paths:
+                bundle.image(p).max()
+
+        print(f"加载全部{len(paths)}张模板并读取一遍像素的耗时(ms)，资源包包含映射文件和解析头部")
+        print(f"{'逐张解码PNG':<16}{timeit(decode, args.rounds):>10.2f}")
+        print(f"{'映射资源包':<16}{timeit(mapped, args.rounds):>10.2f}")
+
+def bench_trace(args):
+    print("每周期场景识别耗时(ms)，比较关闭和开启追踪，开销为开启后增加的比例")
+    print(f"{'分辨率':<16}{'关闭':>10}{'开启':>10}{'开销':>10}{'区间/周期':>10}")
+    for name, manager in make_managers(args):
+        Trace.disable()
+        off = min(timeit(manager.identify_scene, args.rounds) for _ in range(3))
+        Trace.enable()
+        Trace.clear()
+        on = min(timeit(manager.identify_scene, args.rounds) for _ in range(3))
+        spans = Trace.count() / (3 * (args.rounds + 1))
+        Trace.disable()
+        Trace.clear()
+        print(f"{name:<16}{off:>10.3f}{on:>10.3f}{(on - off) / off:>10.2%}{spans:>10.1f}")
+
+BENCHMARKS = {
+    'capture': bench_capture,
+    'workers': bench_workers,
+    'alloc': bench_alloc,
+    'startup': bench_startup,
+    'bundle': bench_bundle,
+    'trace': bench_trace,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="场景识别性能测试")
+    parser.add_argument('name', choices=BENCHMARKS.keys())
+    parser.add_argument('--rounds', type=int, default=20, help="每项测试的重复次数")
+    parser.add_argument('--real', action='store_true', help="使用真实屏幕截图")
+    parser.add_argument('--grab-overhead', type=float, default=0, help="合成画面每次截图调用的模拟固定耗时(ms)")
+    args = parser.parse_args()
+    BENCHMARKS[args.name](args)
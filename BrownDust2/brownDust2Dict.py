@@ -1,26 +0,0 @@
-skip = "./BrownDust2/img/skip.png"
-skip_pos = {'x0': 0.8438, 'y0': 0.0403, 'x1': 0.8641, 'y1': 0.1083, 'w': 0.0203, 'h': 0.0681}
-chat_confirm = "./BrownDust2/img/chat_confirm.png"
-chat_confirm_pos = {'x0': 0.5031, 'y0': 0.7000, 'x1': 0.5867, 'y1': 0.7486, 'w': 0.0836, 'h': 0.0486}
-mainline = "./BrownDust2/img/mainline.png"
-mainline_pos = {'x0': 0.8070, 'y0': 0.1319, 'x1': 0.8219, 'y1': 0.1556, 'w': 0.0148, 'h': 0.0236}
-skipchat = "./BrownDust2/img/skipchat.png"
-skipchat_pos = {'x0': 0.4922, 'y0': 0.9083, 'x1': 0.5086, 'y1': 0.9389, 'w': 0.0164, 'h': 0.0306}
-automove = "./BrownDust2/img/automove.png"
-automove_pos = {'x0': 0.4805, 'y0': 0.8764, 'x1': 0.5203, 'y1': 0.9500, 'w': 0.0398, 'h': 0.0736}
-war = "./BrownDust2/img/war.png"
-war_pos = {'x0': 0.7664, 'y0': 0.0167, 'x1': 0.7953, 'y1': 0.0708, 'w': 0.0289, 'h': 0.0542}
-exit = "./BrownDust2/img/exit.png"
-exit_pos = {'x0': 0.8320, 'y0': 0.9194, 'x1': 0.9430, 'y1': 0.9681, 'w': 0.1109, 'h': 0.0486}
-inter = "./BrownDust2/img/inter.png"
-inter_pos = {'x0': 0.7242, 'y0': 0.7972, 'x1': 0.7570, 'y1': 0.8431, 'w': 0.0328, 'h': 0.0458}
-pause = "./BrownDust2/img/pause.png"
-pause_pos = {'x0': 0.4508, 'y0': 0.2042, 'x1': 0.5398, 'y1': 0.2347, 'w': 0.0891, 'h': 0.0306}
-mainLine_click = ((2104, 204), (2282, 252))
-automainline = "./BrownDust2/img/automainlin.png"
-automainline_pos = {'x0': 0.7766, 'y0': 0.9014, 'x1': 0.9352, 'y1': 0.9653, 'w': 0.1586, 'h': 0.0639}
-automainline_click = ((2002, 1302), (2376, 1384))
-automainline_over = "./BrownDust2/img/automainlin_over.png"
-automainline_over_pos = {'x0': 0.4555, 'y0': 0.2833, 'x1': 0.5437, 'y1': 0.3361, 'w': 0.0883, 'h': 0.0528}
-automainline_war = "./BrownDust2/img/automainline_war.png"
-automainline_war_pos = {'x0': 0.7781, 'y0': 0.9028, 'x1': 0.8063, 'y1': 0.9597, 'w': 0.0281, 'h': 0.0569}
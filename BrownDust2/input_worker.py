@@ -0,0 +1,170 @@
+"""
+输入执行模块
+场景处理函数只生成操作计划，由独立的输入线程按顺序执行，
+主循环在执行期间继续识别画面，场景意外变化时可以取消尚未执行的操作
+"""
+
+import time
+import queue
+import random
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Tuple, Optional, List, Callable
+import Clock
+import Trace
+import Metrics
+import Log
+
+@dataclass
+class Action:
+    """单个输入操作"""
+    kind: str      # press / click / wait
+    args: tuple = ()
+
+def press(key: str) -> Action:
+    """按键操作"""
+    return Action('press', (key,))
+
+def click(x: int, y: int) -> Action:
+    """点击操作"""
+    return Action('click', (x, y))
+
+def click_random(pos_area: Tuple[Tuple[int, int], Tuple[int, int]]) -> Action:
+    """
+    在指定区域内随机点击，坐标在生成计划时确定；
+    使用random模块，会话录制/回放固定的随机种子对点击偏移同样生效
+
+    参数:
+        pos_area: 包含两个坐标点的区域范围 ((x1,y1), (x2,y2))
+    """
+    (x1, y1), (x2, y2) = pos_area
+    return click(random.randrange(x1, x2), random.randrange(y1, y2))
+
+def wait(seconds: float) -> Action:
+    """操作之间的等待，取消时立即结束"""
+    return Action('wait', (seconds,))
+
+@dataclass
+class Plan:
+    """
+    场景处理函数的返回值
+
+    参数:
+        actions: 按顺序执行的操作
+        hold: 操作执行完后至少等待多少秒才再次处理同一场景
+
+    submitted_at为提交时的Clock.monotonic()，done_at为操作执行完（或被取消）时的Clock.monotonic()
+    """
+    actions: List[Action] = field(default_factory=list)
+    hold: float = 0.0
+    submitted_at: Optional[float] = None
+    done_at: Optional[float] = None
+    cancelled: bool = False
+    generation: int = 0
+
+    def deadline(self) -> Optional[float]:
+        """下次处理同一场景的最早时间，操作尚未执行完时为None"""
+        if self.done_at is None:
+            return None
+        return self.done_at + self.hold
+
+    def ready(self, now: float) -> bool:
+        """是否已经可以再次处理同一场景"""
+        deadline = self.deadline()
+        return deadline is not None and now >= deadline
+
+class InputWorker:
+    """在独立线程中按顺序执行操作计划"""
+
+    def __init__(self, backend, origin: Optional[Callable[[], Tuple[int, int]]] = None):
+        """
+        参数:
+            backend: 执行输入操作的设备后端，见DeviceBackend
+            origin: 返回点击坐标原点（游戏窗口客户区左上角）的函数，默认为屏幕原点
+        """
+        self.backend = backend
+        self.origin = origin
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.interrupt = threading.Event()
+        self.current = None
+        self.pending = 0
+        self.generation = 0    # 每次取消加一，早于本次取消提交的计划都不再执行
+        self.thread = threading.Thread(target=self.run, name="input", daemon=True)
+        self.thread.start()
+
+    def submit(self, plan: Plan) -> Plan:
+        """提交操作计划，立即返回"""
+        with self.lock:
+            self.pending += 1
+            plan.generation = self.generation
+            plan.submitted_at = Clock.monotonic()
+        self.queue.put(plan)
+        return plan
+
+    def busy(self) -> bool:
+        """是否有尚未执行完的操作"""
+        return self.pending > 0
+
+    def cancel(self):
+        """取消队列中的计划，并在下一个操作前中止正在执行的计划"""
+        with self.lock:
+            self.generation += 1
+            while True:
+                try:
+                    plan = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                plan.cancelled = True
+                plan.done_at = Clock.monotonic()
+                self.pending -= 1
+            if self.current is not None:
+                self.current.cancelled = True
+                self.interrupt.set()
+
+    def run(self):
+        while True:
+            plan = self.queue.get()
+            Clock.sync(plan.submitted_at)
+            with self.lock:
+                if plan.cancelled or plan.generation != self.generation:
+                    plan.cancelled = True
+                    plan.done_at = Clock.monotonic()
+                    self.pending -= 1
+                    continue
+                self.current = plan
+                self.interrupt.clear()
+            for action in plan.actions:
+                if plan.cancelled:
+                    logging.debug("操作计划已取消")
+                    break
+                self.perform(action)
+            with self.lock:
+                plan.done_at = Clock.monotonic()
+                self.current = None
+                self.pending -= 1
+
+    def perform(self, action: Action):
+        """执行单个操作，出错时只记录日志"""
+        start = time.perf_counter()
+        try:
+            with Trace.span(action.kind, "delay" if action.kind == 'wait' else "input"):
+                if action.kind == 'press':
+                    self.backend.press(*action.args)
+                elif action.kind == 'click':
+                    x, y = action.args
+                    if self.origin is not None:
+                        left, top = self.origin()
+                        x, y = x + left, y + top
+                    if logging.root.isEnabledFor(logging.INFO):
+                        logging.info("点击坐标 X:%s Y:%s", x, y, extra=Log.fields(op="click", pos=(x, y)))
+                    self.backend.touch((x, y))
+                elif action.kind == 'wait':
+                    Clock.wait(self.interrupt, *action.args)
+                else:
+                    logging.warning(f"未知操作: {action.kind}")
+        except Exception as e:
+            logging.error(f"输入操作失败: {action.kind}{action.args} {e}")
+        if action.kind != 'wait':
+            Metrics.inputSeconds.labels(action.kind).observe(time.perf_counter() - start)
@@ -11,58 +11,83 @@
 
 import time
 import logging
-import threading
-import keyboard
-from scene_config import Scene, SceneManager
-from utils import setup_keyboard_control
+from scene_config import Scene, SceneManager, Config
+from utils import setup_keyboard_control, watch_exit_key
+from pacing import Pacer
+import Clock
+import Metrics
+import Log
 
-# 日志配置
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%H:%M:%S'
-)
+# 日志配置：接管根logger，所有日志经由队列由后台线程输出
+Log.setup(level=Config.LOG_LEVEL, fmt=Config.LOG_FORMAT, path=Config.LOG_PATH, root=True)
+Log.setDevice(Config.DEVICE_NAME or Config.BACKEND)
 
 def main():
     """主程序入口"""
     logging.info("====== 脚本初始化 ======")
     
     manager = SceneManager()
-    setup_keyboard_control(manager)
+    pacer = Pacer(
+        min_interval=Config.PACE_MIN_INTERVAL,
+        max_interval=Config.PACE_MAX_INTERVAL,
+        backoff=Config.PACE_BACKOFF,
+        cpu_budget=Config.PACE_CPU_BUDGET
+    )
+    setup_keyboard_control(manager, on_change=pacer.wake)
+
+    if Config.METRICS_PORT:
+        try:
+            server = Metrics.serve(Config.METRICS_PORT)
+            logging.info(f"运行指标: http://127.0.0.1:{server.server_address[1]}/metrics")
+        except OSError as e:
+            logging.warning(f"无法在端口 {Config.METRICS_PORT} 提供运行指标: {e}")
     
     # 监听Esc键退出
-    threading.Thread(
-        target=lambda: keyboard.wait('esc'), 
-        daemon=True
-    ).start()
+    watch_exit_key()
     
     logging.info("初始化完成，按Home键开始运行，End键暂停，Esc键退出")
     
     try:
+        last_report = Clock.monotonic()
         while True:
             if not manager.script_running or manager.manual_intervention_needed:
-                time.sleep(0.5)
+                manager.cancel_actions()
+                pacer.idle()
                 continue
                 
             try:
-                cycle_start = time.time()
+                pacer.begin()
                 
+                # 操作由输入线程执行，识别不会被处理函数阻塞
+                previous_scene = manager.current_scene
+                match_start = time.perf_counter()
                 current_scene = manager.identify_scene()
+                capture = manager.capture_time
+                match = time.perf_counter() - match_start - capture
+                
+                handle_start = time.perf_counter()
+                handled = False
                 if current_scene != Scene.UNKNOWN:
-                    manager.handle_scene(current_scene)
+                    handled = manager.handle_scene(current_scene)
+                handle = time.perf_counter() - handle_start
+                
+                # 有操作、操作未执行完或场景变化时快速轮询，否则逐步放慢
+                active = handled or current_scene != previous_scene or manager.input.busy()
+                pacer.end(active, capture, match, handle)
                 
-                # 控制循环间隔
-                elapsed = time.time() - cycle_start
-                if elapsed < 0.5:  # 使用固定的0.5秒间隔
-                    time.sleep(0.5 - elapsed)
+                if Config.PACE_REPORT_INTERVAL and Clock.monotonic() - last_report >= Config.PACE_REPORT_INTERVAL:
+                    pacer.log_stats()
+                    last_report = Clock.monotonic()
                     
             except Exception as e:
                 logging.error(f"循环处理异常: {e}")
-                time.sleep(1)
+                Clock.sleep(1)
                 
     except KeyboardInterrupt:
         logging.info("用户终止脚本")
     finally:
+        if Config.METRICS_PATH:
+            Metrics.dump(Config.METRICS_PATH)
         logging.info("====== 脚本结束 ======")
 
 if __name__ == "__main__":
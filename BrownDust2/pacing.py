@@ -0,0 +1,117 @@
+"""
+主循环节奏控制模块
+刚操作或场景刚变化时快速轮询，场景稳定或无法识别时按指数退避放慢，
+同时限制每个实例的CPU占用，并统计周期频率和各阶段耗时；
+时间和休眠都通过Clock获取，回放和测试时使用虚拟时钟不会真正等待
+"""
+
+import logging
+import threading
+from typing import Dict
+import Clock
+import Trace
+
+class Pacer:
+    """自适应轮询间隔控制器"""
+
+    def __init__(self, min_interval: float = 0.05, max_interval: float = 2.0,
+                 backoff: float = 1.5, cpu_budget: float = 0.25, smoothing: float = 0.1):
+        """
+        参数:
+            min_interval: 有操作或场景变化后的轮询间隔（秒）
+            max_interval: 退避后的最大轮询间隔（秒）
+            backoff: 每个空闲周期轮询间隔的放大倍数
+            cpu_budget: 识别和处理占用时间的最大比例，超出时延长休眠
+            smoothing: 统计值的指数平滑系数
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.cpu_budget = cpu_budget
+        self.smoothing = smoothing
+        self.interval = min_interval
+        self.event = threading.Event()
+        self.cycle_start = None
+        self.last_start = None
+        self.cycles = 0
+        self.averages = {'period': 0.0, 'capture': 0.0, 'match': 0.0, 'handle': 0.0, 'sleep': 0.0}
+
+    def begin(self):
+        """标记一个周期开始"""
+        now = Clock.monotonic()
+        if self.last_start is not None:
+            self.update('period', now - self.last_start)
+        self.last_start = now
+        self.cycle_start = now
+
+    def end(self, active: bool, capture: float = 0.0, match: float = 0.0, handle: float = 0.0) -> float:
+        """
+        标记一个周期结束并休眠到下一个周期
+
+        参数:
+            active: 本周期是否有操作或场景变化
+            capture/match/handle: 本周期截图、匹配、处理的耗时（秒）
+
+        返回:
+            实际的休眠时间（秒）
+        """
+        busy = Clock.monotonic() - self.cycle_start
+        self.update('capture', capture)
+        self.update('match', match)
+        self.update('handle', handle)
+        self.cycles += 1
+
+        if active:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+
+        # 按CPU预算计算最短休眠：busy / (busy + sleep) <= cpu_budget
+        floor = busy * (1 / self.cpu_budget - 1) if self.cpu_budget < 1 else 0.0
+        delay = max(self.interval - busy, floor, 0.0)
+        self.update('sleep', delay)
+        self.sleep(delay)
+        return delay
+
+    def idle(self):
+        """暂停或等待人工介入时按最大间隔休眠，可被wake提前唤醒"""
+        self.interval = self.min_interval
+        self.last_start = None
+        self.sleep(self.max_interval)
+
+    def sleep(self, seconds: float):
+        """休眠指定时间，调用wake时提前返回"""
+        if seconds > 0:
+            with Trace.span("pace", "delay"):
+                Clock.wait(self.event, seconds)
+        self.event.clear()
+
+    def wake(self):
+        """立即结束当前休眠，并恢复快速轮询"""
+        self.interval = self.min_interval
+        self.event.set()
+
+    def update(self, key: str, value: float):
+        average = self.averages[key]
+        self.averages[key] = value if average == 0.0 else average + self.smoothing * (value - average)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        返回:
+            {'rate': 周期频率(Hz), 'interval': 当前轮询间隔(秒),
+             'capture'/'match'/'handle'/'sleep': 各阶段平均耗时(毫秒), 'cycles': 周期数}
+        """
+        period = self.averages['period']
+        result = {
+            'rate': 1 / period if period > 0 else 0.0,
+            'interval': self.interval,
+            'cycles': self.cycles,
+        }
+        for key in ('capture', 'match', 'handle', 'sleep'):
+            result[key] = self.averages[key] * 1000
+        return result
+
+    def log_stats(self):
+        s = self.stats()
+        logging.info(f"周期 {s['rate']:.1f}Hz 间隔 {s['interval']:.2f}s | 截图 {s['capture']:.1f}ms "
+                     f"匹配 {s['match']:.1f}ms 处理 {s['handle']:.1f}ms 休眠 {s['sleep']:.0f}ms")
@@ -3,47 +3,152 @@
 定义游戏中的各种场景及其处理方式
 """
 
+import os
+import sys
+import json
 import cv2
-import mss
 import time
 import logging
-import pydirectinput
 import numpy as np
 from enum import Enum, auto
 from dataclasses import dataclass
 from typing import Dict, Callable, Optional, Tuple
 import inspect
-from brownDust2Dict import *
-from utils import click_random, show_message_dialog
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils import show_message_dialog
 
-def get_scene_elements() -> Dict[str, tuple]:
-    """获取所有需要检测的场景元素"""
+# 框架模块(ImageProc等)位于项目根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from input_worker import InputWorker, Plan, press, wait, click_random
+import Clock
+import Trace
+import Metrics
+import Log
+import ImageProc
+import DeviceBackend
+import ResourceScaler
+import ResourceBundle
+import ResourceManifest
+import AtomicFile
+from SceneIndex import SceneIndex
+from window import GameWindow, WindowNotFound
+
+def get_scene_elements(resources=None) -> Dict[str, tuple]:
+    """
+    获取所有需要检测的场景元素
+
+    参数:
+        resources: 资源，默认为按当前屏幕分辨率换算后的rd
+
+    返回:
+        {元素名: (图片路径, 相对位置, 像素签名)}，没有的项为None
+    """
     elements = {}
-    # 遍历brownDust2Dict中的所有变量，自动收集元素
-    for var_name, value in globals().items():
+    values = {k: v for k, v in vars(resources if resources is not None else rd).items() if not k.startswith('_')}
+    # 遍历资源清单中的所有条目，自动收集元素
+    for var_name, value in values.items():
         if var_name.endswith('_pos') and isinstance(value, dict):
             element_name = var_name[:-4]
-            # 确保对应的图片路径变量存在
-            if element_name in globals():
-                elements[element_name] = (globals()[element_name], value)
+            # 确保对应的图片路径条目存在
+            if element_name in values:
+                signature = values.get(element_name + '_sig')
+                elements[element_name] = (values[element_name], value, signature)
+        elif var_name.endswith('_sig') and isinstance(value, list):
+            # 只有像素签名、没有模板的元素
+            element_name = var_name[:-4]
+            if element_name + '_pos' not in values:
+                elements[element_name] = (None, None, value)
     return elements
 
 class Config:
     """全局配置类"""
+    # 资源清单（图片路径、相对位置、点击区域、像素签名），由CaptureMarkHelper-PC.py写入
+    RESOURCE_PATH = "./BrownDust2/brownDust2Dict.json"
+
+    # 逐模板置信度阈值文件，由 python TemplateAnalyzer.py BrownDust2/brownDust2Dict.json 截图目录 阈值文件 生成，
+    # 有分析结果的模板使用推荐阈值，其余模板使用下面的默认置信度
+    THRESHOLD_PATH = "./BrownDust2/thresholds.json"
+
     # 基础置信度配置 - 降低默认置信度以适应实际情况
     DEFAULT_CONFIDENCE = 0.7  # 默认置信度
     HIGH_CONFIDENCE = 0.75    # 高置信度要求
 
+    # 截图区域合并配置：各元素ROI合并为少量区域后每个周期截图一次
+    GRAB_COST_PIXELS = 256 * 256  # 一次截图调用的固定开销，折算为像素数；合并浪费的面积小于此值时合并
+
+    # 资源包配置，资源包由 python ResourceBundle.py BrownDust2/brownDust2Dict.json 资源包路径 [宽x高 ...] 生成，
+    # 存在时模板从资源包映射读取，不再逐张解码PNG
+    BUNDLE_PATH = "./BrownDust2/cache/resources.bundle"
+
+    # 场景索引配置，索引文件由 python SceneIndex.py 参考截图目录 索引路径 生成，不存在时逐元素识别
+    SCENE_INDEX_PATH = "./BrownDust2/cache/scene_index.npz"
+    SCENE_INDEX_MAX_DISTANCE = None  # 最近邻汉明距离超过此值视为无法分类，None为使用根目录settings中的sceneMaxDistance
+
+    # 弹出场景：可能出现在各场景之上的场景（如确认框），弹出场景优先于其下方的场景，识别到下方场景前需先排除；
+    # 其余场景视为不会同时出现的画面（需要相同元素的场景除外），识别到其中一个即可确定结果
+    SCENE_OVERLAYS = {
+        'mainline': ['confirm'],
+        'interaction': ['confirm'],
+        'dialogue': ['confirm'],
+        'deep_dialogue': ['confirm'],
+        'battle': ['confirm'],
+        'battle_end': ['confirm'],
+        'automove': ['confirm'],
+        'pause': ['confirm'],
+        'automainline': ['confirm'],
+        'automainline_over': ['confirm'],
+        'automainline_war': ['confirm'],
+    }
+
+    # 场景转移模型配置：优先检查当前场景及其最可能的后继场景
+    TRANSITION_PATH = "./BrownDust2/cache/transitions.json"
+    TRANSITION_TOP_K = 2         # 每个周期优先检查的后继场景数
+    TRANSITION_MIN_PROB = 0.1    # 转移概率低于此值的后继场景不优先检查
+    FULL_SWEEP_INTERVAL = 10     # 每隔多少个周期做一次完整识别，避免优先检查导致卡在错误场景
+    TRANSITION_SAVE_INTERVAL = 30  # 转移记录写入文件的最小间隔（秒），程序退出时会再写入一次
+
+    # 完整识别时并行匹配元素的线程数，0为不使用线程池（OpenCV匹配时会释放GIL）
+    MATCH_WORKERS = 0
+
+    # 截图和输入使用的设备后端，见DeviceBackend：pc为本机屏幕，fake、replay用于测试（录制的会话用session后端回放）
+    BACKEND = "pc"
+
+    # 游戏窗口标题（包含匹配），找到窗口时只截取其客户区，点击坐标也以客户区为原点；None为使用整个主显示器
+    WINDOW_TITLE = "BrownDust II"
+    WINDOW_RECHECK_UNKNOWN = 20  # 连续多少个周期无法识别时重新查询窗口位置（窗口被移动但截图未失败的情况）
+
+    # 主循环节奏配置：有操作或场景变化后快速轮询，空闲时按指数退避
+    PACE_MIN_INTERVAL = 0.05   # 最短轮询间隔（秒）
+    PACE_MAX_INTERVAL = 2.0    # 最长轮询间隔（秒），暂停时也按此间隔检查
+    PACE_BACKOFF = 1.5         # 每个空闲周期轮询间隔的放大倍数
+    PACE_CPU_BUDGET = 0.25     # 识别和处理最多占用的时间比例
+    PACE_REPORT_INTERVAL = 60  # 每隔多少秒输出一次周期统计，0为不输出
+
+    # 日志配置（见根目录Log）：日志经由队列由后台线程输出，重复的识别日志按根目录settings中的logRepeatInterval汇总
+    LOG_LEVEL = "INFO"       # 需要每个元素每个周期的识别结果时改为DEBUG
+    LOG_FORMAT = "text"      # text或json
+    LOG_PATH = None          # 日志文件，None为使用根目录settings中的logPath
+    DEVICE_NAME = None       # 日志中的设备名，多开时用于区分实例，None为使用BACKEND
+
+    # 运行指标（见根目录Metrics）：大于0时在本机该端口提供Prometheus格式的HTTP指标接口
+    METRICS_PORT = 0
+    METRICS_PATH = "./BrownDust2/cache/metrics.prom"  # 脚本结束时写入指标的文件，None为不写入
+    RUN_COMPLETE_SCENES = ("BATTLE_END", "AUTOMAINLINE_OVER")  # 进入这些场景时完成的流程数(rsh_runs_total)加一
+
     @classmethod
     def get_confidence_dict(cls) -> Dict[str, float]:
-        """自动从brownDust2Dict中获取所有图像元素并设置置信度"""
+        """自动从资源清单中获取所有图像元素并设置置信度，阈值文件中有推荐阈值的模板优先使用推荐阈值"""
+        ImageProc.loadThresholds(cls.THRESHOLD_PATH)
         confidence_dict = {}
-        for element_name, _ in get_scene_elements().items():
+        for element_name, (image_path, _, _) in get_scene_elements().items():
             # 根据元素类型设置不同的置信度
             if any(key in element_name.lower() for key in ['chat', 'skip', 'confirm']):
-                confidence_dict[element_name] = cls.HIGH_CONFIDENCE
+                default = cls.HIGH_CONFIDENCE
             else:
-                confidence_dict[element_name] = cls.DEFAULT_CONFIDENCE
+                default = cls.DEFAULT_CONFIDENCE
+            confidence_dict[element_name] = ImageProc.threshold(image_path, default)
         return confidence_dict
 
     @classmethod
@@ -78,6 +183,11 @@ class Config:
         
         return patterns
 
+# 原分辨率的资源清单
+RESOURCES = ResourceManifest.load(Config.RESOURCE_PATH)
+# 按屏幕实际分辨率换算后的资源，用法为rd.xxx，由SceneManager.apply_resolution更新
+rd = RESOURCES
+
 # 初始化配置
 CONFIDENCE = Config.get_confidence_dict()
 SCENE_MATCH = Config.get_scene_patterns()
@@ -96,79 +206,66 @@ class Scene(Enum):
                 scenes[scene_name] = auto()
         return scenes
 
-# 场景处理函数
-def handle_mainline(manager) -> None:
+# 场景处理函数：返回操作计划，由输入线程执行，hold为操作完成后再次处理同一场景前的等待时间
+def handle_mainline(manager) -> Plan:
     """
     处理主线场景
     需要元素: mainline
     """
-    click_random(mainLine_click)
-    time.sleep(2)
+    return Plan([click_random(rd.mainLine_click)], hold=2)
 
-def handle_interaction(manager) -> None:
+def handle_interaction(manager) -> Plan:
     """
     处理交互场景
     需要元素: mainline, inter
     """
-    pydirectinput.press('f')
-    time.sleep(1)
+    return Plan([press('f')], hold=1)
 
-def handle_dialogue(manager) -> None:
+def handle_dialogue(manager) -> Plan:
     """处理对话场景"""
-    pydirectinput.press('f2')
-    time.sleep(1)
-    pydirectinput.press('enter')
+    return Plan([press('f2'), wait(1), press('enter')], hold=1)
 
-def handle_deep_dialogue(manager) -> None:
+def handle_deep_dialogue(manager) -> Plan:
     """处理深入对话场景"""
-    pydirectinput.press('enter')
-    time.sleep(0.5)
+    return Plan([press('enter')], hold=0.5)
 
-def handle_battle(manager) -> None:
+def handle_battle(manager) -> Plan:
     """处理战斗场景"""
     logging.info("战斗场景，等待中...")
-    time.sleep(2)
+    return Plan(hold=2)
 
-def handle_battle_end(manager) -> None:
+def handle_battle_end(manager) -> Plan:
     """处理战斗结束场景"""
-    pydirectinput.press('enter')
-    time.sleep(1)
+    return Plan([press('enter')], hold=1)
 
-def handle_confirm(manager) -> None:
+def handle_confirm(manager) -> Plan:
     """处理确认场景"""
-    pydirectinput.press('enter')
-    time.sleep(1)
+    return Plan([press('enter')], hold=1)
 
-def handle_automove(manager) -> None:
+def handle_automove(manager) -> Plan:
     """处理自动移动场景"""
     logging.info("检测到自动移动，等待中...")
-    time.sleep(2)
+    return Plan(hold=2)
 
-def handle_pause(manager) -> None:
+def handle_pause(manager) -> Plan:
     """处理暂停场景"""
     if not manager.manual_intervention_needed:
         logging.warning("⚠ 检测到需要人工介入")
         manager.manual_intervention_needed = True
         manager.show_intervention_dialog()
-    time.sleep(1)
+    return Plan(hold=1)
 
-def handle_automainline(manager) -> None:
+def handle_automainline(manager) -> Plan:
     """处理快速主线场景"""
-    from utils import click_random  # 避免循环导入
-    click_random(automainline_click)  # 随机点击automainline区域
-    time.sleep(2)
+    return Plan([click_random(rd.automainline_click)], hold=2)  # 随机点击automainline区域
 
-def handle_automainline_over(manager) -> None:
+def handle_automainline_over(manager) -> Plan:
     """处理快速主线完成场景"""
-    from utils import click_random  # 避免循环导入
-    click_random(automainline_click)  # 随机点击automainline区域
-    time.sleep(2)
+    return Plan([click_random(rd.automainline_click)], hold=2)  # 随机点击automainline区域
 
-def handle_automainline_war(manager) -> None:
+def handle_automainline_war(manager) -> Plan:
     """处理快速主线战斗场景"""
-    from utils import click_random  # 避免循环导入
-    click_random(automainline_click)  # 随机点击automainline区域
-    time.sleep(2)
+    return Plan([click_random(rd.automainline_click)], hold=2)  # 随机点击automainline区域
 
 def get_scene_names():
     """获取所有场景名称"""
@@ -232,28 +329,475 @@ def generate_scene_configs():
 
 SCENE_CONFIGS = generate_scene_configs()
 
+def _area(rect: tuple) -> int:
+    x0, y0, x1, y1 = rect
+    return max(0, x1 - x0) * max(0, y1 - y0)
+
+def merge_regions(rects: list, screen_rect: tuple,
+                  grab_cost: int = Config.GRAB_COST_PIXELS) -> list:
+    """
+    将若干矩形合并为少量截取区域
+
+    每次截图的代价按 固定开销grab_cost + 截取像素数 估算：
+    两个区域合并后多截的面积小于grab_cost时合并，
+    最终总代价不低于整屏截图一次时直接截取整屏
+
+    参数:
+        rects: [(x0, y0, x1, y1), ...]
+        screen_rect: 整屏区域
+
+    返回:
+        合并后的区域列表
+    """
+    regions = [tuple(r) for r in rects]
+    while len(regions) > 1:
+        best = None
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                a, b = regions[i], regions[j]
+                union = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                waste = _area(union) - _area(a) - _area(b)
+                if best is None or waste < best[0]:
+                    best = (waste, i, j, union)
+        waste, i, j, union = best
+        if waste >= grab_cost:
+            break
+        regions = [r for k, r in enumerate(regions) if k not in (i, j)] + [union]
+
+    cost = sum(grab_cost + _area(r) for r in regions)
+    if cost >= grab_cost + _area(screen_rect):
+        return [tuple(screen_rect)]
+    return regions
+
+class Frame:
+    """
+    一个识别周期的截图：若干截取区域的像素，元素ROI从中切片得到视图，不再单独截图
+
+    区域在第一次被用到时才截取，每个周期每个区域最多截取一次
+    """
+
+    def __init__(self, rects: list, grab: Callable):
+        """
+        参数:
+            rects: [(x0, y0, x1, y1), ...]，坐标为屏幕像素坐标
+            grab: 截取一个区域并返回BGR图像的函数
+        """
+        self.rects = rects
+        self.images = [None] * len(rects)
+        self.grab = grab
+
+    def load_all(self) -> 'Frame':
+        """立即截取全部区域"""
+        for i, rect in enumerate(self.rects):
+            if self.images[i] is None:
+                self.images[i] = self.grab(rect)
+        return self
+
+    def crop(self, x0: int, y0: int, x1: int, y1: int) -> Optional[np.ndarray]:
+        """返回指定区域的视图，区域不在任何截取区域内时返回None"""
+        for i, (rx0, ry0, rx1, ry1) in enumerate(self.rects):
+            if rx0 <= x0 and ry0 <= y0 and x1 <= rx1 and y1 <= ry1:
+                if self.images[i] is None:
+                    self.images[i] = self.grab(self.rects[i])
+                return self.images[i][y0 - ry0:y1 - ry0, x0 - rx0:x1 - rx0]
+        return None
+
+@dataclass
+class SceneElement:
+    """编译后的场景元素：模板已读入内存，ROI和签名已换算为当前屏幕的像素坐标"""
+    name: str
+    bit: int
+    template: Optional[np.ndarray]
+    roi: Optional[Tuple[int, int, int, int]]
+    signature: Optional[list]
+    signature_rect: Optional[Tuple[int, int, int, int]]
+    confidence: float
+    cost: float = 0
+
+    def estimate_cost(self) -> float:
+        """估算一次检查的耗时：模板匹配为 结果图大小 x 模板大小，只有签名时为探针数"""
+        if self.template is None:
+            return len(self.signature or [])
+        x0, y0, x1, y1 = self.roi
+        th, tw = self.template.shape[:2]
+        return max(1, x1 - x0 - tw + 1) * max(1, y1 - y0 - th + 1) * tw * th
+
+class SceneRegistry:
+    """
+    编译后的场景注册表，启动时构建一次
+
+    元素按顺序编号，每个场景表示为元素上的整数位掩码，
+    场景选择为一次向量化的掩码比较
+    """
+
+    def __init__(self, manager):
+        w, h = manager.get_screen_size()
+        self.elements = []
+        for name, (image_path, pos_info, signature) in get_scene_elements().items():
+            template = None
+            if image_path is not None:
+                template = ImageProc.loadImage(image_path)
+                if template is None:
+                    logging.error(f"模板文件不存在或无法读取: {image_path}")
+                    continue
+            probes = ImageProc.resolveSignature(signature, (w, h)) if signature else None
+            self.elements.append(SceneElement(
+                name=name,
+                bit=len(self.elements),
+                template=template,
+                roi=manager.get_roi_from_relative_pos(pos_info) if pos_info else (0, 0, w, h),
+                signature=probes,
+                signature_rect=manager.get_signature_rect(signature) if signature else None,
+                # 阈值文件中没有的模板使用资源包中打包的置信度
+                confidence=ImageProc.threshold(image_path, CONFIDENCE.get(name, Config.DEFAULT_CONFIDENCE))
+            ))
+        if len(self.elements) > 64:
+            raise ValueError(f"场景元素数量({len(self.elements)})超过64个，无法用位掩码表示")
+        self.by_name = {e.name: e for e in self.elements}
+
+        # 场景按SCENE_CONFIGS的顺序排列，靠前的场景优先，弹出场景由set_overlays移到其下方场景之前
+        self.scenes = []
+        required, forbidden = [], []
+        for scene, config in SCENE_CONFIGS.items():
+            req_mask, forb_mask = 0, 0
+            missing = [e for e in config.pattern.required_matches if e not in self.by_name]
+            if any(config.pattern.required_matches[e] for e in missing):
+                logging.warning(f"场景 {scene.name} 需要的元素不存在: {missing}，该场景不会被识别")
+                continue
+            for element, need in config.pattern.required_matches.items():
+                if element in self.by_name:
+                    if need:
+                        req_mask |= 1 << self.by_name[element].bit
+                    else:
+                        forb_mask |= 1 << self.by_name[element].bit
+            self.scenes.append(scene)
+            required.append(req_mask)
+            forbidden.append(forb_mask)
+        self.required = np.array(required, dtype=np.uint64)
+        self.forbidden = np.array(forbidden, dtype=np.uint64)
+
+        # 元素按检查耗时从低到高排列
+        for element in self.elements:
+            element.cost = element.estimate_cost()
+        self.order = sorted(self.elements, key=lambda e: e.cost)
+
+        overlays = {}
+        for base, tops in Config.SCENE_OVERLAYS.items():
+            base = Scene.__members__.get(base.upper())
+            if base in self.scenes:
+                overlays[base] = [Scene[t.upper()] for t in tops
+                                  if Scene.__members__.get(t.upper()) in self.scenes]
+        self.set_overlays(overlays)
+
+    def set_overlays(self, overlays: Dict[Scene, list]):
+        """
+        设置弹出场景并计算每个场景识别前需要先排除的场景
+
+        弹出场景移到其下方场景之前；需要先排除的场景为排在它之前、可能同时出现的场景
+        （其中一个是另一个的弹出场景，或两者需要相同的元素）。场景权重重置为1
+
+        参数:
+            overlays: {场景: [可能弹出在其上的场景, ...]}
+        """
+        scenes = list(self.scenes)
+        for _ in range(len(scenes) + 1):
+            moved = False
+            for base, tops in overlays.items():
+                for top in tops:
+                    if scenes.index(top) > scenes.index(base):
+                        scenes.remove(top)
+                        scenes.insert(scenes.index(base), top)
+                        moved = True
+            if not moved:
+                break
+        else:
+            raise ValueError(f"弹出场景配置存在循环: {overlays}")
+
+        index = np.array([self.scenes.index(scene) for scene in scenes], dtype=np.intp)
+        self.scenes = scenes
+        self.required = self.required[index]
+        self.forbidden = self.forbidden[index]
+        self.involved = self.required | self.forbidden
+        self.conflicts = []
+        for i, scene in enumerate(scenes):
+            self.conflicts.append(np.array([
+                j for j in range(i)
+                if scenes[j] in overlays.get(scene, ()) or scene in overlays.get(scenes[j], ())
+                or int(self.involved[i]) & int(self.involved[j])
+            ], dtype=np.intp))
+        self.weights = np.ones(len(scenes))
+
+    def set_weights(self, weights: Dict[str, float]):
+        """设置各场景的权重（出现频率），按需识别时优先检查权重高的场景涉及的元素，未给出的场景权重为1"""
+        self.weights = np.array([weights.get(scene.name, 1.0) for scene in self.scenes], dtype=np.float64)
+
+    def scene_elements(self, scene: Scene) -> list:
+        """返回场景需要检测的元素"""
+        config = SCENE_CONFIGS[scene]
+        return [self.by_name[e] for e in config.pattern.required_matches if e in self.by_name]
+
+    def select(self, detected: int) -> Scene:
+        """根据检测到的元素位掩码选择第一个匹配的场景"""
+        if not self.scenes:
+            return Scene.UNKNOWN
+        detected = np.uint64(detected)
+        ok = ((self.required & detected) == self.required) & ((self.forbidden & detected) == 0)
+        index = np.flatnonzero(ok)
+        return self.scenes[index[0]] if index.size else Scene.UNKNOWN
+
+    def _settle(self, i: int, check: Callable[[SceneElement], bool],
+                known: int, detected: int) -> Tuple[bool, int, int]:
+        """按检查顺序逐个确定第i个场景涉及的元素，出现矛盾立即停止"""
+        required, forbidden = int(self.required[i]), int(self.forbidden[i])
+        for element in self.order:
+            bit = 1 << element.bit
+            if not (required | forbidden) & bit:
+                continue
+            if not known & bit:
+                known |= bit
+                if check(element):
+                    detected |= bit
+            if (required & bit) and not (detected & bit) or (forbidden & bit) and (detected & bit):
+                return False, known, detected
+        return True, known, detected
+
+    def try_scene(self, scene: Scene, check: Callable[[SceneElement], bool],
+                  known: int, detected: int) -> Tuple[bool, int, int]:
+        """
+        只检查一个场景是否为结果：先确定它涉及的元素，匹配时再排除需要先排除的场景（弹出在其上的场景等），
+        其余场景不检查，出现矛盾立即停止
+
+        返回:
+            (是否为结果, 已确定的元素位掩码, 已检测到的元素位掩码)
+        """
+        i = self.scenes.index(scene)
+        matched, known, detected = self._settle(i, check, known, detected)
+        if not matched:
+            return False, known, detected
+        for j in self.conflicts[i]:
+            overlay, known, detected = self._settle(j, check, known, detected)
+            if overlay:
+                return False, known, detected
+        return True, known, detected
+
+    def decide(self, check: Callable[[SceneElement], bool], known: int = 0, detected: int = 0) -> Scene:
+        """
+        按需检查元素，得出场景后立即停止
+
+        候选场景的元素都已确定且符合、需要先排除的场景都已排除时即为结果；否则在全部候选场景
+        尚未确定的元素中，检查 涉及它的候选场景权重之和/检查耗时 最高的一个，并淘汰与结果矛盾的候选场景；
+        没有候选场景时返回UNKNOWN。同时出现的场景互相在对方的排除范围内时，结果与检查全部元素后调用select一致
+
+        参数:
+            check: 检查一个元素，返回是否检测到
+            known: 已确定的元素位掩码
+            detected: 已检测到的元素位掩码
+        """
+        while True:
+            known_u, detected_u = np.uint64(known), np.uint64(detected)
+            alive = ((self.required & known_u & ~detected_u) == 0) & ((self.forbidden & detected_u) == 0)
+            if not alive.any():
+                return Scene.UNKNOWN
+            settled = alive & ((self.involved & ~known_u) == 0)
+            for i in np.flatnonzero(settled):
+                if not alive[self.conflicts[i]].any():
+                    return self.scenes[i]
+
+            need = int(np.bitwise_or.reduce(self.involved[alive])) & ~known
+            best, best_score = None, -1.0
+            for element in self.order:
+                if not need >> element.bit & 1:
+                    continue
+                uses = alive & ((self.involved & np.uint64(1 << element.bit)) != 0)
+                score = self.weights[uses].sum() / (element.cost or 1)
+                if score > best_score:
+                    best, best_score = element, score
+            known |= 1 << best.bit
+            if check(best):
+                detected |= 1 << best.bit
+
+class TransitionModel:
+    """
+    场景转移模型：统计识别到的场景序列中相邻两个不同场景的转移次数，并持久化到文件
+
+    UNKNOWN不参与统计，加载画面等中间状态不会打断前后两个场景之间的转移；
+    记录在内存中累计，距上次写入超过save_interval秒时才写入文件，程序退出时再写入一次
+    """
+
+    def __init__(self, path: str, save_interval: float = Config.TRANSITION_SAVE_INTERVAL):
+        self.path = path
+        self.save_interval = save_interval
+        self.names = [scene.name for scene in Scene]
+        n = len(self.names)
+        self.counts = np.zeros((n, n), dtype=np.float64)
+        self.dirty = False
+        self.saved_at = Clock.monotonic()
+        self.load()
+        atexit.register(self.save)
+
+    def load(self):
+        """读取转移次数，按场景名对应，场景增删后旧记录仍可使用"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"场景转移记录读取失败: {e}")
+            return
+        for prev, row in data.items():
+            for cur, count in row.items():
+                if prev in self.names and cur in self.names:
+                    self.counts[self.names.index(prev), self.names.index(cur)] = count
+
+    def save(self, force: bool = True):
+        """写入转移次数，先写临时文件再替换；force为False时距上次写入不足save_interval秒则跳过"""
+        if not self.dirty:
+            return
+        if not force and Clock.monotonic() - self.saved_at < self.save_interval:
+            return
+        self.dirty = False
+        self.saved_at = Clock.monotonic()
+        data = {}
+        for i, prev in enumerate(self.names):
+            row = {self.names[j]: int(c) for j, c in enumerate(self.counts[i]) if c > 0}
+            if row:
+                data[prev] = row
+        with AtomicFile.open(self.path) as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    def observe(self, prev: Scene, cur: Scene):
+        """记录一次从prev到cur的转移"""
+        self.counts[self.names.index(prev.name), self.names.index(cur.name)] += 1
+        self.dirty = True
+        self.save(force=False)
+
+    def likely_next(self, scene: Scene, k: int = Config.TRANSITION_TOP_K,
+                    min_prob: float = Config.TRANSITION_MIN_PROB) -> list:
+        """返回scene之后最可能出现的k个场景，按概率从高到低排列"""
+        row = self.counts[self.names.index(scene.name)]
+        total = row.sum()
+        if total == 0:
+            return []
+        prob = row / total
+        order = np.argsort(-prob, kind="stable")[:k]
+        return [Scene[self.names[i]] for i in order if prob[i] >= min_prob]
+
+    def frequencies(self) -> Dict[str, float]:
+        """返回各场景被转入的次数加1，用作按需识别时的场景权重"""
+        return {name: 1.0 + count for name, count in zip(self.names, self.counts.sum(axis=0))}
+
 class SceneManager:
     """场景管理器：负责识别和处理不同的游戏场景"""
     
-    def __init__(self):
-        self.sct = mss.mss()
+    def __init__(self, backend=None, workers: Optional[int] = None, window: Optional[GameWindow] = None):
+        """
+        参数:
+            backend: 设备后端，默认按Config.BACKEND创建
+            workers: 完整识别时并行匹配的线程数，默认取Config.MATCH_WORKERS
+            window: 游戏窗口，PC后端默认按Config.WINDOW_TITLE查找，找不到时使用整个主显示器
+        """
+        self.backend = backend if backend is not None else DeviceBackend.create(Config.BACKEND)
+        if window is None and Config.WINDOW_TITLE and isinstance(self.backend, DeviceBackend.PcBackend):
+            window = GameWindow(Config.WINDOW_TITLE)
+        self.window = window
+        self.screen_rect = None
+        if workers is None:
+            workers = Config.MATCH_WORKERS
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="match") if workers > 0 else None
         self.screen_size = None
+        self.capture_regions = None
+        if os.path.exists(Config.BUNDLE_PATH):
+            bundle = ResourceBundle.load(Config.BUNDLE_PATH)
+            ImageProc.useBundle(bundle)
+            logging.info(f"已加载资源包: {len(bundle)} 张图片")
+        self.apply_resolution()
+        self.registry = SceneRegistry(self)
+        logging.info(f"场景注册表: {len(self.registry.elements)} 个元素, {len(self.registry.scenes)} 个场景")
+        self.scene_index = None
+        if os.path.exists(Config.SCENE_INDEX_PATH):
+            self.scene_index = SceneIndex.load(Config.SCENE_INDEX_PATH)
+            logging.info(f"已加载场景索引: {len(self.scene_index.labels)} 张参考截图")
+        self.transitions = TransitionModel(Config.TRANSITION_PATH)
+        self.registry.set_weights(self.transitions.frequencies())
+        self.cycles_since_sweep = 0
+        self.unknown_cycles = 0
+        self.input = InputWorker(self.backend, origin=lambda: self.get_screen_rect()[:2])
+        self.capture_time = 0.0   # 最近一次识别中截图的耗时（秒）
+        self.buffers = {}         # 各截取区域复用的BGR输出缓冲区
+        self.templates = {}       # check_image读取过的模板
         self.reset_state()
 
     def reset_state(self):
         """重置所有状态变量"""
         self.current_scene = Scene.UNKNOWN
+        self.last_known_scene = Scene.UNKNOWN
+        self.scene_since = Clock.monotonic()  # 进入当前场景的时间，用于统计场景停留时长
         self.element_positions = {}
+        self.handled_scene = Scene.UNKNOWN   # 最近一次处理的场景及其操作计划
+        self.plan = None
         self.manual_intervention_needed = False
         self.script_running = False  # 默认暂停状态
 
+    def get_screen_rect(self) -> Tuple[int, int, int, int]:
+        """
+        获取并缓存截图范围 (left, top, width, height)
+
+        有游戏窗口时为窗口客户区，找不到窗口时暂时使用整个主显示器，
+        之后截图失败或连续无法识别时由refresh_window重新查询窗口
+        """
+        if not self.screen_rect:
+            if self.window is not None:
+                try:
+                    self.screen_rect = self.window.geometry()
+                except Exception as e:
+                    logging.warning(f"找不到游戏窗口 {self.window.title}，暂时使用整个主显示器: {e}")
+            if not self.screen_rect:
+                self.screen_rect = tuple(self.backend.screenRect())
+        return self.screen_rect
+
     def get_screen_size(self) -> Tuple[int, int]:
-        """获取并缓存屏幕尺寸"""
+        """获取并缓存屏幕尺寸，有游戏窗口时为客户区尺寸"""
         if not self.screen_size:
-            monitor = self.sct.monitors[1]
-            self.screen_size = (monitor['width'], monitor['height'])
+            self.screen_size = tuple(self.get_screen_rect()[2:])
         return self.screen_size
 
+    def refresh_window(self) -> bool:
+        """
+        重新查询游戏窗口位置，截图失败时调用
+
+        窗口尺寸变化时重新换算资源并重建注册表、截取区域和模板缓存；仍找不到窗口时保持当前截图范围
+
+        返回:
+            窗口位置是否发生变化
+        """
+        if self.window is None:
+            return False
+        old = self.screen_rect
+        try:
+            rect = self.window.refresh()
+        except WindowNotFound:
+            logging.debug(f"仍找不到游戏窗口 {self.window.title}")
+            return False
+        self.screen_rect = rect
+        if self.screen_rect == old:
+            return False
+        logging.info(f"游戏窗口位置变化: {old} -> {self.screen_rect}")
+        if old is None or tuple(self.screen_rect[2:]) != tuple(old[2:]):
+            self.screen_size = tuple(self.screen_rect[2:])
+            self.capture_regions = None
+            self.buffers = {}
+            self.templates = {}
+            self.apply_resolution()
+            self.registry = SceneRegistry(self)
+            self.registry.set_weights(self.transitions.frequencies())
+        return True
+
+    def apply_resolution(self):
+        """按屏幕实际分辨率换算资源清单中的模板和点击坐标，换算结果按分辨率缓存"""
+        global rd
+        rd = ResourceScaler.scaleResources(RESOURCES, self.get_screen_size())
+
     def get_roi_from_relative_pos(self, rel_pos: dict) -> tuple:
         """
         根据相对位置信息计算实际的ROI区域
@@ -284,92 +828,356 @@ class SceneManager:
         
         return (x0, y0, x1, y1)
 
-    def check_image(self, target: str, confidence: float, rel_pos: dict = None) -> Optional[Tuple[int, int]]:
-        """检查目标图像是否存在于当前屏幕"""
+    def get_signature_rect(self, signature: list) -> tuple:
+        """返回像素签名所有探针的包围区域 (x0, y0, x1, y1)"""
+        probes = ImageProc.resolveSignature(signature, self.get_screen_size())
+        xs = [p[0] for p in probes]
+        ys = [p[1] for p in probes]
+        return (min(xs), min(ys), max(xs) + 1, max(ys) + 1)
+
+    def get_capture_regions(self) -> list:
+        """
+        计算并缓存每个周期需要截取的区域
+
+        使用场景索引时截取整屏，否则将所有元素的ROI和签名区域合并为少量区域
+        """
+        if self.capture_regions is None:
+            w, h = self.get_screen_size()
+            if self.scene_index is not None:
+                self.capture_regions = [(0, 0, w, h)]
+            else:
+                rects = []
+                for element in self.registry.elements:
+                    if element.template is not None:
+                        rects.append(element.roi)
+                    if element.signature_rect:
+                        rects.append(element.signature_rect)
+                self.capture_regions = merge_regions(rects, (0, 0, w, h))
+            logging.debug(f"每周期截取区域: {self.capture_regions}")
+        return self.capture_regions
+
+    def get_region(self, rect: tuple) -> tuple:
+        """截图范围内的区域 (x0, y0, x1, y1) 转换为后端的截取区域 (left, top, width, height)"""
+        x0, y0, x1, y1 = rect
+        left, top = self.get_screen_rect()[:2]
+        return (left + x0, top + y0, x1 - x0, y1 - y0)
+
+    def grab_region(self, rect: tuple, reuse: bool = False) -> np.ndarray:
+        """
+        截取屏幕上的一个区域，返回BGR图像
+
+        reuse为True时输出写入该区域的复用缓冲区，下次截取同一区域会覆盖上次的结果
+        """
+        start = time.perf_counter()
+        out = None
+        if reuse:
+            x0, y0, x1, y1 = rect
+            out = self.buffers.get(rect)
+            if out is None:
+                out = self.buffers[rect] = np.empty((y1 - y0, x1 - x0, 3), np.uint8)
+        with Trace.span("grab_region", "capture"):
+            try:
+                img = self.backend.grab(*self.get_region(rect), out=out)
+            except Exception:
+                # 窗口可能被移动、缩放或关闭，重新查询位置后重试一次
+                if not self.refresh_window():
+                    raise
+                img = self.backend.grab(*self.get_region(rect), out=out)
+        elapsed = time.perf_counter() - start
+        self.capture_time += elapsed
+        Metrics.captures.inc()
+        Metrics.captureSeconds.observe(elapsed)
+        return img
+
+    def capture_frame(self) -> Frame:
+        """
+        创建本周期的画面，每个合并区域在第一次用到时截图一次
+
+        各区域的图像使用复用缓冲区，只在本周期内有效
+        """
+        self.backend.beginFrame()
+        return Frame(self.get_capture_regions(), lambda rect: self.grab_region(rect, reuse=True))
+
+    def crop(self, rect: tuple, frame: Optional[Frame] = None) -> np.ndarray:
+        """从frame中切出区域视图，frame为空或不包含该区域时单独截图"""
+        img = frame.crop(*rect) if frame is not None else None
+        if img is None:
+            img = self.grab_region(rect)
+        return img
+
+    def check_signature(self, signature: list, frame: Optional[Frame] = None) -> Optional[Tuple[int, int]]:
+        """
+        检查像素签名是否与当前屏幕匹配
+
+        参数:
+            signature: [(x, y, (b, g, r), tolerance), ...]，坐标为相对值(0-1)或像素值
+            frame: 本周期的截图，为空时只截取探针所在的最小区域
+
+        返回:
+            匹配时返回探针区域中心坐标，否则返回None
+        """
+        try:
+            probes = ImageProc.resolveSignature(signature, self.get_screen_size())
+            x0, y0, x1, y1 = self.get_signature_rect(signature)
+            img = self.crop((x0, y0, x1, y1), frame)
+            if ImageProc.matchSignature(img, probes, (x0, y0)):
+                return ((x0 + x1 - 1) // 2, (y0 + y1 - 1) // 2)
+            return None
+        except Exception as e:
+            logging.error(f"像素签名检查异常: {str(e)}")
+            return None
+
+    def match_template(self, img: np.ndarray, template: np.ndarray, confidence: float,
+                       offset: Tuple[int, int], name: str) -> Optional[Tuple[int, int]]:
+        """
+        在img中匹配模板
+
+        参数:
+            offset: img左上角的屏幕坐标
+            name: 用于日志的元素名
+
+        返回:
+            匹配成功时返回模板中心的屏幕坐标，否则返回None
+        """
+        # 确保图像和模板大小合适
+        if img.shape[0] < template.shape[0] or img.shape[1] < template.shape[1]:
+            logging.warning(f"ROI区域({img.shape})小于模板大小({template.shape})")
+            return None
+
+        start = time.perf_counter()
+        with Trace.span("match_template", "match", name):
+            res = cv2.matchTemplate(img, template, cv2.TM_CCOEFF_NORMED)
+            _, max_val, _, max_loc = cv2.minMaxLoc(res)
+        Metrics.observeMatch(name, time.perf_counter() - start, max_val > confidence)
+
+        if max_val > confidence:
+            h, w = template.shape[:2]
+            center_x = max_loc[0] + w//2 + offset[0]
+            center_y = max_loc[1] + h//2 + offset[1]
+
+            # 命中日志为DEBUG级别，每次都输出，不做汇总
+            if logging.root.isEnabledFor(logging.DEBUG):
+                logging.debug("成功识别 %s 置信度:%.2f 坐标(%d,%d)", name, max_val, center_x, center_y,
+                              extra=Log.fields(element=name, confidence=round(max_val, 3), pos=(center_x, center_y)))
+            return (center_x, center_y)
+
+        # 每个周期都会出现的未识别日志按名称汇总，置信度不同也视为重复
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug("未识别到目标 %s 置信度:%.2f", name, max_val,
+                          extra=Log.repeated("miss", name, element=name, confidence=round(max_val, 3)))
+        return None
+
+    def check_element(self, element: SceneElement, frame: Optional[Frame] = None) -> Optional[Tuple[int, int]]:
+        """检查注册表中的元素，使用预读入的模板和预计算的ROI"""
+        try:
+            if element.signature:
+                img = self.crop(element.signature_rect, frame)
+                if not ImageProc.matchSignature(img, element.signature, element.signature_rect[:2]):
+                    return None
+                if element.template is None:
+                    x0, y0, x1, y1 = element.signature_rect
+                    return ((x0 + x1 - 1) // 2, (y0 + y1 - 1) // 2)
+            img = self.crop(element.roi, frame)
+            return self.match_template(img, element.template, element.confidence, element.roi[:2], element.name)
+        except Exception as e:
+            logging.error(f"图像识别异常: {str(e)}")
+            return None
+
+    def check_image(self, target: str, confidence: float, rel_pos: dict = None,
+                    signature: list = None, frame: Optional[Frame] = None) -> Optional[Tuple[int, int]]:
+        """
+        检查目标图像是否存在于当前屏幕，用于注册表以外的临时检查
+
+        给定signature时先检查像素签名，签名不匹配直接返回None；
+        target为None时只使用像素签名判断；
+        给定frame时从本周期截图中切片，否则单独截取ROI
+        """
+        if signature:
+            pos = self.check_signature(signature, frame)
+            if pos is None or target is None:
+                return pos
+        elif target is None:
+            return None
+
         try:
-            monitor = self.sct.monitors[1]
-            
             if rel_pos:
                 x0, y0, x1, y1 = self.get_roi_from_relative_pos(rel_pos)
-                monitor = {
-                    'left': monitor['left'] + x0,
-                    'top': monitor['top'] + y0,
-                    'width': x1 - x0,
-                    'height': y1 - y0
-                }
-            
-            sct_img = self.sct.grab(monitor)
-            img = cv2.cvtColor(np.array(sct_img), cv2.COLOR_BGRA2BGR)
+            else:
+                x0, y0 = 0, 0
+                x1, y1 = self.get_screen_size()
+            img = self.crop((x0, y0, x1, y1), frame)
             
-            template = cv2.imread(target)
+            template = self.templates.get(target)
             if template is None:
-                logging.error(f"模板文件不存在或无法读取: {target}")
-                return None
+                template = ImageProc.loadImage(target)
+                if template is None:
+                    logging.error(f"模板文件不存在或无法读取: {target}")
+                    return None
+                self.templates[target] = template
             
-            # 确保图像和模板大小合适
-            if img.shape[0] < template.shape[0] or img.shape[1] < template.shape[1]:
-                logging.warning(f"ROI区域({img.shape})小于模板大小({template.shape})")
-                return None
-            
-            res = cv2.matchTemplate(img, template, cv2.TM_CCOEFF_NORMED)
-            _, max_val, _, max_loc = cv2.minMaxLoc(res)
-            
-            if max_val > confidence:
-                h, w = template.shape[:2]
-                if rel_pos:
-                    center_x = max_loc[0] + w//2 + x0
-                    center_y = max_loc[1] + h//2 + y0
-                else:
-                    center_x = max_loc[0] + w//2
-                    center_y = max_loc[1] + h//2
-                    
-                logging.info(f"成功识别 {target[17:]} 置信度:{max_val:.2f} 坐标({center_x},{center_y})")
-                return (center_x, center_y)
-                
-            logging.debug(f"未识别到目标 {target[17:]} 置信度:{max_val:.2f}")
-            return None
+            return self.match_template(img, template, confidence, (x0, y0), os.path.basename(target))
             
         except Exception as e:
             logging.error(f"图像识别异常: {str(e)}")
             return None
 
-    def identify_scene(self) -> Scene:
-        """识别当前游戏场景"""
-        detected_elements = {}
-        
-        for element_name, (image_path, pos_info) in get_scene_elements().items():
-            result = self.check_image(
-                image_path, 
-                CONFIDENCE[element_name],  # 使用全局配置的置信度
-                pos_info
-            )
-            detected_elements[element_name] = bool(result)
+    def check_elements(self, elements: list, frame: Frame) -> list:
+        """
+        检查多个元素，有线程池时在同一画面上并行匹配
+
+        截图对象不能跨线程使用，因此先在当前线程截取全部区域；
+        返回结果与elements顺序一致，元素位置也在当前线程按顺序记录
+        """
+        if self.pool is None:
+            results = [self.check_element(element, frame) for element in elements]
+        else:
+            frame.load_all()
+            results = list(self.pool.map(lambda element: self.check_element(element, frame), elements))
+        for element, result in zip(elements, results):
             if result:
-                self.element_positions[element_name] = result
+                self.element_positions[element.name] = result
+        return results
 
-        for scene, config in SCENE_CONFIGS.items():
-            matches = True
-            for element, required in config.pattern.required_matches.items():
-                if required != detected_elements.get(element, False):
-                    matches = False
-                    break
-            if matches:
+    def evaluate_all(self, frame: Frame) -> Scene:
+        """检查全部元素后选择场景，用于使用线程池时的完整识别"""
+        detected = 0
+        for element, result in zip(self.registry.elements, self.check_elements(self.registry.elements, frame)):
+            if result:
+                detected |= 1 << element.bit
+        return self.registry.select(detected)
+
+    def identify_scene_by_index(self, frame: Frame) -> Optional[Scene]:
+        """
+        使用场景索引对整屏截图分类，只对最可能的场景做模板验证
+
+        返回:
+            验证通过的场景，无法分类或验证失败时返回None
+        """
+        w, h = self.get_screen_size()
+        label = self.scene_index.nearest(self.crop((0, 0, w, h), frame), Config.SCENE_INDEX_MAX_DISTANCE)
+        scene = Scene.__members__.get(label.upper()) if label else None
+        if scene not in self.registry.scenes:
+            return None
+
+        for element, required in SCENE_CONFIGS[scene].pattern.required_matches.items():
+            result = self.check_element(self.registry.by_name[element], frame) if element in self.registry.by_name else None
+            if bool(result) != required:
+                logging.debug("场景索引候选 %s 验证失败: %s", label, element)
+                return None
+            if result:
+                self.element_positions[element] = result
+        return scene
+
+    def identify_scene(self) -> Scene:
+        """识别当前游戏场景，并更新current_scene和场景转移模型"""
+        self.capture_time = 0.0
+        with Trace.span("identify_scene", "scene"):
+            scene = self.detect_scene()
+        self.unknown_cycles = self.unknown_cycles + 1 if scene == Scene.UNKNOWN else 0
+        if self.window is not None and self.unknown_cycles >= Config.WINDOW_RECHECK_UNKNOWN:
+            self.unknown_cycles = 0
+            try:
+                self.refresh_window()
+            except Exception as e:
+                logging.warning(f"重新查询游戏窗口失败: {e}")
+        if scene != Scene.UNKNOWN and self.last_known_scene not in (Scene.UNKNOWN, scene):
+            self.transitions.observe(self.last_known_scene, scene)
+        if scene != Scene.UNKNOWN:
+            self.last_known_scene = scene
+        if scene != self.current_scene:
+            now = Clock.monotonic()
+            Metrics.sceneDwell.labels(self.current_scene.name).observe(now - self.scene_since)
+            self.scene_since = now
+            if scene.name in Config.RUN_COMPLETE_SCENES:
+                Metrics.runs.inc()
+        self.current_scene = scene
+        return scene
+
+    def detect_scene(self) -> Scene:
+        """
+        识别当前画面，每个周期每个截取区域最多截图一次
+
+        有场景索引时先按索引分类；否则先检查当前场景及其最可能的后继场景，
+        候选场景匹配且弹出在其上的场景（Config.SCENE_OVERLAYS）已排除时直接作为结果，通常只需一次匹配；
+        都未命中时按需逐元素识别，已检查过的元素结果会被复用；
+        每隔FULL_SWEEP_INTERVAL个周期跳过优先检查做一次完整识别，有线程池时完整识别并行检查全部元素
+        """
+        try:
+            frame = self.capture_frame()
+        except Exception as e:
+            logging.error(f"截图异常: {str(e)}")
+            return Scene.UNKNOWN
+
+        if self.scene_index is not None:
+            scene = self.identify_scene_by_index(frame)
+            if scene is not None:
                 return scene
 
-        return Scene.UNKNOWN
+        def check(element: SceneElement) -> bool:
+            result = self.check_element(element, frame)
+            if result:
+                self.element_positions[element.name] = result
+            return bool(result)
 
-    def handle_scene(self, scene: Scene):
-        """处理特定场景的操作"""
-        config = SCENE_CONFIGS.get(scene)
-        if config:
-            logging.info(f"处理场景: {config.description}")
-            config.handler(self)
+        known, detected = 0, 0
+        self.cycles_since_sweep += 1
+        if self.cycles_since_sweep < Config.FULL_SWEEP_INTERVAL and self.last_known_scene != Scene.UNKNOWN:
+            candidates = [self.last_known_scene] + self.transitions.likely_next(self.last_known_scene)
+            for scene in candidates:
+                if scene not in self.registry.scenes:
+                    continue
+                matched, known, detected = self.registry.try_scene(scene, check, known, detected)
+                if matched:
+                    return scene
         else:
+            self.cycles_since_sweep = 0
+            self.registry.set_weights(self.transitions.frequencies())
+            if self.pool is not None:
+                return self.evaluate_all(frame)
+
+        return self.registry.decide(check, known, detected)
+
+    def handle_scene(self, scene: Scene) -> bool:
+        """
+        处理特定场景的操作，不等待操作执行
+
+        同一场景在上一次的操作执行完并经过hold秒前不重复处理；
+        识别到其它场景时取消尚未执行的操作，立即处理新场景
+
+        返回:
+            是否调用了处理函数
+        """
+        config = SCENE_CONFIGS.get(scene)
+        if not config:
             logging.warning(f"未知场景: {scene}")
+            return False
+        if self.plan is not None:
+            if scene == self.handled_scene:
+                if not self.plan.ready(Clock.monotonic()):
+                    return False
+            elif self.input.busy():
+                logging.info(f"场景变为 {scene.name}，取消 {self.handled_scene.name} 未执行的操作")
+                self.input.cancel()
+
+        if logging.root.isEnabledFor(logging.INFO):
+            logging.info("处理场景: %s", config.description, extra=Log.fields(scene=scene.name))
+        with Trace.span("handle_scene", "scene", scene.name):
+            result = config.handler(self)
+
+        self.handled_scene = scene
+        self.plan = self.input.submit(result) if isinstance(result, Plan) else None
+        return True
+
+    def cancel_actions(self):
+        """取消所有尚未执行的操作，暂停脚本时使用"""
+        self.input.cancel()
+        self.plan = None
 
     def show_intervention_dialog(self):
-        """显示需要人工介入的提示窗口"""
-        show_message_dialog(
-            "需要人工介入",
-            "检测到需要人工操作。\n完成后请按Home键继续运行脚本。"
-        ) 
\ No newline at end of file
+        """在单独的线程中显示需要人工介入的提示窗口，对话框是模态的，不能阻塞识别线程"""
+        threading.Thread(
+            target=show_message_dialog,
+            args=("需要人工介入", "检测到需要人工操作。\n完成后请按Home键继续运行脚本。"),
+            name="dialog",
+            daemon=True
+        ).start()
@@ -3,50 +3,21 @@
 提供通用的工具函数和辅助功能
 """
 
-import time
 import logging
-import numpy as np
-import pyautogui
-import pydirectinput
-import keyboard
-import tkinter.messagebox
-from typing import Tuple
+import threading
 
-def click_random(pos_area: Tuple[Tuple[int, int], Tuple[int, int]]):
-    """
-    在指定区域内随机点击
-    
-    参数:
-        pos_area: 包含两个坐标点的区域范围 ((x1,y1), (x2,y2))
-    """
-    (x1, y1), (x2, y2) = pos_area
-    x = np.random.randint(x1, x2)
-    y = np.random.randint(y1, y2)
-    logging.info(f"随机点击坐标 X:{x} Y:{y}")
-    safe_click(x, y)
+# keyboard、tkinter只在用到时导入，使没有桌面环境时也能导入本模块
 
-def safe_click(x: int, y: int, delay: float = 0.5):
-    """
-    安全的点击操作，包含异常处理和延迟
-    
-    参数:
-        x: 点击位置的X坐标
-        y: 点击位置的Y坐标
-        delay: 点击后的延迟时间（秒）
-    """
-    try:
-        pyautogui.click(x, y)
-        time.sleep(delay)
-    except Exception as e:
-        logging.error(f"点击操作失败: {e}")
-
-def setup_keyboard_control(manager):
+def setup_keyboard_control(manager, on_change=None):
     """
     设置键盘控制
     
     参数:
         manager: 场景管理器实例
+        on_change: 运行状态改变后的回调，用于唤醒休眠中的主循环
     """
+    import keyboard
+
     def on_home():
         if manager.manual_intervention_needed:
             manager.manual_intervention_needed = False
@@ -54,14 +25,23 @@ def setup_keyboard_control(manager):
         else:
             manager.script_running = True
             logging.info("▶ 脚本开始运行")
+        if on_change:
+            on_change()
 
     def on_end():
         manager.script_running = False
         logging.info("⏸ 脚本已暂停")
+        if on_change:
+            on_change()
 
     keyboard.on_press_key('home', lambda _: on_home())
     keyboard.on_press_key('end', lambda _: on_end())
 
+def watch_exit_key():
+    """在后台线程中监听Esc键"""
+    import keyboard
+    threading.Thread(target=lambda: keyboard.wait('esc'), daemon=True).start()
+
 def show_message_dialog(title: str, message: str):
     """
     显示消息对话框
@@ -70,6 +50,8 @@ def show_message_dialog(title: str, message: str):
         title: 对话框标题
         message: 对话框消息内容
     """
+    import tkinter
+    import tkinter.messagebox
     root = tkinter.Tk()
     root.withdraw()
     tkinter.messagebox.showwarning(title, message)
@@ -0,0 +1,91 @@
+"""
+游戏窗口定位模块
+按标题查找游戏窗口并缓存其客户区位置，截图和点击都以客户区为坐标原点；
+窗口位置只在截图失败时重新查询
+"""
+
+import logging
+from typing import Dict, Optional, Tuple
+
+class WindowNotFound(Exception):
+    """找不到指定标题的窗口，或窗口不可见"""
+
+class Win32WindowProvider:
+    """通过pyautogui（pygetwindow）按标题查找窗口，用Win32 API取客户区的屏幕坐标"""
+
+    def client_rect(self, title: str) -> Tuple[int, int, int, int]:
+        """
+        返回标题包含title的第一个窗口客户区 (left, top, width, height)
+        """
+        import ctypes
+        from ctypes import wintypes
+        import pyautogui
+
+        for window in pyautogui.getWindowsWithTitle(title):
+            if window.isMinimized:
+                continue
+            hwnd = window._hWnd
+            rect = wintypes.RECT()
+            origin = wintypes.POINT(0, 0)
+            if not ctypes.windll.user32.GetClientRect(hwnd, ctypes.byref(rect)):
+                continue
+            ctypes.windll.user32.ClientToScreen(hwnd, ctypes.byref(origin))
+            width, height = rect.right - rect.left, rect.bottom - rect.top
+            if width > 0 and height > 0:
+                return (origin.x, origin.y, width, height)
+        raise WindowNotFound(title)
+
+class FakeWindowProvider:
+    """
+    测试用的窗口提供者，窗口位置由调用方设置，可在没有桌面环境的Linux上使用
+
+    参数:
+        windows: {标题: (left, top, width, height)}
+    """
+
+    def __init__(self, windows: Optional[Dict[str, tuple]] = None):
+        self.windows = dict(windows or {})
+        self.queries = 0
+
+    def client_rect(self, title: str) -> Tuple[int, int, int, int]:
+        self.queries += 1
+        for name, rect in self.windows.items():
+            if title in name:
+                return tuple(rect)
+        raise WindowNotFound(title)
+
+class GameWindow:
+    """缓存游戏窗口客户区的位置"""
+
+    def __init__(self, title: str, provider=None):
+        """
+        参数:
+            title: 窗口标题（包含匹配）
+            provider: 窗口提供者，需提供client_rect(title)，默认使用Win32WindowProvider
+        """
+        self.title = title
+        self.provider = provider if provider is not None else Win32WindowProvider()
+        self.rect = None
+
+    def geometry(self) -> Tuple[int, int, int, int]:
+        """返回缓存的客户区 (left, top, width, height)，第一次调用时查询"""
+        if self.rect is None:
+            self.rect = self.provider.client_rect(self.title)
+            logging.info(f"游戏窗口 {self.title}: 位置 ({self.rect[0]}, {self.rect[1]}) 大小 {self.rect[2]}x{self.rect[3]}")
+        return self.rect
+
+    def refresh(self) -> Tuple[int, int, int, int]:
+        """丢弃缓存重新查询窗口位置"""
+        self.rect = None
+        return self.geometry()
+
+    def size(self) -> Tuple[int, int]:
+        return self.geometry()[2:]
+
+    def origin(self) -> Tuple[int, int]:
+        return self.geometry()[:2]
+
+    def to_screen(self, x: int, y: int) -> Tuple[int, int]:
+        """客户区坐标转换为屏幕坐标"""
+        left, top = self.origin()
+        return (left + x, top + y)
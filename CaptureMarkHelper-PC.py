@@ -4,9 +4,10 @@
 
 import cv2
 import tkinter
-import os
 import tkinter.simpledialog
 import mss
+import numpy as np
+from MarkTool import MarkTool
 
 # 修改以下参数来运行
 
@@ -16,229 +17,84 @@ scale = 0.5
 # 截图保存路径，以/结束（确保路径已存在）
 save_file_path = "./BrownDust2/img/"
 
-# py变量字典文件
-pos_img_dict = "./BrownDust2/testDict.py"
+# 资源清单文件（JSON），BrownDust2的scene_config直接加载此文件（Config.RESOURCE_PATH）
+pos_img_dict = "./BrownDust2/brownDust2Dict.json"
 
-# 动作类型 1=截图  2=标点  3=标线（取起终点组成向量） 4=标记区域
+# 动作类型 1=截图  2=标点  3=标线（取起终点组成向量） 4=标记区域 5=像素签名（取若干点的颜色）
 action = 4
 
+# 像素签名每个探针的颜色容差，各通道差值不超过此值视为匹配
+sig_tolerance = 20
+
 # ===================================================
 # PC截图功能
-def capture_pc_screen(output_filename):
+def capture_pc_screen():
     with mss.mss() as sct:
         # 获取最大分辨率显示器
         monitor = sct.monitors[1]  # 主显示器
         sct_img = sct.grab(monitor)
         
-        # 转换为PNG并保存
-        mss.tools.to_png(sct_img.rgb, sct_img.size, output=output_filename)
-        return output_filename
-
-# 执行截图（保存为screen.png）
-img_file = "./screen.png"
-capture_pc_screen(img_file)
+        # 直接包装截图缓冲区为BGRA视图再转为BGR，不经过PNG文件
+        bgra = np.frombuffer(sct_img.raw, np.uint8).reshape(sct_img.height, sct_img.width, 4)
+        return cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR)
 
 # ===================================================
-# 以下部分保持原逻辑
-
-def isVarExist(varName):
-    if os.path.exists(pos_img_dict):
-        with open(pos_img_dict, 'r', encoding='utf-8') as f:
-            content = f.read()
-            return varName in content
-    return False
-
-def createVar(varName, value, type):
-    """
-    创建变量到字典文件中
-    
-    参数:
-        varName: 变量名
-        value: 变量值
-        type: 变量类型 1=图片路径 2=坐标点 3=向量 4=区域范围 5=图片位置信息
-    """
-    with open(pos_img_dict, 'a+', encoding='utf-8') as f:
-        if type == 1:
-            # 保存图片路径
-            f.write(f"{varName} = \"{value}\"\n")
-
-        elif type == 5:
-            # 保存图片位置信息
-            f.write(f"{value}\n")
-        else:
-            f.write(f"{varName} = {value}\n")
+# 以下部分保持原逻辑，标点、标线、标记区域、像素签名以及显示缓冲区见MarkTool
 
 def draw_Rect(event, x, y, flags, param):
-    global drawing, startPos, stopPos
-    if event == cv2.EVENT_LBUTTONDOWN:  # 响应鼠标按下
-        drawing = True
-        startPos = (x, y)
-    elif event == cv2.EVENT_MOUSEMOVE:  # 响应鼠标移动
-        if drawing == True:
-            img = img_source.copy()
-            cv2.rectangle(img, startPos, (x, y), (0, 255, 0), 2)
-            cv2.imshow('image', img)
-    elif event == cv2.EVENT_LBUTTONUP:  # 响应鼠标松开
-        drawing = False
-        stopPos = (x, y)
-    elif event == cv2.EVENT_RBUTTONUP:
-        if startPos == (0, 0) and stopPos == (0, 0):
-            return
-        x0, y0 = startPos
-        x1, y1 = stopPos
-        cropped = img_source[y0:y1, x0:x1]  # 裁剪坐标为[y0:y1, x0:x1]
-        res = tkinter.simpledialog.askstring(title="输入", prompt="请输入图片变量名：（存储路径为" + save_file_path + "）",
-                                             initialvalue="")
-        if res is not None:
-            if isVarExist(res):
-                tkinter.simpledialog.messagebox.showerror("错误", "该变量名已存在，请更换一个或手动去文件中删除！")
-            else:
-                # 保存裁剪的图片
-                cv2.imwrite(save_file_path + res + ".png", cropped)
-                # 计算相对位置信息
-                h_src, w_src = img_source.shape[:2]
-                rel_x0, rel_y0 = x0/w_src, y0/h_src  # 相对起始位置
-                rel_x1, rel_y1 = x1/w_src, y1/h_src  # 相对结束位置
-                rel_w = (x1-x0)/w_src  # 相对宽度
-                rel_h = (y1-y0)/h_src  # 相对高度
-                
-                # 创建图片路径变量
-                createVar(res, save_file_path + res + ".png", 1)
-                # 创建位置信息变量
-                pos_info = f"{res}_pos = {{'x0': {rel_x0:.4f}, 'y0': {rel_y0:.4f}, 'x1': {rel_x1:.4f}, 'y1': {rel_y1:.4f}, 'w': {rel_w:.4f}, 'h': {rel_h:.4f}}}"
-                createVar(res + "_pos", pos_info, 5)
-                
-                tkinter.simpledialog.messagebox.showinfo("提示", "创建完成！")
-    elif event == cv2.EVENT_MBUTTONUP:
-        if startPos == (0, 0) and stopPos == (0, 0):
-            return
-        x0, y0 = startPos
-        x1, y1 = stopPos
-        cropped = img_source[y0:y1, x0:x1]  # 裁剪坐标为[y0:y1, x0:x1]
-        cv2.imshow('cropImage', cropped)
-        cv2.waitKey(0)
-
-
-def draw_Point(event, x, y, flags, param):
-    global drawing, startPos, stopPos
-    if event == cv2.EVENT_LBUTTONDOWN:  # 响应鼠标按下
-        drawing = True
-        startPos = (x, y)
-        img = img_source.copy()
-        cv2.circle(img, startPos, 2, (0, 255, 0), 2)
-        cv2.putText(img, "Point:" + str(startPos), (50, 100), cv2.FONT_HERSHEY_SIMPLEX, 2.0, (0, 255, 0), 3)
-        print("Point:" + str(startPos))
-        cv2.imshow('image', img)
-    elif event == cv2.EVENT_RBUTTONUP:
-        if startPos == (0, 0):
-            return
-        res = tkinter.simpledialog.askstring(title="输入", prompt="请输入坐标 " + str(startPos) + " 变量名：", initialvalue="")
-        if res is not None:
-            if isVarExist(res):
-                tkinter.simpledialog.messagebox.showerror("错误", "该变量名已存在，请更换一个或手动去文件中删除！")
-            else:
-                createVar(res, startPos, 2)
-                tkinter.simpledialog.messagebox.showinfo("提示", "创建完成！")
-
-
-def draw_Line(event, x, y, flags, param):
-    global drawing, startPos, stopPos
-    if event == cv2.EVENT_LBUTTONDOWN:  # 响应鼠标按下
-        drawing = True
-        startPos = (x, y)
-    elif event == cv2.EVENT_MOUSEMOVE:  # 响应鼠标移动
-        if drawing == True:
-            img = img_source.copy()
-            cv2.line(img, startPos, (x, y), (0, 255, 0), 2)
-            cv2.imshow('image', img)
-    elif event == cv2.EVENT_LBUTTONUP:  # 响应鼠标松开
-        drawing = False
-        stopPos = (x, y)
-        print("startPoint:" + str(startPos) + " stopPoint:" + str(stopPos))
-    elif event == cv2.EVENT_RBUTTONUP:
-        if startPos == (0, 0) and stopPos == (0, 0):
-            return
-        res = tkinter.simpledialog.askstring(title="输入", prompt="请输入开始坐标 " + str(startPos) + " 到结束坐标 " + str(
-            stopPos) + " 组成向量的变量名：", initialvalue="")
-        if res is not None:
-            if isVarExist(res):
-                tkinter.simpledialog.messagebox.showerror("错误", "该变量名已存在，请更换一个或手动去文件中删除！")
-            else:
-                createVar(res, (startPos, stopPos), 3)
-                tkinter.simpledialog.messagebox.showinfo("提示", "创建完成！")
-
-
-def draw_Rect_Pos(event, x, y, flags, param):
-    global drawing, startPos, stopPos
-    if event == cv2.EVENT_LBUTTONDOWN:  # 响应鼠标按下
-        drawing = True
-        startPos = (x, y)
-    elif event == cv2.EVENT_MOUSEMOVE:  # 响应鼠标移动
-        if drawing == True:
-            img = img_source.copy()
-            cv2.rectangle(img, startPos, (x, y), (0, 255, 0), 2)
-            cv2.imshow('image', img)
-    elif event == cv2.EVENT_LBUTTONUP:  # 响应鼠标松开
-        drawing = False
-        stopPos = (x, y)
-        print("startPoint:" + str(startPos) + " stopPoint:" + str(stopPos))
-    elif event == cv2.EVENT_RBUTTONUP:
-        if startPos == (0, 0) and stopPos == (0, 0):
+    if tool.drag(event, x, y, cv2.rectangle):
+        return
+    if event == cv2.EVENT_RBUTTONUP:
+        if not tool.selected():
             return
-        x0, y0 = startPos
-        x1, y1 = stopPos
-        res = tkinter.simpledialog.askstring(title="输入", prompt="请输入矩形范围变量名：",
-                                             initialvalue="")
-        if res is not None:
-            if isVarExist(res):
-                tkinter.simpledialog.messagebox.showerror("错误", "该变量名已存在，请更换一个或手动去文件中删除！")
-            else:
-                createVar(res, (startPos, stopPos), 4)
-                tkinter.simpledialog.messagebox.showinfo("提示", "创建完成！")
+        x0, y0 = tool.startPos
+        x1, y1 = tool.stopPos
+        cropped = tool.img_source[y0:y1, x0:x1]  # 裁剪坐标为[y0:y1, x0:x1]
+
+        def create(res):
+            # 保存裁剪的图片
+            cv2.imwrite(save_file_path + res + ".png", cropped)
+            # 计算相对位置信息
+            h_src, w_src = tool.img_source.shape[:2]
+            rel_x0, rel_y0 = x0/w_src, y0/h_src  # 相对起始位置
+            rel_x1, rel_y1 = x1/w_src, y1/h_src  # 相对结束位置
+            rel_w = (x1-x0)/w_src  # 相对宽度
+            rel_h = (y1-y0)/h_src  # 相对高度
+
+            # 创建图片路径变量
+            tool.createVar(res, save_file_path + res + ".png", 1)
+            # 创建位置信息变量
+            pos_info = {'x0': round(rel_x0, 4), 'y0': round(rel_y0, 4), 'x1': round(rel_x1, 4), 'y1': round(rel_y1, 4),
+                        'w': round(rel_w, 4), 'h': round(rel_h, 4)}
+            tool.createVar(res + "_pos", pos_info, 6)
+        tool.askVar("请输入图片变量名：（存储路径为" + save_file_path + "）", create)
     elif event == cv2.EVENT_MBUTTONUP:
-        if startPos == (0, 0) and stopPos == (0, 0):
-            return
-        x0, y0 = startPos
-        x1, y1 = stopPos
-        cropped = img_source[y0:y1, x0:x1]  # 裁剪坐标为[y0:y1, x0:x1]
-        cv2.imshow('cropImage', cropped)
-        cv2.waitKey(0)
-   # ===================================================
-# 主程序流程
-drawing = False
-startPos = (0, 0)
-stopPos = (0, 0)
+        if tool.selected():
+            tool.preview()
 
+
+# ===================================================
+# 主程序流程
 try:
-    img_source = cv2.imread(img_file)
-    if img_source is None:
-        raise FileNotFoundError("截图文件生成失败，请检查权限和路径")
+    img_source = capture_pc_screen()
 except Exception as e:
-    tkinter.messagebox.showerror("错误", f"图片加载失败：{str(e)}")
+    tkinter.messagebox.showerror("错误", f"截图失败：{str(e)}")
     exit()
 
-h_src, w_src = img_source.shape[:2]
-w = int(w_src * scale)
-h = int(h_src * scale)
+tool = MarkTool(img_source, pos_img_dict, scale, sig_tolerance)
 
 root = tkinter.Tk()
 root.title('dialog')
 root.resizable(0, 0)
 root.withdraw()
 
-cv2.namedWindow('image', cv2.WINDOW_NORMAL)
-cv2.resizeWindow("image", w, h)
-
 # 设置鼠标回调
 mouse_handlers = {
     1: draw_Rect,
-    2: draw_Point,
-    3: draw_Line,
-    4: draw_Rect_Pos
+    2: tool.draw_Point,
+    3: tool.draw_Line,
+    4: tool.draw_Rect_Pos,
+    5: tool.draw_Signature
 }
-cv2.setMouseCallback('image', mouse_handlers.get(action, draw_Rect_Pos))
-
-cv2.imshow('image', img_source)
-cv2.waitKey(0)
-cv2.destroyAllWindows()
-root.destroy()
\ No newline at end of file
+tool.run(mouse_handlers.get(action, tool.draw_Rect_Pos))
+root.destroy()
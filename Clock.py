@@ -0,0 +1,129 @@
+import time as _time, threading
+
+# 时钟：框架中的等待和时间戳都通过当前时钟获取，脚本中的delay、random_delay、超时判断等可以不真正等待
+#   RealClock     真实时间，默认使用
+#   VirtualClock  虚拟时间，sleep只推进时间而不等待，用于回放会话（见SessionRecorder）和测试
+#   ScaledClock   按倍数加速的真实时间，用于长时间运行的稳定性测试
+# 截图、匹配等耗时统计测量的是真实的计算开销，仍直接使用time.perf_counter
+
+class RealClock:
+    # 当前时间戳（秒），与time.time()相同
+    def time(self):
+        return _time.time()
+
+    # 单调递增的时间（秒），用于计算间隔和截止时间
+    def monotonic(self):
+        return _time.perf_counter()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            _time.sleep(seconds)
+
+    # 等待事件最多timeout秒，事件被设置时提前返回，返回事件是否已被设置
+    def wait(self, event, timeout=None):
+        return event.wait(timeout)
+
+    # 线程从队列等处取得其他线程交来的工作时调用，at为交来时对方的monotonic()；真实时间无需对齐
+    def sync(self, at=None):
+        pass
+
+class VirtualClock:
+    # 虚拟时间从start（默认为创建时的真实时间戳）开始，只在sleep或wait超时时推进，不真正等待
+    # 每个线程有自己的时间线，第一次使用时从当前的虚拟时间开始，各线程的等待相互重叠而不是累加：
+    # 主循环等待5秒的同时输入线程等待3秒，虚拟时间只推进5秒；now为各线程中最远的时间
+    # 线程等到其他线程设置的事件时，时间线对齐到now；从队列取得其他线程交来的工作时，用sync对齐到交来的时间
+    def __init__(self, start=None):
+        self.start = _time.time() if start is None else start
+        self.now = 0.0
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    # 当前线程的虚拟时间
+    def cursor(self):
+        cursor = getattr(self.local, "cursor", None)
+        if cursor is None:
+            cursor = self.local.cursor = self.now
+        return cursor
+
+    def advance(self, seconds):
+        with self.lock:
+            cursor = self.local.cursor = self.cursor() + seconds
+            self.now = max(self.now, cursor)
+
+    # 当前线程的时间线对齐到at，at为None时对齐到最远的时间
+    def sync(self, at=None):
+        with self.lock:
+            at = self.now if at is None else at
+            cursor = getattr(self.local, "cursor", None)
+            self.local.cursor = at if cursor is None else max(cursor, at)
+
+    def time(self):
+        return self.start + self.cursor()
+
+    def monotonic(self):
+        return self.cursor()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.advance(seconds)
+
+    # 事件未被设置时直接推进timeout秒；timeout为None时只能等其他线程设置事件
+    def wait(self, event, timeout=None):
+        if timeout is None:
+            event.wait()
+        elif not event.is_set() and timeout > 0:
+            self.advance(timeout)
+        if event.is_set():
+            self.sync()
+            return True
+        return False
+
+class ScaledClock:
+    # 时间流逝速度为真实时间的factor倍，sleep(10)在factor为10时只等待1秒
+    def __init__(self, factor):
+        if factor <= 0:
+            raise ValueError("时钟倍数必须大于0: {0}".format(factor))
+        self.factor = factor
+        self.start = _time.time()
+        self.origin = _time.perf_counter()
+
+    def time(self):
+        return self.start + self.monotonic()
+
+    def monotonic(self):
+        return (_time.perf_counter() - self.origin) * self.factor
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            _time.sleep(seconds / self.factor)
+
+    def wait(self, event, timeout=None):
+        return event.wait(None if timeout is None else timeout / self.factor)
+
+    def sync(self, at=None):
+        pass
+
+# 当前使用的时钟
+current = RealClock()
+
+# 切换时钟，返回之前使用的时钟
+def use(clock):
+    global current
+    previous = current
+    current = clock
+    return previous
+
+def time():
+    return current.time()
+
+def monotonic():
+    return current.monotonic()
+
+def sleep(seconds):
+    current.sleep(seconds)
+
+def wait(event, timeout=None):
+    return current.wait(event, timeout)
+
+def sync(at=None):
+    current.sync(at)
@@ -0,0 +1,224 @@
+import os, re, time, cv2, numpy
+import Clock, Trace
+import settings as st
+
+# 设备后端注册表：adb、pc、replay、session、fake 后端提供统一的截图和输入接口，
+# 各后端依赖的模块（mss、pyautogui、pydirectinput等）只在创建该后端时才导入
+#   replay   按顺序回放一个目录中的截图（ReplayBackend），不核对输入，用于性能测试
+#   session  回放SessionRecorder录制的会话（SessionRecorder.SessionBackend），逐一核对输入操作和识图结果
+#
+# 后端接口：
+#   screenRect()                       截图坐标系下的屏幕范围 (left, top, width, height)
+#   beginFrame()                       开始新的一帧，之后的grab都来自同一帧；实时截图的后端可以不做任何事
+#   grab(left, top, width, height, out=None)   截取区域，返回BGR图像，给定out时写入out
+#   screenshot()                       开始新的一帧并截取整个屏幕
+#   touch(pos) / longTouch(pos, ms) / slide(start, stop, ms) / press(key)   输入操作
+
+_registry = {}
+
+# deviceType 数字与后端名称的对应关系，0为PC，1为安卓设备
+deviceTypes = {0: "pc", 1: "adb"}
+
+# 注册后端，factory(**kwargs)返回后端实例
+def register(name, factory):
+    _registry[name] = factory
+
+# 返回已注册的后端名称
+def available():
+    return sorted(_registry)
+
+# 按名称或deviceType创建后端
+def create(name, **kwargs):
+    name = deviceTypes.get(name, name)
+    if name not in _registry:
+        raise ValueError("未知的设备后端: {0}，可用后端: {1}".format(name, available()))
+    return _registry[name](**kwargs)
+
+# 从BGR或BGRA图像中切出区域并转为BGR，给定out时写入out
+def _cropBGR(image, left, top, width, height, out=None):
+    view = image[top:top + height, left:left + width]
+    if view.shape[0] != height or view.shape[1] != width:
+        raise ValueError("截取区域超出屏幕: {0}".format((left, top, width, height)))
+    if view.shape[2] == 4:
+        return cv2.cvtColor(view, cv2.COLOR_BGRA2BGR, dst=out)
+    if out is None:
+        return view.copy()
+    numpy.copyto(out, view)
+    return out
+
+class AdbBackend:
+    # 安卓设备：截图经由adb screencap，一帧内的多次grab复用同一张截图
+    def __init__(self, deviceID=""):
+        import ADBHelper
+        self.adb = ADBHelper
+        self.deviceID = deviceID
+        # 多台设备同时运行时各自使用一个截图文件
+        self.capPath = st.cache_path + ("screenCap_" + re.sub(r"\W", "_", deviceID) + ".png" if deviceID else "screenCap.png")
+        self.image = None
+        self.size = None
+
+    def screenRect(self):
+        if self.size is None:
+            self.size = self.adb.getScreenSize(self.deviceID)
+        return (0, 0) + tuple(self.size)
+
+    def beginFrame(self):
+        self.image = None
+
+    # 本帧的整屏截图，第一次用到时才截取
+    def capture(self):
+        if self.image is None:
+            os.makedirs(os.path.dirname(self.capPath), exist_ok=True)
+            self.adb.screenCapture(self.deviceID, self.capPath)
+            Clock.sleep(0.1)
+            with Trace.span("imread", "decode", self.deviceID):
+                self.image = cv2.imread(self.capPath)
+            if self.image is None:
+                raise IOError("设备截图失败: {0}".format(self.deviceID))
+        return self.image
+
+    def grab(self, left, top, width, height, out=None):
+        return _cropBGR(self.capture(), left, top, width, height, out)
+
+    def screenshot(self):
+        self.beginFrame()
+        return self.capture()
+
+    def touch(self, pos):
+        self.adb.touch(self.deviceID, pos)
+
+    def longTouch(self, pos, ms):
+        self.adb.longTouch(self.deviceID, pos, ms)
+
+    def slide(self, start, stop, ms):
+        self.adb.slide(self.deviceID, start, stop, ms)
+
+    def press(self, key):
+        self.adb.keyevent(self.deviceID, key)
+
+
+class PcBackend:
+    # PC：mss截取主显示器，pyautogui点击和拖动，pydirectinput按键（游戏通常只响应DirectInput）
+    # sct可传入任何提供monitors和grab(monitor)的对象，返回值需有raw、width、height
+    def __init__(self, sct=None):
+        if sct is None:
+            import mss
+            sct = mss.mss()
+        self.sct = sct
+        self._pyautogui = None
+        self._pydirectinput = None
+
+    def pyautogui(self):
+        if self._pyautogui is None:
+            import pyautogui
+            self._pyautogui = pyautogui
+        return self._pyautogui
+
+    def pydirectinput(self):
+        if self._pydirectinput is None:
+            import pydirectinput
+            self._pydirectinput = pydirectinput
+        return self._pydirectinput
+
+    def screenRect(self):
+        monitor = self.sct.monitors[1]
+        return (monitor['left'], monitor['top'], monitor['width'], monitor['height'])
+
+    def beginFrame(self):
+        pass
+
+    # 截图缓冲区用numpy.frombuffer包装为BGRA视图，不复制，只在颜色转换时写一次输出
+    def grab(self, left, top, width, height, out=None):
+        with Trace.span("mss.grab", "capture"):
+            shot = self.sct.grab({'left': left, 'top': top, 'width': width, 'height': height})
+        with Trace.span("cvtColor", "decode"):
+            bgra = numpy.frombuffer(shot.raw, numpy.uint8).reshape(shot.height, shot.width, 4)
+            return cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=out)
+
+    def screenshot(self):
+        return self.grab(*self.screenRect())
+
+    def touch(self, pos):
+        self.pyautogui().click(*pos)
+
+    def longTouch(self, pos, ms):
+        gui = self.pyautogui()
+        gui.mouseDown(*pos)
+        Clock.sleep(ms / 1000)
+        gui.mouseUp(*pos)
+
+    def slide(self, start, stop, ms):
+        gui = self.pyautogui()
+        gui.moveTo(*start)
+        gui.dragTo(*stop, duration=ms / 1000)
+
+    def press(self, key):
+        self.pydirectinput().press(key)
+
+class FakeBackend:
+    # 测试用后端：画面为内存中的图像，输入操作只记录到actions，不依赖任何设备
+    # overhead为每次grab调用模拟的固定耗时（秒）
+    def __init__(self, screen=None, size=(1920, 1080), overhead=0):
+        if screen is None:
+            screen = numpy.zeros((size[1], size[0], 3), numpy.uint8)
+        self.screen = screen
+        self.overhead = overhead
+        self.actions = []
+
+    def screenRect(self):
+        return (0, 0, self.screen.shape[1], self.screen.shape[0])
+
+    def beginFrame(self):
+        pass
+
+    def grab(self, left, top, width, height, out=None):
+        if self.overhead:
+            time.sleep(self.overhead)
+        return _cropBGR(self.screen, left, top, width, height, out)
+
+    def screenshot(self):
+        return self.grab(*self.screenRect())
+
+    def touch(self, pos):
+        self.actions.append(("touch", tuple(pos)))
+
+    def longTouch(self, pos, ms):
+        self.actions.append(("longTouch", tuple(pos), ms))
+
+    def slide(self, start, stop, ms):
+        self.actions.append(("slide", tuple(start), tuple(stop), ms))
+
+    def press(self, key):
+        self.actions.append(("press", key))
+
+class ReplayBackend(FakeBackend):
+    # 回放后端：按顺序回放一组截图，每次beginFrame切换到下一张，回放完后停在最后一张
+    # frames为截图目录（按文件名排序）或图像列表
+    def __init__(self, frames):
+        if isinstance(frames, str):
+            paths = [os.path.join(frames, name) for name in sorted(os.listdir(frames))]
+            frames = [img for img in (cv2.imread(p) for p in paths) if img is not None]
+        if len(frames) == 0:
+            raise ValueError("没有可回放的截图")
+        FakeBackend.__init__(self, frames[0])
+        self.frames = frames
+        self.position = -1
+
+    def beginFrame(self):
+        self.position = min(self.position + 1, len(self.frames) - 1)
+        self.screen = self.frames[self.position]
+
+    def screenshot(self):
+        self.beginFrame()
+        return self.grab(*self.screenRect())
+
+# 会话回放后端，SessionRecorder依赖本模块，因此在创建时才导入
+def _session(path):
+    import SessionRecorder
+    return SessionRecorder.replay(path)
+
+register("adb", AdbBackend)
+register("pc", PcBackend)
+register("fake", FakeBackend)
+register("replay", ReplayBackend)
+register("session", _session)
@@ -0,0 +1,325 @@
+import os, sys, json, time, random, socket, socketserver, threading, argparse
+import settings as st
+import AtomicFile
+
+# 模拟ADB设备：一个本地服务进程模拟任意多台安卓设备，adb替身程序把命令行转发给服务进程，
+# ADBHelper不需要任何修改即可连接这些设备，用于在一台机器上测试多设备下截图、识图、输入的吞吐量
+#
+# 每台设备按场景图运行：场景图为JSON文件，每个场景对应一张截图，点击场景中配置的区域时切换到另一个场景，
+# 也可以在停留一定时间后或收到按键时切换；截图、传输和输入按配置的延迟和带宽模拟耗时，所有输入操作写入日志
+#
+# 场景图格式（图片路径相对场景图文件所在目录）：
+# {
+#   "start": "main",
+#   "scenes": {
+#     "main":   {"image": "main.png", "template": "main_start.png", "taps": [{"rect": [x0, y0, x1, y1], "to": "battle"}]},
+#     "battle": {"image": "battle.png", "after": {"seconds": 5, "to": "main"}, "keys": {"4": "main"}}
+#   },
+#   "latency": {"shell": 0.02, "screencap": 0.1, "input": 0.03, "jitter": 0.2},
+#   "bandwidth": 30
+# }
+# latency中各项单位为秒，jitter为随机浮动比例；bandwidth为pull传输带宽（MB/s），0为不限；
+# template为压力测试中识别该场景用的模板，可省略
+
+# 服务进程默认端口（真实adb服务为5037）
+defaultPort = 5038
+
+# 输入日志文件
+logPath = st.cache_path + "fakeadb/inputs.jsonl"
+
+class SceneGraph:
+    def __init__(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        base = os.path.dirname(os.path.abspath(path))
+        self.start = data["start"]
+        self.latency = data.get("latency", {})
+        self.bandwidth = data.get("bandwidth", 0)
+        self.scenes = {}
+        for name, scene in data["scenes"].items():
+            scene = dict(scene)
+            with open(os.path.join(base, scene["image"]), 'rb') as f:
+                scene["png"] = f.read()
+            if "template" in scene:
+                scene["template"] = os.path.join(base, scene["template"])
+            scene.setdefault("taps", [])
+            scene.setdefault("keys", {})
+            self.scenes[name] = scene
+        if self.start not in self.scenes:
+            raise ValueError("起始场景不存在: {0}".format(self.start))
+        self.size = _pngSize(self.scenes[self.start]["png"])
+
+# 从PNG文件头读取宽高
+def _pngSize(png):
+    return (int.from_bytes(png[16:20], "big"), int.from_bytes(png[20:24], "big"))
+
+class Device:
+    # 一台模拟设备：当前场景、设备上的文件（截图）和统计
+    def __init__(self, serial, graph, server):
+        self.serial = serial
+        self.graph = graph
+        self.server = server
+        self.scene = graph.start
+        self.entered = time.time()
+        self.files = {}
+        self.lock = threading.Lock()
+        self.stats = {"captures": 0, "pulls": 0, "bytes": 0, "inputs": 0, "transitions": 0}
+
+    # 当前场景，停留时间超过after.seconds时自动切换
+    def current(self):
+        after = self.graph.scenes[self.scene].get("after")
+        if after is not None and time.time() - self.entered >= after["seconds"]:
+            self.enter(after["to"])
+        return self.scene
+
+    def enter(self, scene):
+        if scene not in self.graph.scenes:
+            return
+        self.scene = scene
+        self.entered = time.time()
+        self.stats["transitions"] += 1
+
+    def tap(self, x, y):
+        for tap in self.graph.scenes[self.current()]["taps"]:
+            x0, y0, x1, y1 = tap["rect"]
+            if x0 <= x <= x1 and y0 <= y <= y1:
+                self.enter(tap["to"])
+                return
+
+    def key(self, code):
+        to = self.graph.scenes[self.current()]["keys"].get(str(code))
+        if to is not None:
+            self.enter(to)
+
+    def input(self, op, args):
+        with self.lock:
+            scene = self.current()
+            self.stats["inputs"] += 1
+            if op == "tap":
+                self.tap(*args[:2])
+            elif op == "swipe" and args[0:2] == args[2:4]:
+                # ADBHelper.longTouch用起点终点相同的swipe实现长按，视为点击
+                self.tap(*args[:2])
+            elif op == "keyevent":
+                self.key(args[0])
+            self.server.log({"t": round(time.time(), 4), "device": self.serial, "scene": scene,
+                             "op": op, "args": args, "to": self.scene})
+
+class FakeAdbServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, graph, devices, port=defaultPort, log=logPath):
+        self.graph = graph
+        self.devices = {serial: Device(serial, graph, self) for serial in devices}
+        self.logLock = threading.Lock()
+        self.logFile = None
+        if log:
+            os.makedirs(os.path.dirname(log) or ".", exist_ok=True)
+            self.logFile = open(log, 'a', encoding='utf-8')
+        socketserver.ThreadingTCPServer.__init__(self, ("127.0.0.1", port), _Handler)
+
+    def log(self, event):
+        if self.logFile is None:
+            return
+        with self.logLock:
+            self.logFile.write(json.dumps(event, ensure_ascii=False) + "\n")
+            self.logFile.flush()
+
+    # 模拟耗时，kind为latency中的项
+    def wait(self, kind, extra=0):
+        seconds = self.graph.latency.get(kind, 0)
+        jitter = self.graph.latency.get("jitter", 0)
+        if jitter:
+            seconds *= random.uniform(1 - jitter, 1 + jitter)
+        if seconds + extra > 0:
+            time.sleep(seconds + extra)
+
+    # 执行一条adb命令，返回(输出, 退出码)
+    def execute(self, argv):
+        serial = None
+        if argv[:1] == ["-s"] and len(argv) >= 2:
+            serial, argv = argv[1], argv[2:]
+        if len(argv) == 0:
+            return "", 1
+        cmd = argv[0]
+        if cmd == "devices":
+            return "List of devices attached\n" + "".join("{0}\tdevice\n".format(s) for s in self.devices) + "\n", 0
+        if cmd in ("kill-server", "start-server"):
+            return "", 0
+        if cmd == "fake-stats":
+            return json.dumps({s: dict(d.stats, scene=d.scene) for s, d in self.devices.items()}) + "\n", 0
+
+        if serial is None:
+            if len(self.devices) != 1:
+                return "adb: more than one device/emulator\n", 1
+            serial = next(iter(self.devices))
+        device = self.devices.get(serial)
+        if device is None:
+            return "adb: device '{0}' not found\n".format(serial), 1
+
+        if cmd == "pull" and len(argv) >= 3:
+            data = device.files.get(argv[1].lstrip("/"))
+            if data is None:
+                return "adb: error: remote object '{0}' does not exist\n".format(argv[1]), 1
+            bandwidth = self.graph.bandwidth
+            self.wait("shell", len(data) / (bandwidth * 1024 * 1024) if bandwidth else 0)
+            AtomicFile.write(argv[2], data)
+            device.stats["pulls"] += 1
+            device.stats["bytes"] += len(data)
+            return "{0}: 1 file pulled\n".format(argv[1]), 0
+
+        if cmd == "shell":
+            return self.shell(device, argv[1:])
+        return "adb: unknown command {0}\n".format(cmd), 1
+
+    def shell(self, device, args):
+        if args[:2] == ["screencap", "-p"] and len(args) >= 3:
+            self.wait("screencap")
+            with device.lock:
+                device.files[args[2].lstrip("/")] = self.graph.scenes[device.current()]["png"]
+                device.stats["captures"] += 1
+            return "", 0
+        if args[:2] == ["wm", "size"]:
+            self.wait("shell")
+            return "Physical size: {0}x{1}\n".format(*self.graph.size), 0
+        if args[:1] == ["input"]:
+            # input [touchscreen] tap x y / input swipe x1 y1 x2 y2 [ms] / input keyevent k
+            rest = args[2:] if args[1:2] == ["touchscreen"] else args[1:]
+            op, values = rest[0], rest[1:]
+            if op in ("tap", "swipe"):
+                values = [int(float(v)) for v in values]
+            self.wait("input", values[4] / 1000 if op == "swipe" and len(values) > 4 else 0)
+            device.input(op, values)
+            return "", 0
+        return "/system/bin/sh: {0}: not found\n".format(args[0] if args else ""), 127
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        request = json.loads(self.rfile.readline().decode("utf-8"))
+        try:
+            stdout, code = self.server.execute(request["argv"])
+        except Exception as e:
+            stdout, code = "fakeadb: {0}\n".format(e), 1
+        self.wfile.write(json.dumps({"stdout": stdout, "code": code}).encode("utf-8"))
+
+# 替身程序：把命令行转发给服务进程并按原样输出结果
+def client(argv, port=None):
+    port = port or int(os.environ.get("FAKEADB_PORT", defaultPort))
+    try:
+        with socket.create_connection(("127.0.0.1", port)) as s:
+            s.sendall(json.dumps({"argv": argv}).encode("utf-8") + b"\n")
+            s.shutdown(socket.SHUT_WR)
+            data = s.makefile('rb').read()
+    except OSError:
+        sys.stderr.write("fakeadb: 服务进程未启动（端口 {0}）\n".format(port))
+        return 1
+    res = json.loads(data.decode("utf-8"))
+    sys.stdout.write(res["stdout"])
+    sys.stdout.flush()
+    return res["code"]
+
+# 在directory下生成名为adb的替身程序（Linux为adb，Windows为adb.bat），把该目录放到PATH最前面即可代替真实的adb
+def install(directory, port=defaultPort):
+    os.makedirs(directory, exist_ok=True)
+    script = os.path.abspath(__file__)
+    sh = os.path.join(directory, "adb")
+    with open(sh, 'w', newline='\n') as f:
+        f.write('#!/bin/sh\nFAKEADB_PORT="${{FAKEADB_PORT:-{0}}}" exec "{1}" "{2}" client "$@"\n'.format(port, sys.executable, script))
+    os.chmod(sh, 0o755)
+    with open(os.path.join(directory, "adb.bat"), 'w', newline='\r\n') as f:
+        f.write('@if not defined FAKEADB_PORT set FAKEADB_PORT={0}\n@"{1}" "{2}" client %*\n'.format(port, sys.executable, script))
+    return directory
+
+# 启动服务进程，devices为设备数量，设备名为 fake-1 ... fake-N
+def serve(graphPath, devices=1, port=defaultPort, log=logPath, background=False):
+    server = FakeAdbServer(SceneGraph(graphPath), ["fake-{0}".format(i + 1) for i in range(devices)], port, log)
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    else:
+        print("【模拟ADB】{0} 台设备，端口 {1}，分辨率 {2}x{3}".format(devices, port, *server.graph.size))
+        server.serve_forever()
+    return server
+
+# 压力测试中的单台设备：截图、按场景模板识别、点击该场景第一个点击区域，返回各阶段耗时列表
+def _loadWorker(args):
+    graphPath, serial, seconds = args
+    import cv2, ImageProc, DeviceBackend
+    graph = SceneGraph(graphPath)
+    templates = [(name, cv2.imread(s["template"])) for name, s in graph.scenes.items() if "template" in s]
+    backend = DeviceBackend.create("adb", deviceID=serial)
+    timings = {"capture": [], "match": [], "input": []}
+    end = time.time() + seconds
+    while time.time() < end:
+        t0 = time.perf_counter()
+        screen = backend.screenshot()
+        t1 = time.perf_counter()
+        found = None
+        for name, template in templates:
+            if ImageProc.locate(screen, template, 0.9) is not None:
+                found = name
+                break
+        t2 = time.perf_counter()
+        timings["capture"].append(t1 - t0)
+        timings["match"].append(t2 - t1)
+        if found is not None and graph.scenes[found]["taps"]:
+            x0, y0, x1, y1 = graph.scenes[found]["taps"][0]["rect"]
+            backend.touch((random.randint(x0, x1), random.randint(y0, y1)))
+            timings["input"].append(time.perf_counter() - t2)
+    return serial, timings
+
+def _percentile(values, p):
+    if len(values) == 0:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+# 压力测试：启动服务进程和devices个脚本进程，运行seconds秒，输出吞吐量和各阶段耗时分位数
+def load(graphPath, devices, seconds, port=defaultPort):
+    import multiprocessing, tempfile
+    server = serve(graphPath, devices, port, log=None, background=True)
+    shim = install(tempfile.mkdtemp(prefix="fakeadb"), port)
+    os.environ["PATH"] = shim + os.pathsep + os.environ["PATH"]
+    os.environ["FAKEADB_PORT"] = str(port)
+    jobs = [(graphPath, serial, seconds) for serial in server.devices]
+    with multiprocessing.Pool(devices) as pool:
+        results = pool.map(_loadWorker, jobs)
+    server.shutdown()
+
+    merged = {"capture": [], "match": [], "input": []}
+    for _, timings in results:
+        for key, values in timings.items():
+            merged[key] += values
+    cycles = len(merged["capture"])
+    transitions = sum(d.stats["transitions"] for d in server.devices.values())
+    print("【压力测试】{0} 台设备 {1} 秒：共 {2} 个周期（{3:.1f} 周期/秒），{4} 次点击，{5} 次场景切换".format(
+        devices, seconds, cycles, cycles / seconds, len(merged["input"]), transitions))
+    for key, values in merged.items():
+        print("    {0:8s} p50 {1:7.1f}ms  p95 {2:7.1f}ms  p99 {3:7.1f}ms".format(
+            key, _percentile(values, 0.5) * 1000, _percentile(values, 0.95) * 1000, _percentile(values, 0.99) * 1000))
+    return merged
+
+# 命令行：
+#   python FakeADB.py serve 场景图.json [--devices N] [--port P]     启动服务进程
+#   python FakeADB.py install 目录 [--port P]                        生成adb替身程序
+#   python FakeADB.py stats [--port P]                              查看各设备的统计
+#   python FakeADB.py load 场景图.json [--devices N] [--seconds S]  压力测试
+#   python FakeADB.py client adb参数...                             替身程序使用
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["client"]:
+        sys.exit(client(sys.argv[2:]))
+    parser = argparse.ArgumentParser(description="模拟ADB设备")
+    parser.add_argument("command", choices=["serve", "install", "stats", "load"])
+    parser.add_argument("path", nargs="?")
+    parser.add_argument("--devices", type=int, default=1)
+    parser.add_argument("--port", type=int, default=defaultPort)
+    parser.add_argument("--seconds", type=float, default=30)
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args.path, args.devices, args.port)
+    elif args.command == "install":
+        print("【模拟ADB】已生成替身程序，请将 {0} 放到PATH最前面".format(install(args.path or ".", args.port)))
+    elif args.command == "stats":
+        sys.exit(client(["fake-stats"], args.port))
+    else:
+        load(args.path, args.devices, args.seconds, args.port)
@@ -1,26 +1,430 @@
-import cv2, numpy
+import cv2, numpy, os, json, atexit, threading
+import Clock, Trace, Log, AtomicFile
+import settings as st
 
-# 从source图片中查找wanted图片所在的位置，当置信度大于accuracy时返回找到的最大置信度位置的左上角坐标
-def locate(source, wanted, accuracy=0.90):
-    screen_cv2 = cv2.imread(source)
-    wanted_cv2 = cv2.imread(wanted)
+# 位置先验缓存：按 模板|分辨率 记录模板命中过的位置，查找时先在最可能的位置附近的小窗口内匹配
+# 结构为 {key: {"mtime": 模板文件修改时间, "hits": [[x, y, 命中次数, 最后命中时间, 连续未命中次数], ...]}}
+_priors = None
+_priorsDirty = False
+_priorsSavedAt = 0
+_priorsLock = threading.Lock()
+
+# 多尺度匹配学习到的最佳缩放比例，结构为 {"设备|模板族": 比例}
+_scales = None
+_scaledTemplates = {}
+_scalesLock = threading.Lock()
+
+# 尚未学习比例时完整搜索未命中的时间，结构为 {(设备|模板族, 模板路径): Clock.monotonic()}，scaleRetryInterval秒内不再重复搜索
+_sweepMisses = {}
+
+# 模板分析工具(TemplateAnalyzer)推荐的逐模板置信度阈值，结构为 {规范化的模板路径: 阈值}
+_thresholds = None
+
+# 是否读写位置先验和缩放比例文件；回放会话时改用录制时的快照（见useState），为False
+_persist = True
+
+# 已加载的资源包（见ResourceBundle），读取图片路径时先在资源包中查找，找不到再读取图片文件
+bundles = []
+
+# 启用资源包，同一个文件只启用一次
+def useBundle(bundle):
+    if all(b.path != bundle.path for b in bundles):
+        bundles.append(bundle)
+
+# 读取阈值文件（见TemplateAnalyzer），path为None时读取thresholdPath，多次调用时合并
+def loadThresholds(path=None):
+    global _thresholds
+    if _thresholds is None:
+        _thresholds = {}
+    if path is None:
+        path = st.thresholdPath
+    if not os.path.exists(path):
+        return _thresholds
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return _thresholds
+    for key, entry in data.get("templates", {}).items():
+        _thresholds[os.path.normpath(key)] = entry["threshold"]
+    return _thresholds
+
+# 返回模板的置信度阈值，没有分析结果时使用已启用的资源包中打包的置信度，都没有时返回default
+# 缩放后的模板（见ResourceScaler）使用原模板的阈值
+def threshold(wanted, default):
+    if not isinstance(wanted, str):
+        return default
+    if _thresholds is None:
+        loadThresholds()
+    key = os.path.normpath(wanted)
+    value = _thresholds.get(key)
+    if value is None:
+        for path, v in _thresholds.items():
+            if key.endswith(os.sep + path):
+                value = v
+                break
+    if value is None:
+        for bundle in bundles:
+            value = bundle.threshold(wanted)
+            if value is not None:
+                break
+    return default if value is None else value
+
+# 读取图片，source可以是图片路径，也可以是已经读入内存的图片数组
+def loadImage(source):
+    if isinstance(source, numpy.ndarray):
+        return source
+    # 资源清单中的图片条目（ResourceManifest.Template），第一次用到时读取并缓存
+    image = getattr(source, "image", None)
+    if image is not None:
+        return image
+    for bundle in bundles:
+        img = bundle.image(source)
+        if img is not None:
+            return img
+    with Trace.span("imread", "decode", source):
+        return cv2.imread(source)
+
+# 读取灰度图，资源包中有预先转换的灰度图时直接返回其视图
+def loadGray(source):
+    if isinstance(source, str):
+        for bundle in bundles:
+            img = bundle.image(source, gray=True)
+            if img is not None:
+                return img
+    img = loadImage(source)
+    if img is None or img.ndim == 2:
+        return img
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+# 将像素签名中的相对坐标（0-1之间的小数）换算为给定尺寸(w, h)下的像素坐标，整数坐标保持不变
+def resolveSignature(signature, size):
+    w, h = size
+    res = []
+    for x, y, color, tolerance in signature:
+        if isinstance(x, float):
+            x = min(int(x * w), w - 1)
+        if isinstance(y, float):
+            y = min(int(y * h), h - 1)
+        res.append((x, y, color, tolerance))
+    return res
+
+# 像素签名匹配：signature为若干(x, y, (b, g, r), tolerance)探针组成的列表，当所有探针处的颜色各通道差值均不超过tolerance时返回True
+# offset为screen左上角在签名坐标系中的位置，用于在截取的局部区域上判断签名
+# 签名中的相对坐标按size=(w, h)换算，size默认为screen的尺寸；screen为局部区域时需给定整屏尺寸
+def matchSignature(screen, signature, offset=(0, 0), size=None):
+    screen_cv2 = loadImage(screen)
+    if screen_cv2 is None or len(signature) == 0:
+        return False
+    h, w = screen_cv2.shape[:2]
+    signature = resolveSignature(signature, size or (w, h))
+
+    probes = numpy.array([(x, y) for x, y, _, _ in signature], dtype=numpy.intp)
+    colors = numpy.array([color for _, _, color, _ in signature], dtype=numpy.int16)
+    tolerances = numpy.array([tolerance for _, _, _, tolerance in signature], dtype=numpy.int16)
+
+    xs = probes[:, 0] - offset[0]
+    ys = probes[:, 1] - offset[1]
+    if xs.min() < 0 or ys.min() < 0 or xs.max() >= w or ys.max() >= h:
+        return False
+
+    # 使用花式索引一次取出所有探针像素，只比较BGR三个通道
+    pixels = screen_cv2[ys, xs, :3].astype(numpy.int16)
+    diff = numpy.abs(pixels - colors).max(axis=1)
+    return bool((diff <= tolerances).all())
+
+# 读取位置先验文件，丢弃超过priorMaxAge未命中的位置
+def loadPriors():
+    global _priors
+    _priors = {}
+    if not os.path.exists(st.priorPath):
+        return _priors
+    try:
+        with open(st.priorPath, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return _priors
+    now = Clock.time()
+    for key, prior in data.items():
+        prior["hits"] = [hit for hit in prior["hits"] if now - hit[3] <= st.priorMaxAge]
+        if len(prior["hits"]) > 0:
+            _priors[key] = prior
+    return _priors
+
+# 将位置先验写入文件，force为False时距上次写入不足priorSaveInterval秒则跳过
+def savePriors(force=True):
+    global _priorsDirty, _priorsSavedAt
+    with _priorsLock:
+        if _priors is None or not _priorsDirty or not _persist:
+            return
+        if not force and Clock.time() - _priorsSavedAt < st.priorSaveInterval:
+            return
+        data = json.dumps(_priors)
+        _priorsDirty = False
+        _priorsSavedAt = Clock.time()
+    AtomicFile.write(st.priorPath, data)
+
+atexit.register(savePriors)
+
+# 清空位置先验，wanted为None时清空全部，否则只清空该模板路径的记录
+def clearPriors(wanted=None):
+    global _priors, _priorsDirty
+    with _priorsLock:
+        if wanted is None:
+            _priors = {}
+        elif _priors is not None:
+            for key in [k for k in _priors if k.split("|")[0] == wanted]:
+                del _priors[key]
+        _priorsDirty = True
+
+# 取出模板在该分辨率下的先验记录，模板文件被修改过时先验失效
+def _getPrior(wanted, screenShape):
+    if _priors is None:
+        loadPriors()
+    h, w = screenShape[:2]
+    key = "{0}|{1}x{2}".format(wanted, w, h)
+    mtime = os.path.getmtime(wanted) if os.path.exists(wanted) else 0
+    prior = _priors.get(key)
+    # 回放时使用录制时的快照，模板文件的修改时间可能与录制时不同，不再检查
+    if prior is None or (_persist and prior["mtime"] != mtime):
+        prior = {"mtime": mtime, "hits": []}
+        _priors[key] = prior
+    return prior
 
+# 记录一次命中，已有的邻近位置累加次数，否则作为新位置加入，超过priorHistory个时淘汰命中次数最少的
+def _recordHit(prior, loc):
+    global _priorsDirty
+    x, y = loc
+    now = Clock.time()
+    for hit in prior["hits"]:
+        if abs(hit[0] - x) <= 2 and abs(hit[1] - y) <= 2:
+            hit[0], hit[1] = x, y
+            hit[2] += 1
+            hit[3] = now
+            hit[4] = 0
+            break
+    else:
+        prior["hits"].append([x, y, 1, now, 0])
+        prior["hits"].sort(key=lambda h: -h[2])
+        del prior["hits"][st.priorHistory:]
+    _priorsDirty = True
+
+# 在screen的region=(x0, y0, x1, y1)区域内匹配，返回(最大置信度, 左上角坐标)，坐标为整图坐标
+def _matchIn(screen_cv2, wanted_cv2, region=None):
+    x0, y0 = 0, 0
+    if region is not None:
+        x0, y0, x1, y1 = region
+        screen_cv2 = screen_cv2[y0:y1, x0:x1]
+    if screen_cv2.shape[0] < wanted_cv2.shape[0] or screen_cv2.shape[1] < wanted_cv2.shape[1]:
+        return -1, None
     result = cv2.matchTemplate(screen_cv2, wanted_cv2, cv2.TM_CCOEFF_NORMED)
     min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+    return max_val, (max_loc[0] + x0, max_loc[1] + y0)
 
-    if max_val >= accuracy:
-        return max_loc
-    else:
+# 按位置先验依次在历史命中位置附近的小窗口内匹配，命中返回坐标，全部未命中返回None
+# 给定roi=(x0, y0, x1, y1)时窗口裁剪到roi内，裁剪后放不下模板的位置跳过，不计为未命中
+# 只在复制命中位置和更新计数时持有_priorsLock，模板匹配在锁外进行，其他线程查找时不必等待
+def _locateByPrior(screen_cv2, wanted_cv2, prior, accuracy, roi=None):
+    global _priorsDirty
+    h, w = screen_cv2.shape[:2]
+    bx0, by0, bx1, by1 = roi if roi is not None else (0, 0, w, h)
+    bx0, by0, bx1, by1 = max(0, bx0), max(0, by0), min(w, bx1), min(h, by1)
+    th, tw = wanted_cv2.shape[:2]
+    m = st.priorMargin
+    with _priorsLock:
+        hits = [(hit, hit[0], hit[1]) for hit in prior["hits"]]
+    found = None
+    missed = []
+    for hit, x, y in hits:
+        region = (max(bx0, x - m), max(by0, y - m), min(bx1, x + tw + m), min(by1, y + th + m))
+        if region[2] - region[0] < tw or region[3] - region[1] < th:
+            continue
+        max_val, loc = _matchIn(screen_cv2, wanted_cv2, region)
+        if max_val >= accuracy:
+            found = loc
+            break
+        missed.append(hit)
+    with _priorsLock:
+        # 连续多次未命中的位置视为失效；匹配期间已被其他线程淘汰的位置不再计数
+        for hit in missed:
+            if any(h is hit for h in prior["hits"]):
+                hit[4] += 1
+                if hit[4] >= st.priorMaxMiss:
+                    prior["hits"].remove(hit)
+                _priorsDirty = True
+        if found is not None:
+            _recordHit(prior, found)
+    return found
+
+# 读取多尺度匹配学习到的缩放比例
+def loadScales():
+    global _scales
+    _scales = {}
+    if os.path.exists(st.scalePath):
+        try:
+            with open(st.scalePath, 'r', encoding='utf-8') as f:
+                _scales = json.load(f)
+        except (OSError, ValueError):
+            _scales = {}
+    return _scales
+
+# 清空学习到的缩放比例，下次查找时重新进行完整的多尺度搜索
+def clearScales():
+    global _scales
+    with _scalesLock:
+        _scales = {}
+        _sweepMisses.clear()
+        if _persist:
+            AtomicFile.write(st.scalePath, json.dumps(_scales))
+
+# 多尺度匹配的键：设备（默认为截图分辨率）+ 模板族（默认为模板所在目录）
+def _scaleKey(wanted, screenShape, device=None):
+    if device is None:
+        h, w = screenShape[:2]
+        device = "{0}x{1}".format(w, h)
+    family = os.path.dirname(wanted) if isinstance(wanted, str) else ""
+    return "{0}|{1}".format(device, family)
+
+def _setScale(key, scale):
+    with _scalesLock:
+        _scales[key] = round(scale, 4)
+        if _persist:
+            AtomicFile.write(st.scalePath, json.dumps(_scales))
+
+# 深拷贝可转为JSON的状态，None保持不变
+def _copy(value):
+    return None if value is None else json.loads(json.dumps(value))
+
+# 返回位置先验、学习到的缩放比例和逐模板阈值的快照，录制会话时写入会话信息（见SessionRecorder）
+def snapshotState():
+    with _priorsLock:
+        priors = _copy(_priors if _priors is not None else loadPriors())
+    with _scalesLock:
+        scales = _copy(_scales if _scales is not None else loadScales())
+    thresholds = _copy(_thresholds if _thresholds is not None else loadThresholds())
+    return {"priors": priors, "scales": scales, "thresholds": thresholds}
+
+# 用快照替换位置先验、缩放比例和逐模板阈值，这些状态会影响locate返回的位置；
+# persist为False时不再写入位置先验和缩放比例文件，也不检查模板文件的修改时间，回放时查找结果只取决于快照和截图
+# 返回替换前的状态，传回本函数即可恢复
+def useState(state, persist=False):
+    global _priors, _priorsDirty, _scales, _thresholds, _persist
+    with _priorsLock, _scalesLock:
+        previous = {"priors": _priors, "scales": _scales, "thresholds": _thresholds,
+                    "persist": _persist, "dirty": _priorsDirty}
+        _priors = _copy(state.get("priors"))
+        _scales = _copy(state.get("scales"))
+        _thresholds = _copy(state.get("thresholds"))
+        _persist = state.get("persist", persist)
+        _priorsDirty = state.get("dirty", False)
+        _sweepMisses.clear()
+    return previous
+
+# 按比例缩放模板，模板为路径时缓存缩放结果
+def _scaledTemplate(wanted, wanted_cv2, scale):
+    if abs(scale - 1) < 1e-6:
+        return wanted_cv2
+    cacheKey = (wanted, round(scale, 4)) if isinstance(wanted, str) else None
+    if cacheKey in _scaledTemplates:
+        return _scaledTemplates[cacheKey]
+    h, w = wanted_cv2.shape[:2]
+    size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+    res = cv2.resize(wanted_cv2, size, interpolation=interpolation)
+    if cacheKey is not None:
+        _scaledTemplates[cacheKey] = res
+    return res
+
+# 在scaleRange范围内以scaleStep为步长搜索最佳缩放比例，返回(最大置信度, 左上角坐标, 比例)
+def _searchScales(screen_cv2, wanted, wanted_cv2, scales, roi=None):
+    best = (-1, None, 1.0)
+    for scale in scales:
+        max_val, loc = _matchIn(screen_cv2, _scaledTemplate(wanted, wanted_cv2, scale), roi)
+        if max_val > best[0]:
+            best = (max_val, loc, scale)
+    return best
+
+# 从source图片中查找wanted图片所在的位置，当置信度大于accuracy时返回找到的最大置信度位置的左上角坐标
+# 如果给定了像素签名signature，则先判断签名，签名不匹配时直接返回None，不再进行模板匹配
+# 给定roi=(x0, y0, x1, y1)时只在该区域内查找；wanted为路径且开启了位置先验时，先在历史命中位置附近（限于roi内）查找
+# 开启多尺度匹配时，每个设备(device)和模板族首次查找会搜索scaleRange内的所有比例并记住最佳比例，之后只在该比例附近匹配
+def locate(source, wanted, accuracy=0.90, signature=None, roi=None, multiScale=None, device=None):
+    with Trace.span("locate", "match", wanted if isinstance(wanted, str) else None):
+        screen_cv2 = loadImage(source)
+        if signature is not None and not matchSignature(screen_cv2, signature):
+            return None
+        wanted_cv2 = loadImage(wanted)
+
+        if multiScale is None:
+            multiScale = st.multiScale
+        scale = None
+        if multiScale:
+            if _scales is None:
+                loadScales()
+            key = _scaleKey(wanted, screen_cv2.shape, device)
+            scale = _scales.get(key)
+            if scale is None:
+                # 先按原尺寸匹配一次，未命中才搜索整个缩放范围；完整搜索未命中后scaleRetryInterval秒内只按原尺寸匹配，
+                # 轮询等待一个还未出现的模板时不会每次都搜索全部比例
+                max_val, max_loc = _matchIn(screen_cv2, wanted_cv2, roi)
+                best = 1.0
+                if max_val < accuracy:
+                    missKey = (key, wanted if isinstance(wanted, str) else None)
+                    missedAt = _sweepMisses.get(missKey)
+                    if missedAt is not None and Clock.monotonic() - missedAt < st.scaleRetryInterval:
+                        return None
+                    count = int(round((st.scaleRange[1] - st.scaleRange[0]) / st.scaleStep)) + 1
+                    scales = [st.scaleRange[0] + i * st.scaleStep for i in range(count)]
+                    max_val, max_loc, best = _searchScales(screen_cv2, wanted, wanted_cv2, scales, roi)
+                    if max_val < accuracy:
+                        _sweepMisses[missKey] = Clock.monotonic()
+                        return None
+                    _sweepMisses.pop(missKey, None)
+                Log.logger.info("【多尺度匹配】%s 的最佳缩放比例为 %.2f", key, best)
+                _setScale(key, best)
+                if st.usePrior and isinstance(wanted, str):
+                    with _priorsLock:
+                        _recordHit(_getPrior(wanted, screen_cv2.shape), max_loc)
+                return max_loc
+            unscaled = wanted_cv2
+            wanted_cv2 = _scaledTemplate(wanted, wanted_cv2, scale)
+
+        prior = None
+        if st.usePrior and isinstance(wanted, str):
+            with _priorsLock:
+                prior = _getPrior(wanted, screen_cv2.shape)
+            loc = _locateByPrior(screen_cv2, wanted_cv2, prior, accuracy, roi)
+            if loc is not None:
+                savePriors(False)
+                return loc
+
+        max_val, max_loc = _matchIn(screen_cv2, wanted_cv2, roi)
+
+        if max_val >= accuracy:
+            if prior is not None:
+                with _priorsLock:
+                    _recordHit(prior, max_loc)
+                savePriors(False)
+            return max_loc
+
+        # 已学习比例下未命中时，在其附近的窄带内再试一次，命中则更新比例
+        if scale is not None:
+            band = [scale - st.scaleBand, scale + st.scaleBand]
+            max_val, max_loc, best = _searchScales(screen_cv2, wanted, unscaled, band, roi)
+            if max_val >= accuracy:
+                _setScale(key, best)
+                return max_loc
         return None
 
 # 从source图片中查找wanted图片所在的位置，当置信度大于accuracy时返回找到的所有位置的左上角坐标（自动去重）
 def locate_all(source, wanted, accuracy=0.90):
     loc_pos = []
-    screen_cv2 = cv2.imread(source)
-    wanted_cv2 = cv2.imread(wanted)
+    screen_cv2 = loadImage(source)
+    wanted_cv2 = loadImage(wanted)
 
-    result = cv2.matchTemplate(screen_cv2, wanted_cv2, cv2.TM_CCOEFF_NORMED)
-    location = numpy.where(result >= accuracy)
+    with Trace.span("locate_all", "match", wanted if isinstance(wanted, str) else None):
+        result = cv2.matchTemplate(screen_cv2, wanted_cv2, cv2.TM_CCOEFF_NORMED)
+        location = numpy.where(result >= accuracy)
 
     ex, ey = 0, 0
     for pt in zip(*location[::-1]):
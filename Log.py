@@ -0,0 +1,177 @@
+import os, sys, json, time, queue, atexit, logging, threading, contextvars, logging.handlers
+import settings as st
+
+# 日志：框架的输出统一写入名为rsh的logger，经由队列交给后台线程写入控制台或文件，调用方不会因控制台缓慢而阻塞
+# 每条日志带设备上下文（device字段），可以输出为文本或每行一个JSON（便于多开时汇总检索）
+# 日志级别未开启时不做任何格式化；开启时消息的拼接也在后台线程中进行，参数请传入不会再被修改的值
+# 重复的日志（例如每个周期都识别失败的同一个目标）按repeatInterval汇总：间隔内只输出第一条，之后附带重复次数
+#
+# 用法：
+#   Log.logger.info("【识图】识别 %s 成功", target, extra=Log.fields(target=str(target)))
+#   Log.logger.info("【识图】识别 %s 失败", target, extra=Log.repeated(str(target)))
+
+logger = logging.getLogger("rsh")
+
+_device = "-"
+_context = contextvars.ContextVar("device", default=None)
+_handler = None
+_listener = None
+_target = None
+
+# 设置当前进程的设备名，日志的device字段默认使用此值
+def setDevice(name):
+    global _device
+    _device = str(name) if name else "-"
+
+# 在with块内（当前线程或协程）使用指定的设备名，同一进程驱动多台设备时使用
+class device:
+    def __init__(self, name):
+        self.name = str(name)
+
+    def __enter__(self):
+        self.token = _context.set(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        _context.reset(self.token)
+        return False
+
+# 结构化字段，作为extra传给日志函数，JSON格式输出时写入该条日志
+def fields(**values):
+    return {"fields": values}
+
+# 需要汇总的重复日志，key相同的日志在repeatInterval内只输出第一条；不给key时以消息模板和参数作为key
+def repeated(*key, **values):
+    return {"fields": values, "repeat": key or True}
+
+class _ContextFilter(logging.Filter):
+    # 为每条日志填入设备名和结构化字段
+    def filter(self, record):
+        name = _context.get()
+        record.device = name if name is not None else _device
+        if not hasattr(record, "fields"):
+            record.fields = None
+        return True
+
+class RepeatFilter(logging.Filter):
+    # 汇总重复日志：间隔内重复的日志被丢弃，间隔后的第一条附带被丢弃的次数，flush时输出尚未汇报的次数
+    def __init__(self, interval):
+        super().__init__()
+        self.interval = interval
+        self.seen = {}
+        self.lock = threading.Lock()
+
+    def key(self, record):
+        key = getattr(record, "repeat", None)
+        if key is True:
+            key = (record.msg, repr(record.args))
+        return key
+
+    def filter(self, record):
+        key = self.key(record)
+        if key is None:
+            return True
+        key = (record.name, record.levelno, key)
+        now = time.monotonic()
+        with self.lock:
+            state = self.seen.get(key)
+            if state is not None and now - state[0] < self.interval:
+                state[1] += 1
+                state[2] = record
+                return False
+            self.seen[key] = [now, 0, record]
+        if state is not None and state[1] > 0:
+            _appendRepeat(record, state[1], now - state[0])
+        return True
+
+    # 取出尚未汇报的重复日志（各key的最后一条，已附带次数）
+    def flush(self):
+        now = time.monotonic()
+        with self.lock:
+            pending = [(state[2], state[1], now - state[0]) for state in self.seen.values() if state[1] > 0]
+            self.seen.clear()
+        for record, count, elapsed in pending:
+            _appendRepeat(record, count, elapsed)
+        return [record for record, _, _ in pending]
+
+def _appendRepeat(record, count, elapsed):
+    note = "（{0:.1f} 秒内重复 {1} 次）".format(elapsed, count)
+    record.msg = str(record.msg) + note.replace("%", "%%")
+    record.repeatCount = count
+
+class JsonFormatter(logging.Formatter):
+    # 每条日志输出为一行JSON：t、level、device、logger、msg，以及结构化字段
+    def format(self, record):
+        data = {"t": round(record.created, 3), "level": record.levelname, "device": record.device,
+                "logger": record.name, "msg": record.getMessage()}
+        if record.fields:
+            data.update(record.fields)
+        if getattr(record, "repeatCount", None):
+            data["repeat"] = record.repeatCount
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    # 不在调用线程中格式化，记录原样交给后台线程
+    def prepare(self, record):
+        return record
+
+# 文本格式
+textFormat = "%(asctime)s %(levelname)s [%(device)s] %(message)s"
+
+def _formatter(fmt):
+    if fmt == "json":
+        return JsonFormatter()
+    return logging.Formatter(textFormat, datefmt="%H:%M:%S")
+
+# 配置日志输出：level为级别名或数值，fmt为"text"或"json"，path给定时同时写入文件，repeatInterval为重复日志的汇总间隔（秒）
+# root为True时接管根logger，使用logging模块的其他代码（如BrownDust2）的日志也经由同一个队列输出
+# 参数默认取settings中的logLevel、logFormat、logPath、logRepeatInterval；重复调用时替换之前的配置
+def setup(level=None, fmt=None, path=None, repeatInterval=None, root=False, stream=None):
+    global _handler, _listener, _target
+    shutdown()
+    level = level if level is not None else st.logLevel
+    formatter = _formatter(fmt or st.logFormat)
+    handlers = [logging.StreamHandler(stream or sys.stdout)]
+    path = path if path is not None else st.logPath
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        handlers.append(logging.FileHandler(path, encoding="utf-8"))
+    for h in handlers:
+        h.setFormatter(formatter)
+    records = queue.SimpleQueue()
+    _handler = _QueueHandler(records)
+    _handler.addFilter(_ContextFilter())
+    _handler.addFilter(RepeatFilter(st.logRepeatInterval if repeatInterval is None else repeatInterval))
+    _listener = logging.handlers.QueueListener(records, *handlers)
+    _listener.start()
+    _target = logging.getLogger() if root else logger
+    _target.addHandler(_handler)
+    _target.setLevel(level)
+    if root:
+        logger.setLevel(logging.NOTSET)
+    logger.propagate = root
+    return _handler
+
+# 输出尚未汇报的重复日志，等待后台线程写完全部日志后停止；程序退出时自动调用
+def shutdown():
+    global _handler, _listener, _target
+    if _handler is None:
+        return
+    for f in _handler.filters:
+        if isinstance(f, RepeatFilter):
+            for record in f.flush():
+                _handler.enqueue(record)
+    _target.removeHandler(_handler)
+    _listener.stop()
+    for h in _listener.handlers:
+        if isinstance(h, logging.FileHandler):
+            h.close()
+    _handler = _listener = _target = None
+
+atexit.register(shutdown)
+
+# 导入时配置rsh logger，脚本或BrownDust2可以再调用setup替换配置
+if not logger.handlers:
+    setup()
@@ -0,0 +1,213 @@
+import time, cv2
+import tkinter.simpledialog
+import ResourceManifest
+
+# 标点截取工具共用部分：CaptureMarkHelper（安卓截图）和CaptureMarkHelper-PC（PC截图）只负责取得截图和处理截图动作，
+# 资源清单写入、显示缓冲区的绘制以及标点、标线、标记区域、像素签名的鼠标回调都在这里，两个工具的行为保持一致
+#
+# 显示缓冲区：原图按scale预先缩放一次，鼠标坐标为显示坐标，截图和坐标仍从原图按比例换算；
+# 拖动时只恢复并重绘上一次覆盖的区域，重绘频率不超过refresh_rate
+
+# type=动作类型 1=截图  2=标点  3=标线（取起终点组成向量） 4=标记区域 5=像素签名，6为截图时一并保存的图片相对位置
+varTypes = {1: "image", 2: "point", 3: "vector", 4: "rect", 5: "signature", 6: "pos"}
+
+class MarkTool:
+    # source为原图（BGR），pos_img_dict为资源清单文件，scale为原图缩放到窗口中的比例，
+    # sig_tolerance为像素签名每个探针的颜色容差，refresh_rate为拖动时的最大重绘频率（次/秒），一般与显示器刷新率一致
+    def __init__(self, source, pos_img_dict, scale=0.5, sig_tolerance=20, refresh_rate=60):
+        self.img_source = source
+        # 资源清单在启动时读入内存，变量名按名称精确查找
+        self.manifest = ResourceManifest.Manifest(pos_img_dict)
+        self.scale = scale
+        self.sig_tolerance = sig_tolerance
+        self.refresh_rate = refresh_rate
+        h_src, w_src = source.shape[:2]
+        self.size = (int(w_src * scale), int(h_src * scale))
+        self.img_base = cv2.resize(source, self.size, interpolation=cv2.INTER_AREA)
+        self.img_display = self.img_base.copy()
+        self.dirty = None
+        self.last_redraw = 0.0
+        self.drawing = False
+        self.startPos = (0, 0)
+        self.stopPos = (0, 0)
+        self.sigProbes = []
+
+    def isVarExist(self, varName):
+        return varName in self.manifest
+
+    def createVar(self, varName, value, type):
+        # 新建清单时先记录截图分辨率，供ResourceScaler换算到其他分辨率
+        if self.manifest.resolution is None:
+            h_src, w_src = self.img_source.shape[:2]
+            self.manifest.resolution = (w_src, h_src)
+        self.manifest.add(varName, varTypes[type], value)
+
+    # 询问变量名，变量名不存在时调用create(变量名)创建，返回是否已创建
+    def askVar(self, prompt, create, suffix=""):
+        res = tkinter.simpledialog.askstring(title="输入", prompt=prompt, initialvalue="")
+        if res is None:
+            return False
+        if self.isVarExist(res + suffix):
+            tkinter.simpledialog.messagebox.showerror("错误", "该变量名已存在，请更换一个或手动去文件中删除！")
+            return False
+        create(res)
+        tkinter.simpledialog.messagebox.showinfo("提示", "创建完成！")
+        return True
+
+    # 显示坐标换算为原图坐标
+    def to_source(self, x, y):
+        h_src, w_src = self.img_source.shape[:2]
+        return (min(max(int(x / self.scale), 0), w_src - 1), min(max(int(y / self.scale), 0), h_src - 1))
+
+    # 原图坐标换算为显示坐标
+    def to_display(self, pos):
+        return (int(pos[0] * self.scale), int(pos[1] * self.scale))
+
+    # 把上一次绘制覆盖的区域恢复为原图
+    def restore_dirty(self):
+        if self.dirty is not None:
+            x0, y0, x1, y1 = self.dirty
+            self.img_display[y0:y1, x0:x1] = self.img_base[y0:y1, x0:x1]
+            self.dirty = None
+
+    # 记录本次绘制覆盖的区域，margin为线宽留出的余量
+    def mark_dirty(self, x0, y0, x1, y1, margin=4):
+        h, w = self.img_base.shape[:2]
+        x0, x1 = sorted((x0, x1))
+        y0, y1 = sorted((y0, y1))
+        rect = (max(0, x0 - margin), max(0, y0 - margin), min(w, x1 + margin + 1), min(h, y1 + margin + 1))
+        if self.dirty is not None:
+            d = self.dirty
+            rect = (min(d[0], rect[0]), min(d[1], rect[1]), max(d[2], rect[2]), max(d[3], rect[3]))
+        self.dirty = rect
+
+    # 距离上次重绘不足一帧时跳过本次鼠标移动事件
+    def throttled(self, force=False):
+        now = time.perf_counter()
+        if not force and now - self.last_redraw < 1.0 / self.refresh_rate:
+            return True
+        self.last_redraw = now
+        return False
+
+    def show(self):
+        cv2.imshow('image', self.img_display)
+
+    # 从起点到鼠标当前位置画橡皮筋，shape为cv2.rectangle或cv2.line
+    def draw_rubber_band(self, x, y, shape, force=False):
+        if self.throttled(force):
+            return
+        self.restore_dirty()
+        start = self.to_display(self.startPos)
+        shape(self.img_display, start, (x, y), (0, 255, 0), 2)
+        self.mark_dirty(start[0], start[1], x, y)
+        self.show()
+
+    # 标记一个点并在左上角显示其原图坐标
+    def draw_point(self, x, y, text):
+        self.restore_dirty()
+        cv2.circle(self.img_display, (x, y), 2, (0, 255, 0), 2)
+        self.mark_dirty(x, y, x, y)
+        (tw, th), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 1.0, 2)
+        cv2.putText(self.img_display, text, (25, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 255, 0), 2)
+        self.mark_dirty(25, 50 - th, 25 + tw, 50 + baseline)
+        self.show()
+
+    # 画像素签名探针，添加时只画新的一个，撤销时恢复整张显示图后重画全部
+    def draw_probes(self, redraw):
+        if redraw:
+            self.img_display[:] = self.img_base
+        for px, py, _ in (self.sigProbes if redraw else self.sigProbes[-1:]):
+            cv2.circle(self.img_display, self.to_display((px, py)), 4, (0, 255, 0), 2)
+        self.show()
+
+    # 拖动选择区域或线段的公共部分：左键按下记录起点，拖动时画橡皮筋，松开记录终点，返回是否已处理该事件
+    def drag(self, event, x, y, shape):
+        if event == cv2.EVENT_LBUTTONDOWN:  # 响应鼠标按下
+            self.drawing = True
+            self.startPos = self.to_source(x, y)
+        elif event == cv2.EVENT_MOUSEMOVE:  # 响应鼠标移动
+            if self.drawing == True:
+                self.draw_rubber_band(x, y, shape)
+        elif event == cv2.EVENT_LBUTTONUP:  # 响应鼠标松开
+            self.drawing = False
+            self.stopPos = self.to_source(x, y)
+            self.draw_rubber_band(x, y, shape, force=True)
+        else:
+            return False
+        return True
+
+    def selected(self):
+        return not (self.startPos == (0, 0) and self.stopPos == (0, 0))
+
+    # 中键预览所选区域的裁剪结果
+    def preview(self):
+        x0, y0 = self.startPos
+        x1, y1 = self.stopPos
+        cropped = self.img_source[y0:y1, x0:x1]  # 裁剪坐标为[y0:y1, x0:x1]
+        cv2.imshow('cropImage', cropped)
+        cv2.waitKey(0)
+
+    def draw_Point(self, event, x, y, flags, param):
+        if event == cv2.EVENT_LBUTTONDOWN:  # 响应鼠标按下
+            self.drawing = True
+            self.startPos = self.to_source(x, y)
+            self.draw_point(x, y, "Point:" + str(self.startPos))
+            print("Point:" + str(self.startPos))
+        elif event == cv2.EVENT_RBUTTONUP:
+            if self.startPos == (0, 0):
+                return
+            self.askVar("请输入坐标 " + str(self.startPos) + " 变量名：", lambda res: self.createVar(res, self.startPos, 2))
+
+    def draw_Line(self, event, x, y, flags, param):
+        if self.drag(event, x, y, cv2.line):
+            if event == cv2.EVENT_LBUTTONUP:
+                print("startPoint:" + str(self.startPos) + " stopPoint:" + str(self.stopPos))
+        elif event == cv2.EVENT_RBUTTONUP:
+            if not self.selected():
+                return
+            self.askVar("请输入开始坐标 " + str(self.startPos) + " 到结束坐标 " + str(self.stopPos) + " 组成向量的变量名：",
+                        lambda res: self.createVar(res, (self.startPos, self.stopPos), 3))
+
+    def draw_Rect_Pos(self, event, x, y, flags, param):
+        if self.drag(event, x, y, cv2.rectangle):
+            if event == cv2.EVENT_LBUTTONUP:
+                print("startPoint:" + str(self.startPos) + " stopPoint:" + str(self.stopPos))
+        elif event == cv2.EVENT_RBUTTONUP:
+            if not self.selected():
+                return
+            self.askVar("请输入矩形范围变量名：", lambda res: self.createVar(res, (self.startPos, self.stopPos), 4))
+        elif event == cv2.EVENT_MBUTTONUP:
+            if self.selected():
+                self.preview()
+
+    def draw_Signature(self, event, x, y, flags, param):
+        if event == cv2.EVENT_LBUTTONDOWN:  # 左键添加一个探针，记录该点颜色
+            px, py = self.to_source(x, y)
+            b, g, r = self.img_source[py, px][:3]
+            self.sigProbes.append((px, py, (int(b), int(g), int(r))))
+            print("Probe:" + str(self.sigProbes[-1]))
+            self.draw_probes(False)
+        elif event == cv2.EVENT_MBUTTONUP:  # 中键撤销上一个探针
+            if len(self.sigProbes) > 0:
+                self.sigProbes.pop()
+                self.draw_probes(True)
+        elif event == cv2.EVENT_RBUTTONUP:
+            if len(self.sigProbes) == 0:
+                return
+            if self.askVar("请输入签名对应的元素名（将保存为 元素名_sig）：", self.createSignature, "_sig"):
+                self.sigProbes = []
+
+    # 签名坐标保存为相对位置，与_pos一致，以适应不同分辨率
+    def createSignature(self, res):
+        h_src, w_src = self.img_source.shape[:2]
+        sig = [(round(px / w_src, 4), round(py / h_src, 4), color, self.sig_tolerance) for px, py, color in self.sigProbes]
+        self.createVar(res + "_sig", sig, 5)
+
+    # 打开窗口并用handler处理鼠标事件，直到按下任意键
+    def run(self, handler):
+        cv2.namedWindow('image', cv2.WINDOW_NORMAL)
+        cv2.resizeWindow("image", *self.size)
+        cv2.setMouseCallback('image', handler)
+        self.show()
+        cv2.waitKey(0)
+        cv2.destroyAllWindows()
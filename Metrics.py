@@ -0,0 +1,274 @@
+import os, sys, time, bisect, atexit, threading, http.server
+import settings as st
+import Log, AtomicFile
+
+# 运行指标：计数器、仪表和直方图，按Prometheus文本格式输出，可在本机HTTP端口上提供给Prometheus抓取，也可写入文件
+# 框架已在截图、识图、输入和BrownDust2的场景识别中记录下列指标：
+#   rsh_captures_total                     截图次数，每秒截图数为 rate(rsh_captures_total[1m])
+#   rsh_capture_seconds                    截图耗时
+#   rsh_match_seconds{template}            每个模板的匹配耗时
+#   rsh_matches_total{template, result}    每个模板的命中(hit)和未命中(miss)次数
+#   rsh_input_seconds{op}                  输入操作耗时
+#   rsh_scene_dwell_seconds{scene}         离开场景时在该场景停留的时长
+#   rsh_runs_total                         完成的流程次数，脚本每完成一轮调用 Metrics.runs.inc()
+#
+# 耗时测量的是真实开销，使用time.perf_counter；场景停留时长按Clock计时，回放会话时为虚拟时间
+
+# 耗时直方图的默认分桶（秒）
+latencyBuckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# 场景停留时长直方图的分桶（秒）
+dwellBuckets = (1, 2, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+_registry = {}
+_registryLock = threading.Lock()
+_server = None
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labelText(names, values, extra=None):
+    pairs = ["{0}=\"{1}\"".format(n, _escape(v)) for n, v in zip(names, values)]
+    if extra is not None:
+        pairs.append("{0}=\"{1}\"".format(*extra))
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _CounterValue:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+class _GaugeValue(_CounterValue):
+    __slots__ = ()
+
+    def set(self, value):
+        self.value = value
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class _Metric:
+    # 一个指标，labels为标签名；有标签时用labels(值, ...)取得该组标签的子指标，没有标签时可直接inc/observe
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labelNames = tuple(labels)
+        self.children = {}
+        self.lock = threading.Lock()
+        self._default = self.labels() if not self.labelNames else None
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            if len(values) != len(self.labelNames):
+                raise ValueError("指标 {0} 需要标签 {1}，实际为 {2}".format(self.name, self.labelNames, values))
+            with self.lock:
+                child = self.children.setdefault(values, self._newChild())
+        return child
+
+    def clear(self):
+        with self.lock:
+            self.children.clear()
+            if self._default is not None:
+                self._default = self.children[()] = self._newChild()
+
+    def render(self):
+        lines = ["# HELP {0} {1}".format(self.name, self.help), "# TYPE {0} {1}".format(self.name, self.kind)]
+        for values, child in sorted(self.children.items()):
+            lines.extend(self._renderChild(_labelText(self.labelNames, values), values, child))
+        return lines
+
+    def _renderChild(self, labels, values, child):
+        return ["{0}{1} {2}".format(self.name, labels, _number(child.value))]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _newChild(self):
+        return _CounterValue()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _newChild(self):
+        return _GaugeValue()
+
+    def set(self, value):
+        self._default.set(value)
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=latencyBuckets):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labels)
+
+    def _newChild(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def _renderChild(self, labels, values, child):
+        with child.lock:
+            counts, total = list(child.counts), child.sum
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            lines.append("{0}_bucket{1} {2}".format(self.name, _labelText(self.labelNames, values, ("le", _number(bound))), cumulative))
+        lines.append("{0}_sum{1} {2}".format(self.name, labels, _number(total)))
+        lines.append("{0}_count{1} {2}".format(self.name, labels, cumulative))
+        return lines
+
+def _register(cls, name, *args, **kwargs):
+    with _registryLock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, *args, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError("指标 {0} 已注册为 {1}".format(name, metric.kind))
+        return metric
+
+# 注册计数器，同名指标已存在时返回已有的指标
+def counter(name, help, labels=()):
+    return _register(Counter, name, help, labels)
+
+# 注册仪表
+def gauge(name, help, labels=()):
+    return _register(Gauge, name, help, labels)
+
+# 注册直方图，buckets为分桶上界（秒或其他单位）
+def histogram(name, help, labels=(), buckets=latencyBuckets):
+    return _register(Histogram, name, help, labels, buckets)
+
+# 全部指标的Prometheus文本格式
+def render():
+    with _registryLock:
+        metrics = list(_registry.values())
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# 把全部指标写入文件，path默认为settings.metricsPath，返回写入的路径
+def dump(path=None):
+    path = path or st.metricsPath
+    AtomicFile.write(path, render())
+    return path
+
+# 清空全部指标的数值，指标本身保留
+def reset():
+    with _registryLock:
+        metrics = list(_registry.values())
+    for metric in metrics:
+        metric.clear()
+    startTime.set(time.time())
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+# 在后台线程中提供HTTP指标接口 http://host:port/metrics，port默认为settings.metricsPort，为0时由系统分配
+# 只监听本机地址，返回服务对象，实际端口为server.server_address[1]；已在提供时直接返回
+def serve(port=None, host="127.0.0.1"):
+    global _server
+    if _server is None:
+        _server = http.server.ThreadingHTTPServer((host, st.metricsPort if port is None else port), _Handler)
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+    return _server
+
+# 停止HTTP指标接口
+def stop():
+    global _server
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
+
+startTime = gauge("rsh_start_time_seconds", "进程开始记录指标的时间戳（秒）")
+startTime.set(time.time())
+captures = counter("rsh_captures_total", "截图次数")
+captureSeconds = histogram("rsh_capture_seconds", "截图耗时（秒）")
+matchSeconds = histogram("rsh_match_seconds", "模板匹配耗时（秒）", ("template",))
+matches = counter("rsh_matches_total", "模板匹配次数，result为hit或miss", ("template", "result"))
+inputSeconds = histogram("rsh_input_seconds", "输入操作耗时（秒）", ("op",))
+sceneDwell = histogram("rsh_scene_dwell_seconds", "离开场景时在该场景停留的时长（秒）", ("scene",), dwellBuckets)
+runs = counter("rsh_runs_total", "完成的流程次数")
+
+# 记录一次模板匹配的耗时和结果
+def observeMatch(template, seconds, hit):
+    matchSeconds.labels(template).observe(seconds)
+    matches.labels(template, "hit" if hit else "miss").inc()
+
+def _dumpAtExit():
+    try:
+        dump()
+    except OSError as e:
+        Log.logger.warning("【指标】写入 %s 失败: %s", st.metricsPath, e)
+
+if st.metrics and __name__ != "__main__":
+    try:
+        serve()
+        Log.logger.info("【指标】已在 http://127.0.0.1:%s/metrics 提供指标", _server.server_address[1])
+    except OSError as e:
+        Log.logger.warning("【指标】无法监听端口 %s: %s", st.metricsPort, e)
+    atexit.register(_dumpAtExit)
+
+# 命令行：python Metrics.py [端口]，读取其他进程的HTTP指标接口并输出
+if __name__ == "__main__":
+    import urllib.request
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else st.metricsPort
+    with urllib.request.urlopen("http://127.0.0.1:{0}/metrics".format(port), timeout=5) as response:
+        print(response.read().decode("utf-8"), end="")
@@ -1,17 +1,77 @@
-import ImageProc, ADBHelper, random, time, cv2
+import ImageProc, DeviceBackend, Clock, Trace, Metrics, Log, random, time, cv2, logging
 import settings as st
 
+log = Log.logger
+
+# 设备类型，0为PC环境，1为安卓设备，也可以填写DeviceBackend中注册的后端名称：
+# "fake"为空白画面，"replay"按顺序回放replayFrames中的截图，"session"回放sessionPath中录制的会话
 deviceType = 1
 deviceID = ""
 
+# deviceType为"replay"时回放的截图目录，按文件名排序
+replayFrames = ""
+
+# deviceType为"session"时回放的会话目录（见SessionRecorder）
+sessionPath = ""
+
+# 当前使用的设备后端，为None时按deviceType和deviceID创建；也可以直接赋值为DeviceBackend.create(...)的结果
+backend = None
+_backendKey = None
+
+# 按后端名称返回创建参数，需要的设置为空时抛出ValueError
+def _backendArgs(name):
+    if name == "adb":
+        return {"deviceID": deviceID}
+    if name == "replay":
+        if not replayFrames:
+            raise ValueError("deviceType为replay时需要设置replayFrames（截图目录）")
+        return {"frames": replayFrames}
+    if name == "session":
+        if not sessionPath:
+            raise ValueError("deviceType为session时需要设置sessionPath（会话目录）")
+        return {"path": sessionPath}
+    return {}
+
+# 返回当前设备后端，deviceType、deviceID、replayFrames或sessionPath改变后重新创建
+def getBackend():
+    global backend, _backendKey
+    key = (deviceType, deviceID, replayFrames, sessionPath)
+    if backend is None or (_backendKey is not None and _backendKey != key):
+        name = DeviceBackend.deviceTypes.get(deviceType, deviceType)
+        backend = DeviceBackend.create(deviceType, **_backendArgs(name))
+        _backendKey = key
+        Log.setDevice(deviceID or name)
+    return backend
+
+# 截取整个屏幕，返回BGR图像
+def screenshot():
+    start = time.perf_counter()
+    with Trace.span("screenshot", "capture"):
+        screen = getBackend().screenshot()
+    Metrics.captures.inc()
+    Metrics.captureSeconds.observe(time.perf_counter() - start)
+    return screen
+
+# 录制或回放会话时（见SessionRecorder）记录识图结果和延时，其他后端忽略
+def _record(kind, **fields):
+    record = getattr(getBackend(), "record", None)
+    if record is not None:
+        record(kind, **fields)
+
 def random_delay():
     t = random.uniform(st.randomDelayMin, st.randomDelayMax)
-    print("【随机延时】将随机延时 {0} 秒".format(t))
-    time.sleep(t)
+    if log.isEnabledFor(logging.INFO):
+        log.info("【随机延时】将随机延时 %s 秒", t, extra = Log.fields(op = "delay", seconds = t))
+    _record("delay", seconds = t)
+    with Trace.span("random_delay", "delay"):
+        Clock.sleep(t)
 
 def delay(t):
-    print("【主动延时】延时 {0} 秒".format(t))
-    time.sleep(t)
+    if log.isEnabledFor(logging.INFO):
+        log.info("【主动延时】延时 %s 秒", t, extra = Log.fields(op = "delay", seconds = t))
+    _record("delay", seconds = t)
+    with Trace.span("delay", "delay"):
+        Clock.sleep(t)
 
 def random_pos(pos):
     x, y = pos
@@ -33,11 +93,16 @@ def random_pos(pos):
 def touch(pos):
     randTime = random.randint(0, st.touchDelayRange)
     _pos = random_pos(pos)
-    print("【模拟点击】点击坐标 {0} {1} 毫秒".format(_pos, randTime))
-    if randTime < 10:
-        ADBHelper.touch(deviceID, _pos)
-    else:
-        ADBHelper.longTouch(deviceID, _pos, randTime)
+    if log.isEnabledFor(logging.INFO):
+        log.info("【模拟点击】点击坐标 %s %s 毫秒", _pos, randTime, extra = Log.fields(op = "touch", pos = _pos, ms = randTime))
+    start = time.perf_counter()
+    with Trace.span("touch", "input"):
+        if randTime < 10:
+            getBackend().touch(_pos)
+        else:
+            getBackend().longTouch(_pos, randTime)
+    Metrics.inputSeconds.labels("touch" if randTime < 10 else "longTouch").observe(time.perf_counter() - start)
+
 
 # 智能模拟滑屏，给定起始点和终点的二元组，模拟一次随机智能滑屏
 def slide(vector):
@@ -45,37 +110,69 @@ def slide(vector):
     _startPos = random_pos(startPos)
     _stopPos = random_pos(stopPos)
     randTime = random.randint(st.slideMinVer, st.slideMaxVer)
-    print("【模拟滑屏】使用 {0} 毫秒从坐标 {1} 滑动到坐标 {2}".format(randTime, _startPos, _stopPos))
-    ADBHelper.slide(deviceID, _startPos, _stopPos, randTime)
-
-# 截屏，识图，返回坐标
-def find_pic(target, returnCenter = False):
-    ADBHelper.screenCapture(deviceID, st.cache_path + "screenCap.png")
-    time.sleep(0.1)
-    if returnCenter == True:
-        leftTopPos = ImageProc.locate(st.cache_path + "screenCap.png", target, st.accuracy)
-        img = cv2.imread(target)
-        centerPos = ImageProc.centerOfTouchArea(img.shape, leftTopPos)
-        return centerPos
-    else:
-        leftTopPos = ImageProc.locate(st.cache_path + "screenCap.png", target, st.accuracy)
-        return leftTopPos
+    if log.isEnabledFor(logging.INFO):
+        log.info("【模拟滑屏】使用 %s 毫秒从坐标 %s 滑动到坐标 %s", randTime, _startPos, _stopPos,
+                 extra = Log.fields(op = "slide", start = _startPos, stop = _stopPos, ms = randTime))
+    start = time.perf_counter()
+    with Trace.span("slide", "input"):
+        getBackend().slide(_startPos, _stopPos, randTime)
+    Metrics.inputSeconds.labels("slide").observe(time.perf_counter() - start)
+
+# 截屏，判断像素签名是否匹配，签名格式见ImageProc.matchSignature
+def check_signature(signature):
+    return ImageProc.matchSignature(screenshot(), signature)
+
+# 截屏，使用场景索引(SceneIndex)判断当前所处场景，返回场景标签，无法判断时返回None
+def find_scene(index):
+    return index.nearest(screenshot())
+
+# 截屏，识图，返回坐标；给定signature时先用像素签名预筛，签名不匹配则不进行模板匹配
+def find_pic(target, returnCenter = False, signature = None):
+    with Trace.span("find_pic", "rsh", target):
+        screen = screenshot()
+        accuracy = ImageProc.threshold(target, st.accuracy)
+        start = time.perf_counter()
+        leftTopPos = ImageProc.locate(screen, target, accuracy, signature, device = deviceID or None)
+        Metrics.observeMatch(str(target), time.perf_counter() - start, leftTopPos is not None)
+        if returnCenter == True:
+            centerPos = None
+            if leftTopPos is not None:
+                img = ImageProc.loadImage(target)
+                centerPos = ImageProc.centerOfTouchArea(img.shape, leftTopPos)
+            _record("find", target = str(target), result = centerPos)
+            return centerPos
+        else:
+            _record("find", target = str(target), result = leftTopPos)
+            return leftTopPos
 
 # 截屏，识图，返回所有坐标
 def find_pic_all(target):
-    ADBHelper.screenCapture(deviceID, st.cache_path + "screenCap.png")
-    time.sleep(0.1)
-    leftTopPos = ImageProc.locate_all(st.cache_path + "screenCap.png", target, st.accuracy)
+    screen = screenshot()
+    start = time.perf_counter()
+    leftTopPos = ImageProc.locate_all(screen, target, ImageProc.threshold(target, st.accuracy))
+    Metrics.observeMatch(str(target), time.perf_counter() - start, len(leftTopPos) > 0)
+    _record("find", target = str(target), result = leftTopPos)
+
     return leftTopPos
 
+# 识别失败的日志按目标汇总，轮询等待某个目标时不会每次都输出一条
+# 日志级别未开启时不构造结构化字段
+def _logMiss(target):
+    if log.isEnabledFor(logging.INFO):
+        log.info("【识图】识别 %s 失败", target, extra = Log.repeated("miss", str(target), target = str(target), found = False))
+
+def _logHit(target, leftTopPos):
+    if log.isEnabledFor(logging.INFO):
+        log.info("【识图】识别 %s 成功，图块左上角坐标 %s", target, leftTopPos, extra = Log.fields(target = str(target), found = True, pos = leftTopPos))
+
 # 寻找目标区块并在其范围内随机点击
-def find_pic_touch(target):
-    leftTopPos = find_pic(target)
+def find_pic_touch(target, signature = None):
+    leftTopPos = find_pic(target, signature = signature)
     if leftTopPos is None:
-        print("【识图】识别 {0} 失败".format(target))
+        _logMiss(target)
         return False
-    print("【识图】识别 {0} 成功，图块左上角坐标 {1}".format(target, leftTopPos))
-    img = cv2.imread(target)
+    _logHit(target, leftTopPos)
+    img = ImageProc.loadImage(target)
     tlx, tly = leftTopPos
     h_src, w_src, tongdao = img.shape
     x = random.randint(tlx, tlx + w_src)
@@ -87,10 +184,10 @@ def find_pic_touch(target):
 def find_pic_slide(target,pos):
     leftTopPos = find_pic(target)
     if leftTopPos is None:
-        print("【识图】识别 {0} 失败".format(target))
+        _logMiss(target)
         return False
-    print("【识图】识别 {0} 成功，图块左上角坐标 {1}".format(target, leftTopPos))
-    img = cv2.imread(target)
+    _logHit(target, leftTopPos)
+    img = ImageProc.loadImage(target)
     centerPos = ImageProc.centerOfTouchArea(img.shape,leftTopPos)
     slide((centerPos, pos))
     return True
\ No newline at end of file
@@ -0,0 +1,179 @@
+import os, sys, ast, json, importlib.util, cv2, numpy
+import ImageProc, ResourceScaler, ResourceManifest, Log, AtomicFile
+
+# 资源包：把资源字典引用的全部模板图片预先解码，连同灰度图、各分辨率的缩放版本、
+# 资源字典中的坐标区域、置信度和模板统计量写入一个二进制文件，运行时用numpy.memmap映射，
+# 启动和第一次查找只需要缺页读取而不是逐张解码PNG，同一台机器上的多个进程共享同一份页缓存
+# 启用资源包后（ImageProc.useBundle），ImageProc.threshold读取其中的置信度，ImageProc.loadGray读取其中的灰度图
+#
+# 文件格式：8字节标识 + 8字节头部长度 + JSON头部 + 按64字节对齐的原始数组，头部记录的偏移量从数组区开始计算
+
+_magic = b"RSHBNDL1"
+_align = 64
+
+# 图片路径统一为规范形式，"./img/a.png"和"img/a.png"视为同一个文件
+def _key(path):
+    return os.path.normpath(path)
+
+def _pad(n):
+    return (n + _align - 1) // _align * _align
+
+# 计算模板统计量：各通道均值和标准差，以及去均值后的范数（TM_CCOEFF_NORMED的分母）
+def _stats(img):
+    data = img.reshape(-1, img.shape[2]).astype(numpy.float64)
+    mean = data.mean(axis=0)
+    return {
+        "mean": [round(float(v), 3) for v in mean],
+        "std": [round(float(v), 3) for v in data.std(axis=0)],
+        "norm": round(float(numpy.sqrt(((data - mean) ** 2).sum())), 3),
+    }
+
+# 按文件路径加载资源字典模块（.py）或资源清单（.json，见ResourceManifest）
+def loadModule(path):
+    if path.lower().endswith(".json"):
+        return ResourceManifest.load(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+# 把资源字典module编译为资源包outPath
+# sizes为需要预先生成缩放版本的设备分辨率列表[(w, h), ...]，confidences为{变量名: 置信度}，
+# 为None时从阈值文件thresholdPath（见TemplateAnalyzer，默认为settings中的thresholdPath）读取推荐阈值
+def build(module, outPath, sizes=(), confidences=None, thresholdPath=None):
+    values = {k: v for k, v in vars(module).items()
+              if not k.startswith("_") and isinstance(v, (str, int, float, tuple, list, dict))}
+    variants = [ResourceScaler.scaleResources(module, size).values() for size in sizes]
+    if confidences is None:
+        ImageProc.loadThresholds(thresholdPath)
+        confidences = {}
+        for name, value in values.items():
+            if isinstance(value, str) and value.lower().endswith(ResourceScaler.imageExts):
+                confidence = ImageProc.threshold(value, None)
+                if confidence is not None:
+                    confidences[name] = confidence
+
+    # 缩放版本的图片使用原图的置信度
+    images, imageConfidences = {}, {}
+    for table in [values] + variants:
+        for name, value in table.items():
+            if isinstance(value, str) and value.lower().endswith(ResourceScaler.imageExts) and os.path.exists(value):
+                images.setdefault(_key(value), value)
+                if name in confidences:
+                    imageConfidences[_key(value)] = confidences[name]
+
+    entries, arrays, offset = {}, [], 0
+    for key, path in images.items():
+        img = cv2.imread(path)
+        if img is None:
+            Log.logger.warning("【资源包】无法读取图片 %s，已跳过", path)
+            continue
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        entry = {"mtime": os.path.getmtime(path), "shape": list(img.shape), "stats": _stats(img),
+                 "confidence": imageConfidences.get(key)}
+        for kind, data in (("color", img), ("gray", gray)):
+            entry[kind] = offset
+            arrays.append((offset, numpy.ascontiguousarray(data)))
+            offset = _pad(offset + data.nbytes)
+        entries[key] = entry
+
+    header = {
+        "version": 1,
+        "module": module.__name__,
+        "values": repr(values),
+        "sizes": [list(s) for s in sizes],
+        "confidences": dict(confidences or {}),
+        "images": entries,
+    }
+    raw = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    base = _pad(len(_magic) + 8 + len(raw))
+
+    with AtomicFile.open(outPath, "wb") as f:
+        f.write(_magic)
+        f.write(numpy.uint64(len(raw)).tobytes())
+        f.write(raw)
+        for pos, data in arrays:
+            f.seek(base + pos)
+            f.write(data.tobytes())
+        f.truncate(base + offset)
+    Log.logger.info("【资源包】已写入 %s：%s 张图片，%.1f MB", outPath, len(entries), (base + offset) / 1024 / 1024)
+    return outPath
+
+class Bundle:
+    # 已映射的资源包，图片以只读视图返回，不会被复制
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(_magic)) != _magic:
+                raise ValueError("不是资源包文件: {0}".format(path))
+            length = int(numpy.frombuffer(f.read(8), numpy.uint64)[0])
+            header = json.loads(f.read(length).decode("utf-8"))
+        base = _pad(len(_magic) + 8 + length)
+        self.data = numpy.memmap(path, dtype=numpy.uint8, mode="r", offset=base) if os.path.getsize(path) > base else None
+        self.module = header["module"]
+        self.sizes = [tuple(s) for s in header["sizes"]]
+        self.confidences = header["confidences"]
+        self._values = header["values"]
+
+        # 原图在打包后被修改过的条目不再使用，回退到读取图片文件
+        self.entries = {}
+        stale = 0
+        for key, entry in header["images"].items():
+            if os.path.exists(key) and os.path.getmtime(key) > entry["mtime"]:
+                stale += 1
+                continue
+            self.entries[key] = entry
+        if stale:
+            Log.logger.warning("【资源包】%s 中有 %s 张图片已过期，将直接读取图片文件，请重新打包", path, stale)
+
+    def _view(self, offset, shape):
+        count = int(numpy.prod(shape))
+        return self.data[offset:offset + count].reshape(shape)
+
+    # 返回图片路径对应的图像视图，不在资源包中时返回None
+    def image(self, path, gray=False):
+        entry = self.entries.get(_key(path))
+        if entry is None:
+            return None
+        if gray:
+            return self._view(entry["gray"], entry["shape"][:2])
+        return self._view(entry["color"], entry["shape"])
+
+    # 返回模板统计量 {"mean", "std", "norm"}，不在资源包中时返回None
+    def stats(self, path):
+        entry = self.entries.get(_key(path))
+        return entry["stats"] if entry else None
+
+    # 返回变量名对应的置信度，未记录时返回default
+    def confidence(self, name, default=None):
+        return self.confidences.get(name, default)
+
+    # 返回图片路径对应的置信度，未记录时返回default
+    def threshold(self, path, default=None):
+        entry = self.entries.get(_key(path))
+        value = entry.get("confidence") if entry else None
+        return default if value is None else value
+
+    # 资源字典中的全部变量（原分辨率）
+    def values(self):
+        return ast.literal_eval(self._values)
+
+    def __contains__(self, path):
+        return _key(path) in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+# 映射资源包文件
+def load(path):
+    return Bundle(path)
+
+# 命令行：python ResourceBundle.py 资源字典.py|清单.json 输出路径 [宽x高 ...] [阈值文件.json]
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("用法: python ResourceBundle.py 资源字典.py|清单.json 输出路径 [宽x高 ...] [阈值文件.json]")
+        sys.exit(1)
+    sizes = [tuple(int(v) for v in arg.lower().split("x")) for arg in sys.argv[3:] if not arg.lower().endswith(".json")]
+    thresholdPaths = [arg for arg in sys.argv[3:] if arg.lower().endswith(".json")]
+    build(loadModule(sys.argv[1]), sys.argv[2], sizes, thresholdPath=thresholdPaths[0] if thresholdPaths else None)
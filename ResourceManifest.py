@@ -0,0 +1,127 @@
+import os, sys, json, importlib.util
+import ImageProc, AtomicFile
+
+# 资源清单：用JSON文件代替需要作为代码导入的py资源字典
+# 每个条目带类型：image（图片路径）、point（点）、vector（向量）、rect（区域）、pos（相对位置）、signature（像素签名）、value（其他值）
+# 清单在内存中按名称建立索引，写入时先写临时文件再替换，不会留下写了一半的文件
+#
+# 文件格式：
+# {"version": 1, "resolution": [w, h], "entries": {"名称": {"type": "image", "value": "./img/a.png"}, ...}}
+
+types = ("image", "point", "vector", "rect", "pos", "signature", "value")
+
+class Template(str):
+    # 图片条目：本身是图片路径字符串，可直接传给find_pic等函数；image属性在第一次用到时读取图片并缓存
+    _image = None
+
+    @property
+    def image(self):
+        if self._image is None:
+            self._image = ImageProc.loadImage(str(self))
+        return self._image
+
+# JSON中的列表还原为资源字典中使用的元组
+def _decode(kind, value):
+    if kind == "image":
+        return Template(value)
+    if kind == "point":
+        return tuple(value)
+    if kind in ("vector", "rect"):
+        return tuple(tuple(p) for p in value)
+    if kind == "signature":
+        return [(x, y, tuple(color), tolerance) for x, y, color, tolerance in value]
+    return value
+
+class Manifest:
+    # 可读写的资源清单，文件不存在时为空清单
+    def __init__(self, path):
+        self.path = path
+        self.resolution = None
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.resolution = tuple(data["resolution"]) if data.get("resolution") else None
+            self.entries = data.get("entries", {})
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    # 添加一个条目并立即保存，名称已存在时抛出KeyError
+    def add(self, name, kind, value):
+        if kind not in types:
+            raise ValueError("未知的条目类型: {0}".format(kind))
+        if name in self.entries:
+            raise KeyError(name)
+        self.entries[name] = {"type": kind, "value": value}
+        self.save()
+
+    # 删除一个条目并立即保存
+    def remove(self, name):
+        del self.entries[name]
+        self.save()
+
+    def save(self):
+        data = {"version": 1, "resolution": list(self.resolution) if self.resolution else None, "entries": self.entries}
+        with AtomicFile.open(self.path) as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+
+class Resources:
+    # 只读的资源对象，用法与导入的py资源字典相同（rd.xxx），可直接传给ResourceScaler.scaleResources
+    def __init__(self, manifest):
+        self.__name__ = os.path.splitext(os.path.basename(manifest.path))[0]
+        self.__file__ = manifest.path
+        if manifest.resolution:
+            self.resolution = manifest.resolution
+        for name, entry in manifest.entries.items():
+            setattr(self, name, _decode(entry["type"], entry["value"]))
+
+    def __repr__(self):
+        return "<Resources {0}>".format(self.__file__)
+
+# 加载资源清单，返回rd.xxx方式访问的资源对象，图片在第一次用到时才读取
+def load(path):
+    return Resources(Manifest(path))
+
+# 推断py资源字典中变量的类型
+def _guessType(name, value):
+    if isinstance(value, str) and value.lower().endswith((".png", ".jpg", ".jpeg", ".bmp")):
+        return "image"
+    if name.endswith("_pos") and isinstance(value, dict):
+        return "pos"
+    if name.endswith("_sig") or (isinstance(value, list) and value and isinstance(value[0], tuple) and len(value[0]) == 4):
+        return "signature"
+    if isinstance(value, tuple) and len(value) == 2:
+        if all(isinstance(v, int) for v in value):
+            return "point"
+        if all(isinstance(v, tuple) for v in value):
+            return "rect" if name.endswith(("_click", "_area", "_rect")) else "vector"
+    return "value"
+
+# 把py资源字典转换为资源清单，py字典中无法区分向量和区域，以_click、_area、_rect结尾的视为区域
+def convert(modulePath, manifestPath):
+    name = os.path.splitext(os.path.basename(modulePath))[0]
+    spec = importlib.util.spec_from_file_location(name, modulePath)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    manifest = Manifest(manifestPath)
+    for key, value in vars(module).items():
+        if key.startswith("_") or not isinstance(value, (str, int, float, tuple, list, dict)):
+            continue
+        if key == "resolution":
+            manifest.resolution = tuple(value)
+            continue
+        manifest.entries[key] = {"type": _guessType(key, value), "value": value}
+    manifest.save()
+    return manifest
+
+# 命令行：python ResourceManifest.py 资源字典.py 清单.json
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("用法: python ResourceManifest.py 资源字典.py 清单.json")
+        sys.exit(1)
+    manifest = convert(sys.argv[1], sys.argv[2])
+    print("已转换 {0} 个条目到 {1}".format(len(manifest), sys.argv[2]))
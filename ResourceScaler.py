@@ -0,0 +1,171 @@
+import os, ast, cv2
+import ADBHelper, Log, AtomicFile
+import settings as st
+
+log = Log.logger
+
+# 资源分辨率换算：资源字典中用 resolution = (w, h) 标注截取资源时的分辨率，
+# 在其他分辨率的设备上运行时，按设备实际分辨率等比缩放模板和坐标，并按分辨率缓存到磁盘
+
+imageExts = (".png", ".jpg", ".jpeg", ".bmp")
+
+# 查询设备实际分辨率，deviceType=0为PC（主显示器），1为安卓设备（wm size），返回(w, h)
+def getDeviceSize(deviceType, deviceID=""):
+    if deviceType == 0:
+        import mss
+        with mss.mss() as sct:
+            monitor = sct.monitors[1]
+            return (monitor['width'], monitor['height'])
+    return ADBHelper.getScreenSize(deviceID)
+
+class ScaledResources:
+    def __init__(self, values, scale=1.0, offset=(0, 0)):
+        self.__dict__.update(values)
+        self._scale = scale
+        self._offset = tuple(offset)
+
+    # 返回全部资源变量
+    def values(self):
+        return {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
+
+    # 将按原分辨率写死的坐标（点、向量、区域）换算到设备分辨率
+    def scale(self, value):
+        return _scaleCoord(value, self._scale, self._offset)
+
+    # 将按原分辨率写死的长度（如滑动距离）换算到设备分辨率
+    def scaleLength(self, length):
+        return int(round(length * self._scale))
+
+# 等比缩放：资源画面按同一比例完整放入设备画面并居中，返回(比例, (x偏移, y偏移))
+# 设备宽高比与资源不同时，多出的部分视为两侧（或上下）的黑边，模板不会变形
+def fitScale(resolution, deviceSize):
+    rw, rh = resolution
+    dw, dh = deviceSize
+    scale = min(dw / rw, dh / rh)
+    return scale, ((dw - rw * scale) / 2, (dh - rh * scale) / 2)
+
+def _scaleCoord(value, scale, offset):
+    if isinstance(value, tuple) and len(value) == 2 and all(isinstance(v, int) for v in value):
+        return (int(round(value[0] * scale + offset[0])), int(round(value[1] * scale + offset[1])))
+    if isinstance(value, tuple) and len(value) > 0 and all(isinstance(v, tuple) for v in value):
+        return tuple(_scaleCoord(v, scale, offset) for v in value)
+    return value
+
+# 相对坐标（0-1）先换算到资源画面中的像素坐标，缩放平移后再换算回设备画面中的相对坐标
+def _scaleRelative(value, length, deviceLength, scale, offset):
+    return round((value * length * scale + offset) / deviceLength, 4)
+
+# 像素签名中的像素坐标按比例换算并平移，相对坐标换算为设备画面中的相对坐标
+def _scaleSignature(signature, scale, offset, resolution, deviceSize):
+    res = []
+    for x, y, color, tolerance in signature:
+        if isinstance(x, int):
+            x = int(round(x * scale + offset[0]))
+        else:
+            x = _scaleRelative(x, resolution[0], deviceSize[0], scale, offset[0])
+        if isinstance(y, int):
+            y = int(round(y * scale + offset[1]))
+        else:
+            y = _scaleRelative(y, resolution[1], deviceSize[1], scale, offset[1])
+        res.append((x, y, color, tolerance))
+    return res
+
+# 相对位置(_pos)换算为设备画面中的相对位置
+def _scalePos(pos, scale, offset, resolution, deviceSize):
+    res = dict(pos)
+    for key, axis in (("x0", 0), ("x1", 0), ("y0", 1), ("y1", 1)):
+        if key in pos:
+            res[key] = _scaleRelative(pos[key], resolution[axis], deviceSize[axis], scale, offset[axis])
+    for key, axis in (("w", 0), ("h", 1)):
+        if key in pos:
+            res[key] = _scaleRelative(pos[key], resolution[axis], deviceSize[axis], scale, 0)
+    return res
+
+# 生成缩放后的模板图片，已存在且不旧于原图时直接复用，force为True时总是重新生成
+def _scaleImage(src, dst, scale, force=False):
+    if not force and os.path.exists(dst) and os.path.getmtime(dst) >= os.path.getmtime(src):
+        return
+    img = cv2.imread(src, cv2.IMREAD_UNCHANGED)
+    if img is None:
+        return
+    h, w = img.shape[:2]
+    size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    cv2.imwrite(dst, cv2.resize(img, size, interpolation=interpolation))
+
+# 模板路径在输出目录中的相对路径：规范化后去掉开头的"./"，绝对路径的根和".."不会跳出输出目录
+def outputPath(path):
+    path = os.path.splitdrive(os.path.normpath(path))[1]
+    parts = [p for p in path.replace("\\", "/").split("/") if p not in ("", ".", "..")]
+    return os.path.join(*parts)
+
+# 读取换算缓存，返回 {"scale", "offset", "mtime", "values"}，不存在或格式不对时返回None
+def _readCache(cacheFile):
+    if not os.path.exists(cacheFile):
+        return None
+    try:
+        with open(cacheFile, 'r', encoding='utf-8') as f:
+            cache = ast.literal_eval(f.read())
+    except (OSError, ValueError, SyntaxError):
+        return None
+    if not isinstance(cache, dict) or "values" not in cache or "scale" not in cache:
+        return None
+    return cache
+
+# 按设备分辨率deviceSize换算资源字典模块module，返回与原模块用法相同的对象（rd.xxx）
+# 资源按同一比例缩放并居中（见fitScale），模板图片路径替换为缓存目录中缩放后的图片，
+# 点、向量、区域和像素签名中的像素坐标缩放并平移，相对位置(_pos)和签名中的相对坐标换算为设备画面中的相对位置
+# 换算结果缓存在 cachePath/宽x高/ 下，同一分辨率再次启动时直接读取；deviceSize为None（如adb查询失败）时按原坐标使用
+def scaleResources(module, deviceSize, cachePath=None):
+    values = {k: v for k, v in vars(module).items()
+              if not k.startswith("_") and isinstance(v, (str, int, float, tuple, list, dict))}
+    resolution = values.get("resolution")
+    if resolution is None:
+        log.warning("【分辨率换算】%s 未标注 resolution，按原坐标使用", module.__name__)
+        return ScaledResources(values)
+    if deviceSize is None:
+        log.warning("【分辨率换算】无法获取设备分辨率，%s 按原坐标使用", module.__name__)
+        return ScaledResources(values)
+
+    # wm size返回的是竖屏尺寸，与资源的横竖方向保持一致
+    dw, dh = deviceSize
+    if (dw > dh) != (resolution[0] > resolution[1]):
+        dw, dh = dh, dw
+    if (dw, dh) == tuple(resolution):
+        return ScaledResources(values)
+    scale, offset = fitScale(resolution, (dw, dh))
+
+    if cachePath is None:
+        cachePath = st.cache_path + "scaled/"
+    cacheDir = os.path.join(cachePath, "{0}x{1}".format(dw, dh))
+    cacheFile = os.path.join(cacheDir, module.__name__ + ".cache")
+    sourceMtime = max([os.path.getmtime(module.__file__)] +
+                      [os.path.getmtime(v) for v in values.values() if isinstance(v, str) and os.path.exists(v)])
+    cache = _readCache(cacheFile)
+    sameScale = cache is not None and cache["scale"] == scale and tuple(cache["offset"]) == offset
+    if sameScale and cache["mtime"] >= sourceMtime:
+        return ScaledResources(cache["values"], scale, offset)
+
+    log.info("【分辨率换算】资源分辨率 %s，设备分辨率 %s，缩放 %.4f 偏移 %s，正在生成缓存 %s",
+             tuple(resolution), (dw, dh), scale, offset, cacheDir)
+    scaled = {}
+    for name, value in values.items():
+        if isinstance(value, str) and value.lower().endswith(imageExts):
+            dst = os.path.join(cacheDir, outputPath(value))
+            if os.path.exists(value):
+                # 旧缓存的缩放方式不同时，已生成的图片也不能复用
+                _scaleImage(value, dst, scale, force=not sameScale)
+                value = dst
+        elif name.endswith("_sig") and isinstance(value, list):
+            value = _scaleSignature(value, scale, offset, resolution, (dw, dh))
+        elif name.endswith("_pos") and isinstance(value, dict):
+            value = _scalePos(value, scale, offset, resolution, (dw, dh))
+        elif name == "resolution":
+            value = (dw, dh)
+        else:
+            value = _scaleCoord(value, scale, offset)
+        scaled[name] = value
+
+    AtomicFile.write(cacheFile, repr({"scale": scale, "offset": offset, "mtime": sourceMtime, "values": scaled}))
+    return ScaledResources(scaled, scale, offset)
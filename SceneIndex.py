@@ -0,0 +1,99 @@
+import os, sys, cv2, numpy
+import ImageProc
+import settings as st
+
+# 感知哈希场景索引：用带标签的参考截图建立索引，对新截图计算哈希后做汉明距离最近邻查找，一次得到最可能的场景
+
+# dHash的边长，每个哈希为 hashSize * hashSize 位
+hashSize = 8
+
+# 分块哈希的网格大小，截图被切成 tileGrid * tileGrid 块，每块单独计算一个哈希
+tileGrid = 3
+
+# 每个字节中1的个数，用于向量化计算汉明距离
+_popcount = numpy.array([bin(i).count("1") for i in range(256)], dtype=numpy.uint16)
+
+# 计算单张灰度图的dHash，返回打包后的字节数组
+def _dhash(gray):
+    small = cv2.resize(gray, (hashSize + 1, hashSize), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return numpy.packbits(bits.flatten())
+
+# 计算图片的感知哈希：全局哈希 + 每个分块的哈希，拼接为一个uint8数组
+def imageHash(image):
+    img = ImageProc.loadImage(image)
+    if img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY if img.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+    h, w = img.shape[:2]
+    parts = [_dhash(img)]
+    for i in range(tileGrid):
+        for j in range(tileGrid):
+            tile = img[h * i // tileGrid:h * (i + 1) // tileGrid, w * j // tileGrid:w * (j + 1) // tileGrid]
+            parts.append(_dhash(tile))
+    return numpy.concatenate(parts)
+
+class SceneIndex:
+    def __init__(self, labels=None, hashes=None):
+        self.labels = list(labels) if labels is not None else []
+        if hashes is None:
+            hashes = numpy.zeros((0, (hashSize * hashSize // 8) * (tileGrid * tileGrid + 1)), dtype=numpy.uint8)
+        self.hashes = hashes
+
+    # 从目录建立索引，目录结构为 refDir/场景名/*.png，子目录名即为场景标签
+    @classmethod
+    def build(cls, refDir):
+        index = cls()
+        for label in sorted(os.listdir(refDir)):
+            labelDir = os.path.join(refDir, label)
+            if not os.path.isdir(labelDir):
+                continue
+            for name in sorted(os.listdir(labelDir)):
+                img = cv2.imread(os.path.join(labelDir, name))
+                if img is not None:
+                    index.add(label, img)
+        return index
+
+    # 添加一张带标签的参考截图
+    def add(self, label, image):
+        self.labels.append(label)
+        self.hashes = numpy.vstack([self.hashes, imageHash(image)])
+
+    def save(self, path):
+        numpy.savez(path, labels=numpy.array(self.labels), hashes=self.hashes)
+
+    @classmethod
+    def load(cls, path):
+        data = numpy.load(path)
+        return cls(data["labels"].tolist(), data["hashes"])
+
+    # 对截图分类，返回按距离从小到大排列的 [(标签, 汉明距离), ...]，每个标签只保留其最近的参考图
+    def classify(self, image, k=3):
+        if len(self.labels) == 0:
+            return []
+        dist = _popcount[numpy.bitwise_xor(self.hashes, imageHash(image))].sum(axis=1)
+        res = []
+        for i in numpy.argsort(dist, kind="stable"):
+            label = self.labels[i]
+            if all(label != l for l, _ in res):
+                res.append((label, int(dist[i])))
+                if len(res) >= k:
+                    break
+        return res
+
+    # 返回最可能的场景标签，最近距离超过maxDistance时返回None，maxDistance默认为settings配置中的sceneMaxDistance
+    def nearest(self, image, maxDistance=None):
+        if maxDistance is None:
+            maxDistance = st.sceneMaxDistance
+        res = self.classify(image, 1)
+        if len(res) == 0 or res[0][1] > maxDistance:
+            return None
+        return res[0][0]
+
+# 命令行建立索引：python SceneIndex.py 参考截图目录 索引保存路径
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("用法: python SceneIndex.py 参考截图目录 索引保存路径")
+        sys.exit(1)
+    index = SceneIndex.build(sys.argv[1])
+    index.save(sys.argv[2])
+    print("【场景索引】共 {0} 张参考截图，{1} 个场景，已保存到 {2}".format(len(index.labels), len(set(index.labels)), sys.argv[2]))
@@ -0,0 +1,296 @@
+import os, sys, json, time, random, numpy
+import DeviceBackend, Clock, ImageProc
+
+# 会话录制与回放：录制后端包装真实的设备后端，把截图、识图结果、输入操作和延时写入会话目录；
+# 回放后端把录制的截图按顺序交给未修改的脚本，逐一核对脚本发出的输入操作和识图结果，
+# 回放时使用虚拟时钟（见Clock），延时只推进虚拟时间而不真正等待，一段几小时的会话可以在几秒内回放完；
+# 位置先验、学习到的缩放比例和逐模板阈值会改变识图返回的位置，录制开始时写入快照，回放时使用快照而不读写本机的文件
+#
+# 会话目录结构：
+#   frames.bin    追加写入的帧文件：8字节标识 + 按64字节对齐的原始BGR帧，可用numpy.memmap映射
+#   events.jsonl  事件日志，每行一个JSON：第一行为会话信息，之后为 frame / find / input / delay 事件，
+#                 每个事件带相对会话开始的时间t（秒）；与上一帧完全相同的截图不重复写入，只引用已有的帧
+
+_magic = b"RSHFRAM1"
+_align = 64
+
+def _pad(n):
+    return (n + _align - 1) // _align * _align
+
+# numpy数值和数组转换为Python的数和列表
+def _default(value):
+    return value.tolist()
+
+# 把元组等转换为JSON中的形式，录制值和回放值按同样的方式比较
+def _plain(value):
+    return json.loads(json.dumps(value, default=_default))
+
+class ReplayMismatch(AssertionError):
+    # 回放时脚本的行为与录制时不一致
+    pass
+
+class ReplayFinished(Exception):
+    # 录制的截图已全部回放完，脚本还在请求新的截图
+    pass
+
+class FrameStore:
+    # 追加写入的帧文件，每帧的偏移和形状记录在事件日志中
+    def __init__(self, path, write=False):
+        self.path = path
+        self.data = None
+        if write:
+            self.file = open(path, "wb")
+            self.file.write(_magic)
+            self.size = _pad(len(_magic))
+        else:
+            self.file = None
+            with open(path, "rb") as f:
+                if f.read(len(_magic)) != _magic:
+                    raise ValueError("不是帧文件: {0}".format(path))
+            if os.path.getsize(path) > len(_magic):
+                self.data = numpy.memmap(path, dtype=numpy.uint8, mode="r")
+
+    # 追加一帧，返回其偏移
+    def append(self, frame):
+        offset = self.size
+        frame = numpy.ascontiguousarray(frame)
+        self.file.seek(offset)
+        self.file.write(frame.tobytes())
+        self.size = _pad(offset + frame.nbytes)
+        return offset
+
+    # 返回偏移处的帧（只读视图）
+    def frame(self, offset, shape):
+        count = int(numpy.prod(shape))
+        return self.data[offset:offset + count].reshape(shape)
+
+    def close(self):
+        if self.file is not None:
+            self.file.truncate(self.size)
+            self.file.close()
+            self.file = None
+
+class RecordingBackend:
+    # 录制后端：截图和输入仍由inner执行，同时写入会话目录
+    # 每帧只在第一次grab时截取一次整屏并写入，区域截图从整屏中切出
+    def __init__(self, inner, path, seed=None):
+        os.makedirs(path, exist_ok=True)
+        self.inner = inner
+        self.path = path
+        self.frames = FrameStore(os.path.join(path, "frames.bin"), write=True)
+        self.log = open(os.path.join(path, "events.jsonl"), "w", encoding="utf-8")
+        self.start = Clock.monotonic()
+        self.rect = tuple(inner.screenRect())
+        self.image = None
+        self.last = None
+        self.count = 0
+        # 固定随机种子，回放时使用同一个种子，点击偏移和随机延时与录制时完全相同
+        self.seed = seed if seed is not None else int(time.time() * 1000) % (2 ** 32)
+        random.seed(self.seed)
+        self.write({"type": "session", "version": 1, "seed": self.seed, "screen": list(self.rect),
+                    "backend": type(inner).__name__, "time": Clock.time(), "imageState": ImageProc.snapshotState()})
+
+    def write(self, event):
+        self.log.write(json.dumps(event, ensure_ascii=False, default=_default) + "\n")
+        self.log.flush()
+
+    # 记录一个事件，kind为事件类型，其余字段原样写入
+    def record(self, kind, **fields):
+        event = {"type": kind, "t": round(Clock.monotonic() - self.start, 4)}
+        event.update(fields)
+        self.write(event)
+
+    def screenRect(self):
+        return self.rect
+
+    def beginFrame(self):
+        self.image = None
+
+    # 本帧的整屏截图，与上一帧相同时只记录引用
+    def capture(self):
+        if self.image is None:
+            self.image = self.inner.screenshot()
+            if self.last is None or not numpy.array_equal(self.image, self.last[1]):
+                offset = self.frames.append(self.image)
+                self.last = (offset, self.image.copy())
+            self.count += 1
+            self.record("frame", offset=self.last[0], shape=list(self.image.shape))
+        return self.image
+
+    def grab(self, left, top, width, height, out=None):
+        return DeviceBackend._cropBGR(self.capture(), left - self.rect[0], top - self.rect[1], width, height, out)
+
+    def screenshot(self):
+        self.beginFrame()
+        return self.capture()
+
+    def touch(self, pos):
+        self.record("input", op="touch", args=[pos])
+        self.inner.touch(pos)
+
+    def longTouch(self, pos, ms):
+        self.record("input", op="longTouch", args=[pos, ms])
+        self.inner.longTouch(pos, ms)
+
+    def slide(self, start, stop, ms):
+        self.record("input", op="slide", args=[start, stop, ms])
+        self.inner.slide(start, stop, ms)
+
+    def press(self, key):
+        self.record("input", op="press", args=[key])
+        self.inner.press(key)
+
+    def close(self):
+        self.frames.close()
+        self.log.close()
+
+# 读取会话目录的事件日志，返回会话信息和按类型分组的事件
+def _readEvents(path):
+    events = []
+    with open(os.path.join(path, "events.jsonl"), "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                events.append(json.loads(line))
+    if len(events) == 0 or events[0]["type"] != "session":
+        raise ValueError("不是会话目录: {0}".format(path))
+    return events[0], {kind: [e for e in events[1:] if e["type"] == kind] for kind in ("frame", "find", "input", "delay")}
+
+class SessionBackend:
+    # 回放后端：第i次截图返回录制的第i帧，第i次输入操作和第i次识图结果必须与录制时一致，否则抛出ReplayMismatch
+    # 截图回放完后抛出ReplayFinished；创建时不改动任何全局状态，调用start()后才开始回放
+    def __init__(self, path):
+        self.path = path
+        self.info, self.queues = _readEvents(path)
+        self.seed = self.info["seed"]
+        self.rect = tuple(self.info["screen"])
+        self.positions = {kind: 0 for kind in self.queues}
+        self.store = FrameStore(os.path.join(path, "frames.bin"))
+        self.image = None
+        self.actions = []
+        self.clock = Clock.VirtualClock(self.info["time"])
+        self.previous = None
+
+    # 开始回放：切换到虚拟时钟，延时只推进虚拟时间；使用录制的随机种子，以及录制时的位置先验、缩放比例和阈值快照
+    # （没有快照的旧会话从空的位置先验和缩放比例开始）；close()恢复之前的时钟和状态，返回self
+    def start(self):
+        if self.previous is None:
+            state = self.info.get("imageState") or {"priors": {}, "scales": {}}
+            self.previous = (Clock.use(self.clock), ImageProc.useState(state, persist=False))
+            random.seed(self.seed)
+        return self
+
+    # 虚拟时间，即回放开始后脚本累计的延时（秒）
+    @property
+    def now(self):
+        return self.clock.now
+
+    # 取出下一个指定类型的录制事件，没有时返回None
+    def next(self, kind):
+        position = self.positions[kind]
+        if position >= len(self.queues[kind]):
+            return None
+        self.positions[kind] = position + 1
+        return self.queues[kind][position]
+
+    # 核对识图等脚本自行记录的事件，延时只计数不核对
+    def record(self, kind, **fields):
+        if kind not in self.queues:
+            return
+        if kind == "delay":
+            self.next(kind)
+            return
+        expected = self.next(kind)
+        actual = _plain(fields)
+        if expected is None:
+            raise ReplayMismatch("第 {0} 个 {1} 事件在录制中不存在: {2}".format(self.positions[kind] + 1, kind, actual))
+        expected = {k: v for k, v in expected.items() if k not in ("type", "t")}
+        if expected != actual:
+            raise ReplayMismatch("第 {0} 个 {1} 事件不一致，录制: {2}，回放: {3}".format(self.positions[kind], kind, expected, actual))
+
+    def screenRect(self):
+        return self.rect
+
+    def beginFrame(self):
+        self.image = None
+
+    def capture(self):
+        if self.image is None:
+            event = self.next("frame")
+            if event is None:
+                raise ReplayFinished(self.path)
+            self.image = self.store.frame(event["offset"], event["shape"])
+        return self.image
+
+    def grab(self, left, top, width, height, out=None):
+        return DeviceBackend._cropBGR(self.capture(), left - self.rect[0], top - self.rect[1], width, height, out)
+
+    def screenshot(self):
+        self.beginFrame()
+        return self.capture()
+
+    def input(self, op, *args):
+        self.actions.append((op,) + args)
+        self.record("input", op=op, args=list(args))
+
+    def touch(self, pos):
+        self.input("touch", pos)
+
+    def longTouch(self, pos, ms):
+        self.input("longTouch", pos, ms)
+
+    def slide(self, start, stop, ms):
+        self.input("slide", start, stop, ms)
+
+    def press(self, key):
+        self.input("press", key)
+
+    # 结束回放，恢复之前使用的时钟、位置先验和缩放比例
+    def close(self):
+        if self.previous is not None:
+            clock, state = self.previous
+            Clock.use(clock)
+            ImageProc.useState(state)
+            self.previous = None
+
+    # 回放进度：各类事件已回放数/录制数，以及虚拟时间
+    def progress(self):
+        res = {kind: (self.positions[kind], len(self.queues[kind])) for kind in self.queues}
+        res["now"] = self.now
+        return res
+
+    # 确认录制的输入操作和识图结果都已回放，否则抛出ReplayMismatch
+    def verify(self):
+        for kind in ("input", "find"):
+            if self.positions[kind] != len(self.queues[kind]):
+                raise ReplayMismatch("录制的 {0} 事件有 {1} 个，回放只发生了 {2} 个".format(kind, len(self.queues[kind]), self.positions[kind]))
+
+# 开始录制，inner为真实的设备后端，返回录制后端，用法：rsh.backend = SessionRecorder.record(rsh.getBackend(), 会话目录)
+def record(inner, path, seed=None):
+    return RecordingBackend(inner, path, seed)
+
+# 回放会话，返回已调用start()的回放后端，用法：rsh.backend = SessionRecorder.replay(会话目录)，结束后调用close()
+def replay(path):
+    return SessionBackend(path).start()
+
+# 会话摘要，只读取事件日志，不切换时钟也不改动随机种子
+def summary(path):
+    info, queues = _readEvents(path)
+    frames = queues["frame"]
+    return {
+        "frames": len(frames),
+        "stored": len(set(e["offset"] for e in frames)),
+        "finds": len(queues["find"]),
+        "inputs": len(queues["input"]),
+        "delay": round(sum(e["seconds"] for e in queues["delay"]), 3),
+        "duration": max([e["t"] for queue in queues.values() for e in queue] + [0]),
+        "size": os.path.getsize(os.path.join(path, "frames.bin")),
+    }
+
+# 命令行：python SessionRecorder.py 会话目录，输出会话摘要
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("用法: python SessionRecorder.py 会话目录")
+        sys.exit(1)
+    s = summary(sys.argv[1])
+    print("【会话】时长 {0:.1f} 秒，截图 {1} 次（保存 {2} 帧，{3:.1f} MB），识图 {4} 次，输入 {5} 次，延时共 {6:.1f} 秒".format(
+        s["duration"], s["frames"], s["stored"], s["size"] / 1024 / 1024, s["finds"], s["inputs"], s["delay"]))
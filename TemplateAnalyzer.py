@@ -0,0 +1,226 @@
+import os, sys, json, cv2, numpy
+import ImageProc, ResourceBundle, ResourceScaler, Log, AtomicFile
+
+# 模板质量分析：用录制的截图库检验资源字典中的每个模板，统计其在各截图中的最高峰值和次高峰值，
+# 得出包含该模板的截图与其余截图之间的置信度间隔，推荐逐模板的置信度阈值，
+# 并在保持足够间隔的前提下建议最小的裁剪范围和通道模式（彩色/灰度），减少每次匹配的计算量
+#
+# 截图库为一个目录（可包含子目录，例如SceneIndex的参考截图目录），应同时包含出现和不出现各模板的截图；
+# 每张截图中模板的最高峰值按最大间隔自动分为“包含”和“不包含”两组，不需要人工标注
+
+# 通道模式：彩色为三通道匹配（与运行时相同），灰度只需约三分之一的计算量
+modes = ("color", "gray")
+
+# 建议的裁剪和通道模式至少要保留的置信度间隔
+safeMargin = 0.1
+
+# 最高峰值低于此值的截图一律视为不包含该模板
+minHit = 0.6
+
+# 裁剪候选：模板宽高各自按这些比例居中裁剪
+cropSteps = (1.0, 0.85, 0.7, 0.55, 0.4)
+
+# 裁剪后的最小边长（像素）
+minCropSize = 8
+
+# 读取截图库目录下的全部截图，返回 [(相对路径, 图像), ...]
+# 给定resolution=(w, h)且截图尺寸不同时，截图缩放到该分辨率，与资源字典截取时的坐标系一致
+def loadCorpus(corpusDir, resolution=None):
+    corpus = []
+    for root, dirs, files in os.walk(corpusDir):
+        dirs.sort()
+        for name in sorted(files):
+            if not name.lower().endswith(ResourceScaler.imageExts):
+                continue
+            path = os.path.join(root, name)
+            img = cv2.imread(path)
+            if img is None:
+                continue
+            if resolution is not None and (img.shape[1], img.shape[0]) != tuple(resolution):
+                img = cv2.resize(img, tuple(resolution), interpolation=cv2.INTER_AREA)
+            corpus.append((os.path.relpath(path, corpusDir), img))
+    return corpus
+
+# 读取资源字典（.py）或资源清单（.json）
+def loadResources(path):
+    return ResourceBundle.loadModule(path)
+
+def _toMode(img, mode):
+    if mode == "gray" and img.ndim == 3:
+        return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return img
+
+# 相对位置(_pos)换算为截图中的查找区域，与BrownDust2的SceneManager一样四周留10%余量
+def _roi(pos, size):
+    w, h = size
+    x0, y0, x1, y1 = int(pos['x0'] * w), int(pos['y0'] * h), int(pos['x1'] * w), int(pos['y1'] * h)
+    mx, my = int((x1 - x0) * 0.1), int((y1 - y0) * 0.1)
+    return (max(0, x0 - mx), max(0, y0 - my), min(w, x1 + mx), min(h, y1 + my))
+
+# 返回(最高峰值, 次高峰值)，次高峰值为屏蔽最高峰附近半个模板大小的范围后的最大值
+def _peaks(screen, template, roi=None):
+    if roi is not None:
+        x0, y0, x1, y1 = roi
+        screen = screen[y0:y1, x0:x1]
+    th, tw = template.shape[:2]
+    if screen.shape[0] < th or screen.shape[1] < tw:
+        return -1.0, -1.0
+    result = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
+    _, best, _, (x, y) = cv2.minMaxLoc(result)
+    result[max(0, y - th // 2):y + th // 2 + 1, max(0, x - tw // 2):x + tw // 2 + 1] = -1
+    _, second, _, _ = cv2.minMaxLoc(result)
+    return float(best), float(second)
+
+# 在最高峰值的最大相邻间隔处切开，返回“包含”组的最低峰值，没有不低于minHit的峰值时返回None
+def _split(peaks):
+    values = sorted(peaks)
+    cut, gap = None, -1.0
+    for i, value in enumerate(values):
+        if value < minHit:
+            continue
+        lower = values[i - 1] if i > 0 else minHit
+        if value - lower > gap:
+            cut, gap = value, value - lower
+    return cut
+
+# 统计模板在截图库上的峰值分布
+# 返回 {"hits": 包含该模板的截图数, "hit": 其中的最低峰值, "ceiling": 其余截图的最高峰值与包含截图中次高峰值的最大者,
+#       "margin": hit - ceiling, "threshold": 推荐阈值}，截图库中从未出现时返回None
+# 推荐阈值取间隔中点，但不低于hit - safeMargin：截图库较小时干扰峰值往往被低估，阈值不宜离最低峰值太远
+def measure(template, corpus, roi=None):
+    best, second = [], []
+    for screen in corpus:
+        b, s = _peaks(screen, template, roi)
+        best.append(b)
+        second.append(s)
+    cut = _split(best)
+    if cut is None:
+        return None
+    hits = [b for b in best if b >= cut]
+    others = [b for b in best if b < cut] + [s for b, s in zip(best, second) if b >= cut]
+    hit = min(hits)
+    ceiling = max(others + [0.0])
+    return {
+        "hits": len(hits),
+        "hit": round(hit, 4),
+        "ceiling": round(ceiling, 4),
+        "margin": round(hit - ceiling, 4),
+        "threshold": round(max((hit + ceiling) / 2, hit - safeMargin), 3),
+    }
+
+# 居中裁剪的候选范围 [(x0, y0, x1, y1), ...]，按面积从小到大排列，不包含完整模板
+def _crops(shape):
+    h, w = shape[:2]
+    crops = set()
+    for fw in cropSteps:
+        for fh in cropSteps:
+            cw, ch = max(minCropSize, int(w * fw)), max(minCropSize, int(h * fh))
+            if cw >= w and ch >= h:
+                continue
+            cw, ch = min(cw, w), min(ch, h)
+            x0, y0 = (w - cw) // 2, (h - ch) // 2
+            crops.add((x0, y0, x0 + cw, y0 + ch))
+    return sorted(crops, key=lambda c: ((c[2] - c[0]) * (c[3] - c[1]), c))
+
+# 建议裁剪范围和通道模式：在间隔不小于safeMargin的候选中选计算量（面积x通道数）最小的，计算量相同时选间隔大的
+# gray为模板的灰度图，默认由template转换；资源包中有预先转换的灰度图时可直接传入（见ImageProc.loadGray）
+# 返回 {"crop": [x0, y0, x1, y1], "mode": 通道模式, "speedup": 相对完整彩色模板的计算量倍数, 以及measure的结果}，没有满足条件的候选时返回None
+def suggest(template, corpora, roi=None, gray=None):
+    templates = {"color": template, "gray": gray if gray is not None else _toMode(template, "gray")}
+    h, w = template.shape[:2]
+    full = w * h * 3
+    best = None
+    for crop in [(0, 0, w, h)] + _crops(template.shape):
+        x0, y0, x1, y1 = crop
+        for mode in modes:
+            cost = (x1 - x0) * (y1 - y0) * (3 if mode == "color" else 1)
+            if best is not None and cost > best[0]:
+                continue
+            stats = measure(templates[mode][y0:y1, x0:x1], corpora[mode], roi)
+            if stats is None or stats["margin"] < safeMargin:
+                continue
+            if best is None or cost < best[0] or stats["margin"] > best[1]["margin"]:
+                best = (cost, dict(stats, crop=list(crop), mode=mode, speedup=round(full / cost, 2)))
+    return best[1] if best else None
+
+# 分析资源对象resources中的全部模板图片，corpus为loadCorpus的结果，names为只分析的变量名列表
+# 返回 {模板路径: 报告}，报告包含变量名、模板尺寸、measure的结果（完整彩色模板，即运行时的用法）和suggest的建议
+def analyze(resources, corpus, names=None):
+    values = {k: v for k, v in vars(resources).items() if not k.startswith("_")}
+    screens = [img for _, img in corpus]
+    corpora = {mode: [_toMode(img, mode) for img in screens] for mode in modes}
+    reports = {}
+    for name, value in values.items():
+        if names is not None and name not in names:
+            continue
+        if not isinstance(value, str) or not value.lower().endswith(ResourceScaler.imageExts):
+            continue
+        template = ImageProc.loadImage(value)
+        if template is None:
+            Log.logger.warning("【模板分析】无法读取模板 %s，已跳过", value)
+            continue
+        pos = values.get(name + "_pos")
+        roi = _roi(pos, (screens[0].shape[1], screens[0].shape[0])) if isinstance(pos, dict) and screens else None
+        report = {"name": name, "size": [template.shape[1], template.shape[0]]}
+        report["stats"] = measure(template, screens, roi)
+        report["suggest"] = suggest(template, corpora, roi, ImageProc.loadGray(value))
+        reports[str(value)] = report
+    return reports
+
+# 打印分析结果
+def printReport(reports):
+    for path, report in reports.items():
+        stats, advice = report["stats"], report["suggest"]
+        if stats is None:
+            print("【模板分析】{0}：截图库中没有出现，无法推荐阈值".format(report["name"]))
+            continue
+        line = "【模板分析】{0} {1}x{2}：出现 {3} 次，最低峰值 {4:.3f}，干扰峰值 {5:.3f}，间隔 {6:.3f}，推荐阈值 {7:.3f}".format(
+            report["name"], report["size"][0], report["size"][1], stats["hits"], stats["hit"], stats["ceiling"], stats["margin"], stats["threshold"])
+        if stats["margin"] <= 0:
+            line += "，模板有歧义，请重新截取"
+        if advice is not None and advice["speedup"] > 1:
+            line += "；建议裁剪为 {0}（{1}），计算量减少到 1/{2}".format(advice["crop"], "灰度" if advice["mode"] == "gray" else "彩色", advice["speedup"])
+        print(line)
+
+# 把推荐阈值写入阈值文件，运行时由ImageProc.threshold读取；间隔不为正的模板不写入，继续使用默认置信度
+def saveThresholds(reports, path):
+    templates = {}
+    for key, report in reports.items():
+        stats = report["stats"]
+        if stats is not None and stats["margin"] > 0:
+            templates[os.path.normpath(key)] = dict(stats, name=report["name"], suggest=report["suggest"])
+    data = {"version": 1, "templates": templates}
+    AtomicFile.write(path, json.dumps(data, ensure_ascii=False, indent=1))
+    Log.logger.info("【模板分析】已写入 %s 个模板的阈值到 %s", len(templates), path)
+    return path
+
+# 按建议的裁剪范围把模板另存到outDir（保持原相对路径），原模板不修改；裁剪后的模板需要重新分析阈值
+def writeCrops(reports, outDir):
+    count = 0
+    for path, report in reports.items():
+        advice = report["suggest"]
+        if advice is None or advice["crop"] == [0, 0] + report["size"]:
+            continue
+        x0, y0, x1, y1 = advice["crop"]
+        dst = os.path.join(outDir, ResourceScaler.outputPath(path))
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        cv2.imwrite(dst, ImageProc.loadImage(path)[y0:y1, x0:x1])
+        count += 1
+    Log.logger.info("【模板分析】已裁剪 %s 个模板到 %s", count, outDir)
+
+# 命令行：python TemplateAnalyzer.py 资源字典.py|清单.json 截图目录 阈值文件 [裁剪输出目录]
+if __name__ == "__main__":
+    if len(sys.argv) not in (4, 5):
+        print("用法: python TemplateAnalyzer.py 资源字典.py|清单.json 截图目录 阈值文件 [裁剪输出目录]")
+        sys.exit(1)
+    rd = loadResources(sys.argv[1])
+    corpus = loadCorpus(sys.argv[2], getattr(rd, "resolution", None))
+    if len(corpus) == 0:
+        print("【模板分析】截图目录 {0} 中没有截图".format(sys.argv[2]))
+        sys.exit(1)
+    print("【模板分析】共 {0} 张截图".format(len(corpus)))
+    reports = analyze(rd, corpus)
+    printReport(reports)
+    saveThresholds(reports, sys.argv[3])
+    if len(sys.argv) == 5:
+        writeCrops(reports, sys.argv[4])
@@ -0,0 +1,133 @@
+import os, sys, json, atexit, threading, collections
+from time import perf_counter_ns
+import settings as st
+import Log
+
+# 热路径追踪：在截图、解码、匹配、输入和延时周围埋点，耗时区间(span)写入环形缓冲区，可导出为Chrome/Perfetto追踪文件
+# 用法：
+#   with Trace.span("locate", "match", 模板路径):
+#       ...
+# 导出的JSON文件可在 chrome://tracing 或 https://ui.perfetto.dev 中打开，按线程显示每个区间
+#
+# 关闭时span返回同一个空上下文管理器，埋点只有一次函数调用，不计时也不分配对象；
+# 开启时每个区间只记录一个元组（名称、分类、说明、开始时间、耗时、线程），字符串拼接和JSON转换都推迟到导出时
+# 区间测量的是真实耗时，直接使用perf_counter_ns，不受Clock中虚拟时钟的影响
+
+enabled = False
+
+# 环形缓冲区，写满后丢弃最早的区间；deque.append是原子操作，多个线程可同时写入
+_buffer = collections.deque(maxlen=st.traceCapacity)
+_origin = perf_counter_ns()
+_ident = threading.get_ident
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_null = _NullSpan()
+
+class _Span:
+    __slots__ = ("name", "cat", "detail", "start")
+
+    def __init__(self, name, cat, detail):
+        self.name = name
+        self.cat = cat
+        self.detail = detail
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = perf_counter_ns()
+        _buffer.append((self.name, self.cat, self.detail, self.start, end - self.start, _ident()))
+        return False
+
+# 返回一个耗时区间，用with包围要测量的代码；name为区间名称，cat为分类（capture/decode/match/input/delay/scene等），
+# detail为可选的说明（例如模板路径），只保存引用，导出时才转换为字符串，不要传入图片数组等大对象
+def span(name, cat, detail=None):
+    if not enabled:
+        return _null
+    return _Span(name, cat, detail)
+
+# 开始追踪，capacity为环形缓冲区最多保存的区间数，默认为settings.traceCapacity
+def enable(capacity=None):
+    global enabled, _buffer
+    if capacity is not None and capacity != _buffer.maxlen:
+        _buffer = collections.deque(_buffer, maxlen=capacity)
+    enabled = True
+
+# 停止追踪，已记录的区间保留，仍可导出
+def disable():
+    global enabled
+    enabled = False
+
+def clear():
+    _buffer.clear()
+
+# 当前缓冲区中的区间数
+def count():
+    return len(_buffer)
+
+# 把缓冲区中的区间转换为Chrome追踪格式的事件列表，时间单位为微秒
+def events():
+    records = list(_buffer)
+    pid = os.getpid()
+    res = []
+    for name, cat, detail, start, duration, tid in records:
+        event = {"name": name, "cat": cat, "ph": "X", "ts": (start - _origin) / 1000, "dur": duration / 1000, "pid": pid, "tid": tid}
+        if detail is not None:
+            event["name"] = "{0} {1}".format(name, detail)
+            event["args"] = {"detail": str(detail)}
+        res.append(event)
+    threads = {t.ident: t.name for t in threading.enumerate()}
+    for tid in sorted(set(r[5] for r in records)):
+        res.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": threads.get(tid, str(tid))}})
+    return res
+
+# 导出追踪文件，path默认为settings.tracePath，返回写入的路径
+def export(path=None):
+    path = path or st.tracePath
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events(), "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+    return path
+
+# 按耗时汇总各区间：{名称: (次数, 总耗时ms, 平均耗时ms, 最大耗时ms)}，按总耗时从大到小排列
+# durations为[(名称, 耗时ns), ...]，默认为缓冲区中的全部区间
+def summary(durations=None):
+    if durations is None:
+        durations = [(r[0], r[4]) for r in list(_buffer)]
+    stats = {}
+    for name, duration in durations:
+        n, total, peak = stats.get(name, (0, 0, 0))
+        stats[name] = (n + 1, total + duration, max(peak, duration))
+    res = {}
+    for name, (n, total, peak) in sorted(stats.items(), key=lambda item: -item[1][1]):
+        res[name] = (n, total / 1e6, total / n / 1e6, peak / 1e6)
+    return res
+
+def _exportAtExit():
+    if len(_buffer) > 0:
+        Log.logger.info("【追踪】已导出 %s 个区间到 %s", len(_buffer), export())
+
+if st.trace:
+    enable()
+atexit.register(_exportAtExit)
+
+# 命令行：python Trace.py 追踪文件，按区间名称汇总耗时
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("用法: python Trace.py 追踪文件")
+        sys.exit(1)
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        data = json.load(f)
+    durations = [(e["name"].split(" ")[0], e["dur"] * 1000) for e in data["traceEvents"] if e["ph"] == "X"]
+    for name, (n, total, mean, peak) in summary(durations).items():
+        print("【追踪】{0}：{1} 次，总耗时 {2:.1f} ms，平均 {3:.3f} ms，最长 {4:.3f} ms".format(name, n, total, mean, peak))
@@ -1,6 +1,9 @@
 #图片匹配置信度，0-1之间，默认0.93，如果匹配出错误目标则提高置信度，如果要模糊匹配或高置信度无法匹配则降低置信度
 accuracy = 0.93
 
+#逐模板置信度阈值文件，由TemplateAnalyzer根据截图库生成，有分析结果的模板使用推荐阈值代替accuracy
+thresholdPath = './thresholds.json'
+
 #缓存文件存放地址，以/结尾
 cache_path = './cache/'
 
@@ -17,3 +20,73 @@ touchDelayRange = 30
 #滑屏所需时长范围[slideMinVer,slideMaxVer]，单位毫秒 (滑屏操作不能太快，建议最小值设置在500ms以上)
 slideMinVer = 500
 slideMaxVer = 3000
+
+#场景索引分类时允许的最大汉明距离，超过此值视为无法判断场景
+sceneMaxDistance = 96
+
+#是否启用位置先验：记录模板命中过的位置，下次先在该位置附近的小窗口内查找，未命中再全图查找
+usePrior = True
+
+#位置先验文件存放地址
+priorPath = cache_path + 'priors.json'
+
+#位置先验查找窗口在模板四周外扩的像素数
+priorMargin = 16
+
+#每个模板在每种分辨率下最多记录的历史位置数
+priorHistory = 4
+
+#某个历史位置连续未命中此次数后失效
+priorMaxMiss = 5
+
+#历史位置超过此时长（秒）未命中则在启动时丢弃
+priorMaxAge = 7 * 24 * 3600
+
+#位置先验写入文件的最小间隔（秒），程序退出时会再写入一次
+priorSaveInterval = 10
+
+#是否启用多尺度匹配：模拟器DPI不同导致界面元素大小略有差异时开启，首次查找时搜索缩放范围内的最佳比例并记住，之后只在该比例附近匹配
+multiScale = False
+
+#多尺度匹配的缩放范围[min,max]及搜索步长
+scaleRange = (0.8, 1.2)
+scaleStep = 0.05
+
+#已学习比例未命中时，在其上下此范围内再尝试一次
+scaleBand = 0.02
+
+#尚未学习比例的模板完整搜索未命中后，此时间（秒）内只按原尺寸匹配，不再重复搜索全部比例
+scaleRetryInterval = 10
+
+#学习到的缩放比例存放地址，按 设备|模板所在目录 记录
+scalePath = cache_path + 'scales.json'
+
+#是否启用热路径追踪：记录截图、解码、匹配、输入和延时的耗时区间，程序退出时导出为Chrome/Perfetto追踪文件（见Trace）
+trace = False
+
+#追踪文件存放地址，可在 chrome://tracing 或 https://ui.perfetto.dev 中打开
+tracePath = cache_path + 'trace.json'
+
+#追踪环形缓冲区最多保存的区间数，超出后丢弃最早的区间
+traceCapacity = 100000
+
+#是否提供运行指标：启动时在本机metricsPort端口提供Prometheus格式的HTTP指标接口，程序退出时把指标写入metricsPath（见Metrics）
+metrics = False
+
+#HTTP指标接口的端口
+metricsPort = 9108
+
+#指标文件存放地址
+metricsPath = cache_path + 'metrics.prom'
+
+#日志级别，DEBUG、INFO、WARNING、ERROR，低于此级别的日志不输出也不格式化（见Log）
+logLevel = 'INFO'
+
+#日志格式，text为文本，json为每行一个JSON（多开时便于汇总检索）
+logFormat = 'text'
+
+#日志文件存放地址，为空时只输出到控制台
+logPath = ''
+
+#重复日志的汇总间隔（秒），间隔内重复的同一条日志只输出一次，之后附带重复次数
+logRepeatInterval = 60
\ No newline at end of file
@@ -0,0 +1,22 @@
+import os, sys
+
+# 框架模块位于项目根目录，BrownDust2的模块按所在目录导入；资源路径相对于项目根目录
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "BrownDust2"))
+os.chdir(ROOT)
+
+import pytest
+
+@pytest.fixture
+def image_state(tmp_path, monkeypatch):
+    """ImageProc的位置先验、缩放比例和阈值从空开始，文件写入临时目录，测试结束后恢复"""
+    pytest.importorskip("numpy")
+    pytest.importorskip("cv2")
+    import ImageProc
+    import settings as st
+    monkeypatch.setattr(st, "priorPath", str(tmp_path / "priors.json"))
+    monkeypatch.setattr(st, "scalePath", str(tmp_path / "scales.json"))
+    previous = ImageProc.useState({"priors": {}, "scales": {}, "thresholds": {}}, persist=True)
+    yield tmp_path
+    ImageProc.useState(previous)
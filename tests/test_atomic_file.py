@@ -0,0 +1,47 @@
+import os, threading
+import pytest
+import AtomicFile
+
+def test_write_text_and_bytes(tmp_path):
+    path = str(tmp_path / "sub" / "a.json")
+    AtomicFile.write(path, "数据")
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == "数据"
+    AtomicFile.write(path, b"\x00\x01")
+    with open(path, "rb") as f:
+        assert f.read() == b"\x00\x01"
+    assert os.listdir(str(tmp_path / "sub")) == ["a.json"]
+
+def test_failed_write_keeps_old_file(tmp_path):
+    path = str(tmp_path / "a.txt")
+    AtomicFile.write(path, "old")
+    with pytest.raises(RuntimeError):
+        with AtomicFile.open(path) as f:
+            f.write("half")
+            raise RuntimeError()
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == "old"
+    assert os.listdir(str(tmp_path)) == ["a.txt"]
+
+def test_concurrent_writers_do_not_share_temp_file(tmp_path):
+    path = str(tmp_path / "a.txt")
+    errors = []
+
+    def writer(i):
+        try:
+            for _ in range(50):
+                AtomicFile.write(path, str(i) * 1000)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    with open(path, encoding="utf-8") as f:
+        data = f.read()
+    # 最后一次写入完整保留，不会混入其他线程的内容
+    assert len(data) == 1000 and len(set(data)) == 1
+    assert os.listdir(str(tmp_path)) == ["a.txt"]
@@ -0,0 +1,101 @@
+import threading
+import pytest
+import Clock
+
+class FakeTime:
+    # 代替Clock中的time模块，perf_counter由测试推进
+    def __init__(self):
+        self.counter = 100.0
+        self.slept = []
+
+    def time(self):
+        return 1000.0
+
+    def perf_counter(self):
+        return self.counter
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+
+def test_virtual_clock_sleep_advances_without_waiting():
+    clock = Clock.VirtualClock(start=500)
+    clock.sleep(2.5)
+    clock.sleep(0)
+    clock.sleep(-1)
+    assert clock.monotonic() == 2.5
+    assert clock.time() == 502.5
+    assert clock.now == 2.5
+
+def test_virtual_clock_wait():
+    clock = Clock.VirtualClock(start=0)
+    event = threading.Event()
+    assert clock.wait(event, 3) is False
+    assert clock.monotonic() == 3
+    event.set()
+    assert clock.wait(event, 3) is True
+    assert clock.monotonic() == 3
+
+def test_virtual_clock_concurrent_waits_overlap():
+    clock = Clock.VirtualClock(start=0)
+    barrier = threading.Barrier(2)
+
+    def run(seconds):
+        clock.monotonic()
+        barrier.wait()
+        clock.sleep(seconds)
+
+    threads = [threading.Thread(target=run, args=(s,)) for s in (5, 3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert clock.now == 5
+
+def test_virtual_clock_sync():
+    clock = Clock.VirtualClock(start=0)
+    clock.sleep(4)
+    result = []
+
+    def run():
+        clock.sync(1)
+        clock.sleep(2)
+        result.append(clock.monotonic())
+        clock.sync()
+        result.append(clock.monotonic())
+
+    t = threading.Thread(target=run)
+    t.start()
+    t.join()
+    assert result == [3, 4]
+    assert clock.now == 4
+
+def test_scaled_clock(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(Clock, "_time", fake)
+    clock = Clock.ScaledClock(10)
+    fake.counter += 1.5
+    assert clock.monotonic() == pytest.approx(15)
+    assert clock.time() == pytest.approx(1015)
+    clock.sleep(10)
+    clock.sleep(0)
+    assert fake.slept == [1]
+
+def test_scaled_clock_wait_scales_timeout():
+    clock = Clock.ScaledClock(1000)
+    event = threading.Event()
+    assert clock.wait(event, 0.5) is False
+    event.set()
+    assert clock.wait(event, 100) is True
+
+def test_scaled_clock_rejects_non_positive_factor():
+    with pytest.raises(ValueError):
+        Clock.ScaledClock(0)
+
+def test_use_returns_previous_clock():
+    clock = Clock.VirtualClock(start=0)
+    previous = Clock.use(clock)
+    try:
+        Clock.sleep(7)
+        assert Clock.monotonic() == 7
+    finally:
+        assert Clock.use(previous) is clock
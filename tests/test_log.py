@@ -0,0 +1,55 @@
+import logging
+import Log
+
+class FakeTime:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+def record(msg, *args, **extra):
+    r = logging.LogRecord("rsh", logging.INFO, __file__, 1, msg, args, None)
+    r.__dict__.update(extra)
+    return r
+
+def test_repeat_filter_suppresses_within_interval(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(Log, "time", fake)
+    f = Log.RepeatFilter(60)
+    assert f.filter(record("识别 %s 失败", "a", **Log.repeated("miss", "a")))
+    fake.now = 10
+    assert not f.filter(record("识别 %s 失败", "a", **Log.repeated("miss", "a")))
+    assert not f.filter(record("识别 %s 失败", "a", **Log.repeated("miss", "a")))
+    # 不同key和不汇总的日志不受影响
+    assert f.filter(record("识别 %s 失败", "b", **Log.repeated("miss", "b")))
+    assert f.filter(record("处理场景"))
+    assert f.filter(record("处理场景"))
+
+    fake.now = 61
+    r = record("识别 %s 失败", "a", **Log.repeated("miss", "a"))
+    assert f.filter(r)
+    assert r.repeatCount == 2
+    assert "重复 2 次" in r.getMessage()
+
+def test_repeat_filter_key_from_template_and_args(monkeypatch):
+    monkeypatch.setattr(Log, "time", FakeTime())
+    f = Log.RepeatFilter(60)
+    assert f.filter(record("识别 %s 失败", "a", **Log.repeated()))
+    assert not f.filter(record("识别 %s 失败", "a", **Log.repeated()))
+    assert f.filter(record("识别 %s 失败", "b", **Log.repeated()))
+
+def test_repeat_filter_flush(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(Log, "time", fake)
+    f = Log.RepeatFilter(60)
+    f.filter(record("识别 %s 失败", "a", **Log.repeated("a")))
+    f.filter(record("识别 %s 失败", "b", **Log.repeated("b")))
+    fake.now = 5
+    f.filter(record("识别 %s 失败", "a", **Log.repeated("a")))
+    flushed = f.flush()
+    assert len(flushed) == 1
+    assert flushed[0].repeatCount == 1
+    assert f.flush() == []
+    # flush后重新计数
+    assert f.filter(record("识别 %s 失败", "a", **Log.repeated("a")))
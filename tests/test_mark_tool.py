@@ -0,0 +1,41 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("tkinter")
+import ResourceManifest
+from MarkTool import MarkTool
+
+@pytest.fixture
+def tool(tmp_path):
+    source = np.zeros((400, 800, 3), np.uint8)
+    source[100, 200] = (10, 20, 30)
+    return MarkTool(source, str(tmp_path / "dict.json"), scale=0.5, sig_tolerance=8)
+
+def test_display_coordinates(tool):
+    assert tool.img_base.shape[:2] == (200, 400)
+    assert tool.to_source(100, 50) == (200, 100)
+    # 超出画面的鼠标坐标限制在原图范围内
+    assert tool.to_source(-5, 500) == (0, 399)
+    assert tool.to_display((200, 100)) == (100, 50)
+
+def test_dirty_region_is_restored(tool):
+    cv2.rectangle(tool.img_display, (10, 10), (50, 40), (0, 255, 0), 2)
+    tool.mark_dirty(50, 40, 10, 10)
+    tool.mark_dirty(60, 60, 60, 60)
+    assert tool.dirty == (6, 6, 65, 65)
+    tool.restore_dirty()
+    assert tool.dirty is None
+    assert np.array_equal(tool.img_display, tool.img_base)
+
+def test_throttled(tool):
+    assert not tool.throttled()
+    assert tool.throttled()
+    assert not tool.throttled(force=True)
+
+def test_signature_saved_relative(tool, tmp_path):
+    tool.sigProbes = [(200, 100, (10, 20, 30))]
+    tool.createSignature("start")
+    manifest = ResourceManifest.Manifest(str(tmp_path / "dict.json"))
+    assert manifest.resolution == (800, 400)
+    assert manifest.entries["start_sig"] == {"type": "signature", "value": [[0.25, 0.25, [10, 20, 30], 8]]}
@@ -0,0 +1,47 @@
+import pytest
+import Metrics
+
+def test_counter_render():
+    c = Metrics.Counter("test_total", "测试计数", ("template", "result"))
+    c.labels("a", "hit").inc()
+    c.labels("a", "hit").inc(2)
+    c.labels("b\"", "miss").inc()
+    assert c.render() == [
+        "# HELP test_total 测试计数",
+        "# TYPE test_total counter",
+        "test_total{template=\"a\",result=\"hit\"} 3",
+        "test_total{template=\"b\\\"\",result=\"miss\"} 1",
+    ]
+
+def test_gauge_without_labels():
+    g = Metrics.Gauge("test_gauge", "测试仪表")
+    g.set(2.5)
+    g.dec()
+    assert g.render()[-1] == "test_gauge 1.5"
+    g.clear()
+    assert g.render()[-1] == "test_gauge 0"
+
+def test_histogram_render_is_cumulative():
+    h = Metrics.Histogram("test_seconds", "测试耗时", ("op",), buckets=(1, 0.1))
+    for value in (0.05, 0.1, 0.5, 3):
+        h.labels("touch").observe(value)
+    assert h.render()[2:] == [
+        "test_seconds_bucket{op=\"touch\",le=\"0.1\"} 2",
+        "test_seconds_bucket{op=\"touch\",le=\"1\"} 3",
+        "test_seconds_bucket{op=\"touch\",le=\"+Inf\"} 4",
+        "test_seconds_sum{op=\"touch\"} 3.65",
+        "test_seconds_count{op=\"touch\"} 4",
+    ]
+
+def test_labels_require_all_names():
+    c = Metrics.Counter("test_labels_total", "测试", ("op",))
+    with pytest.raises(ValueError):
+        c.labels()
+
+def test_register_returns_existing_metric():
+    a = Metrics.counter("test_registered_total", "测试")
+    assert Metrics.counter("test_registered_total", "测试") is a
+    a.inc()
+    assert "test_registered_total 1\n" in Metrics.render()
+    with pytest.raises(ValueError):
+        Metrics.gauge("test_registered_total", "测试")
@@ -0,0 +1,88 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+import Clock
+import ImageProc
+import settings as st
+
+rng = np.random.default_rng(0)
+TEMPLATE = cv2.GaussianBlur(rng.integers(0, 255, (60, 80, 3), dtype=np.uint8), (9, 9), 0)
+BACKGROUND = cv2.GaussianBlur(rng.integers(0, 255, (300, 400, 3), dtype=np.uint8), (9, 9), 0)
+
+def make_screen(scale=None):
+    """背景上按scale缩放后贴一份模板，scale为None时只有背景"""
+    screen = BACKGROUND.copy()
+    if scale is not None:
+        scaled = cv2.resize(TEMPLATE, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+        h, w = scaled.shape[:2]
+        screen[100:100 + h, 120:120 + w] = scaled
+    return screen
+
+@pytest.fixture
+def target(image_state, monkeypatch):
+    monkeypatch.setattr(st, "multiScale", True)
+    monkeypatch.setattr(st, "usePrior", False)
+    path = str(image_state / "t.png")
+    cv2.imwrite(path, TEMPLATE)
+    return path
+
+@pytest.fixture
+def sweeps(monkeypatch):
+    """记录每次_searchScales搜索的比例"""
+    calls = []
+    search = ImageProc._searchScales
+
+    def counting(screen, wanted, wanted_cv2, scales, roi=None):
+        calls.append([round(s, 2) for s in scales])
+        return search(screen, wanted, wanted_cv2, scales, roi)
+    monkeypatch.setattr(ImageProc, "_searchScales", counting)
+    return calls
+
+def learned(screen, path):
+    return ImageProc._scales.get(ImageProc._scaleKey(path, screen.shape))
+
+def test_learns_scale_then_matches_at_it(target, sweeps):
+    screen = make_screen(1.1)
+    assert ImageProc.locate(screen, target, 0.95) == (120, 100)
+    assert learned(screen, target) == 1.1
+    assert len(sweeps) == 1 and len(sweeps[0]) == 9
+    # 之后直接按学习到的比例匹配，不再搜索
+    assert ImageProc.locate(screen, target, 0.95) == (120, 100)
+    assert len(sweeps) == 1
+
+def test_original_size_hit_skips_sweep(target, sweeps):
+    screen = make_screen(1.0)
+    assert ImageProc.locate(screen, target, 0.95) == (120, 100)
+    assert learned(screen, target) == 1.0
+    assert sweeps == []
+
+def test_rebands_when_learned_scale_misses(target, sweeps):
+    ImageProc.locate(make_screen(1.1), target, 0.95)
+    screen = make_screen(1.12)
+    # 1.1下置信度不够，在scaleBand范围内再试一次并更新比例
+    assert ImageProc.locate(screen, target, 0.98) == (120, 100)
+    assert sweeps[-1] == [1.08, 1.12]
+    assert learned(screen, target) == 1.12
+
+def test_missing_template_does_not_sweep_every_poll(target, sweeps):
+    clock = Clock.VirtualClock(start=0)
+    previous = Clock.use(clock)
+    try:
+        screen = make_screen()
+        assert ImageProc.locate(screen, target, 0.95) is None
+        assert len(sweeps) == 1
+        # 轮询等待期间只按原尺寸匹配
+        for _ in range(5):
+            clock.sleep(1)
+            assert ImageProc.locate(screen, target, 0.95) is None
+        assert len(sweeps) == 1
+        clock.sleep(st.scaleRetryInterval)
+        assert ImageProc.locate(screen, target, 0.95) is None
+        assert len(sweeps) == 2
+        # 模板出现后仍能学习比例
+        clock.sleep(st.scaleRetryInterval)
+        assert ImageProc.locate(make_screen(1.1), target, 0.95) == (120, 100)
+        assert learned(screen, target) == 1.1
+    finally:
+        Clock.use(previous)
@@ -0,0 +1,71 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+import Clock
+import ImageProc
+import settings as st
+
+def make_screen(positions, template=None, seed=0):
+    """噪声背景，把模板贴到各位置，返回(画面, 模板)；template为None时从画面(200, 100)处截取模板"""
+    rng = np.random.default_rng(seed)
+    screen = cv2.GaussianBlur(rng.integers(0, 255, (300, 400, 3), dtype=np.uint8), (3, 3), 0)
+    if template is None:
+        template = np.ascontiguousarray(screen[100:140, 200:260])
+    else:
+        for x, y in positions:
+            th, tw = template.shape[:2]
+            screen[y:y + th, x:x + tw] = template
+    return screen, template
+
+@pytest.fixture
+def target(image_state, monkeypatch):
+    monkeypatch.setattr(st, "usePrior", True)
+    monkeypatch.setattr(st, "multiScale", False)
+    screen, template = make_screen([])
+    path = str(image_state / "t.png")
+    cv2.imwrite(path, template)
+    return path, screen, template
+
+def hits(path, screen):
+    return ImageProc._getPrior(path, screen.shape)["hits"]
+
+def test_prior_hit_is_counted(target):
+    path, screen, _ = target
+    assert ImageProc.locate(screen, path, 0.9) == (200, 100)
+    assert [h[:3] for h in hits(path, screen)] == [[200, 100, 1]]
+    # 第二次在先验窗口内命中，累加次数
+    assert ImageProc.locate(screen, path, 0.9) == (200, 100)
+    assert [h[:3] for h in hits(path, screen)] == [[200, 100, 2]]
+
+def test_prior_miss_eviction(target, monkeypatch):
+    monkeypatch.setattr(st, "priorMaxMiss", 3)
+    path, screen, template = target
+    ImageProc.locate(screen, path, 0.9)
+    # 模板移到别处：先验窗口未命中，完整匹配找到新位置
+    moved, _ = make_screen([(20, 30)], template, seed=1)
+    for i in range(2):
+        assert ImageProc.locate(moved, path, 0.9) == (20, 30)
+    positions = {(h[0], h[1]): h[4] for h in hits(path, screen)}
+    assert positions[(200, 100)] == 2 and positions[(20, 30)] == 0
+    # 连续priorMaxMiss次未命中的位置被淘汰
+    ImageProc.locate(moved, path, 0.9)
+    assert [(h[0], h[1]) for h in hits(path, screen)] == [(20, 30)]
+
+def test_prior_max_age(target, monkeypatch):
+    path, screen, _ = target
+    ImageProc.locate(screen, path, 0.9)
+    ImageProc.savePriors()
+    # 读取时丢弃超过priorMaxAge没有命中的位置
+    monkeypatch.setattr(Clock, "time", lambda: 1e12)
+    ImageProc.loadPriors()
+    assert hits(path, screen) == []
+
+def test_prior_respects_roi(target):
+    path, screen, template = target
+    ImageProc.locate(screen, path, 0.9)
+    both, _ = make_screen([(200, 100), (20, 30)], template, seed=1)
+    # 记住的位置在roi之外，不能返回，也不计为未命中
+    assert ImageProc.locate(both, path, 0.9, roi=(0, 0, 150, 150)) == (20, 30)
+    positions = {(h[0], h[1]): h[4] for h in hits(path, screen)}
+    assert positions[(200, 100)] == 0
@@ -0,0 +1,71 @@
+import os, json, types
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+import ImageProc
+import ResourceBundle
+import settings as st
+
+@pytest.fixture
+def module(tmp_path, monkeypatch):
+    """按200x100截取的资源字典模块，两张模板图片；缩放缓存写入临时目录"""
+    monkeypatch.setattr(st, "cache_path", str(tmp_path / "cache") + "/")
+    rng = np.random.default_rng(0)
+    source = tmp_path / "res.py"
+    source.write_text("")
+    module = types.ModuleType("res")
+    module.__file__ = str(source)
+    module.resolution = (200, 100)
+    module.btn_point = (20, 10)
+    for name in ("btn", "icon"):
+        path = str(tmp_path / (name + ".png"))
+        cv2.imwrite(path, rng.integers(0, 255, (10, 20, 3), dtype=np.uint8))
+        setattr(module, name, path)
+    return module
+
+def test_build_and_load_round_trip(module, tmp_path):
+    path = ResourceBundle.build(module, str(tmp_path / "res.bundle"), sizes=[(400, 200)], confidences={"btn": 0.8})
+    bundle = ResourceBundle.load(path)
+    # 两张原图和两张缩放版本
+    assert len(bundle) == 4
+    assert module.btn in bundle and module.icon in bundle
+    assert bundle.module == "res" and bundle.sizes == [(400, 200)]
+    assert bundle.values() == {"resolution": (200, 100), "btn_point": (20, 10), "btn": module.btn, "icon": module.icon}
+    img = cv2.imread(module.btn)
+    assert np.array_equal(bundle.image(module.btn), img)
+    assert np.array_equal(bundle.image(module.btn, gray=True), cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+    assert bundle.stats(module.btn)["mean"] == [round(float(v), 3) for v in img.reshape(-1, 3).mean(axis=0)]
+
+    # 置信度按变量名和图片路径读取，缩放版本使用原图的置信度
+    assert bundle.confidence("btn") == 0.8 and bundle.confidence("icon", 0.9) == 0.9
+    assert bundle.threshold(module.btn) == 0.8
+    assert bundle.threshold(module.icon, 0.9) == 0.9
+    scaled = [key for key in bundle.entries if key.endswith("btn.png") and key != os.path.normpath(module.btn)]
+    assert len(scaled) == 1 and bundle.threshold(scaled[0]) == 0.8
+    assert bundle.image(scaled[0]).shape == (20, 40, 3)
+
+def test_build_reads_threshold_file(module, tmp_path, image_state):
+    thresholds = tmp_path / "thresholds.json"
+    thresholds.write_text(json.dumps({"templates": {module.icon: {"threshold": 0.77}}}))
+    bundle = ResourceBundle.load(ResourceBundle.build(module, str(tmp_path / "res.bundle"), thresholdPath=str(thresholds)))
+    assert bundle.confidences == {"icon": 0.77}
+    assert bundle.threshold(module.icon) == 0.77
+
+def test_image_proc_uses_bundle(module, tmp_path, image_state, monkeypatch):
+    monkeypatch.setattr(ImageProc, "bundles", [])
+    bundle = ResourceBundle.load(ResourceBundle.build(module, str(tmp_path / "res.bundle"), confidences={"btn": 0.8}))
+    ImageProc.useBundle(bundle)
+    ImageProc.useBundle(ResourceBundle.load(bundle.path))
+    assert len(ImageProc.bundles) == 1
+    assert ImageProc.threshold(module.btn, 0.9) == 0.8
+    assert ImageProc.threshold(module.icon, 0.9) == 0.9
+    assert isinstance(ImageProc.loadImage(module.btn), np.memmap)
+
+def test_modified_image_is_not_used(module, tmp_path):
+    path = ResourceBundle.build(module, str(tmp_path / "res.bundle"))
+    mtime = os.path.getmtime(module.btn) + 10
+    os.utime(module.btn, (mtime, mtime))
+    bundle = ResourceBundle.load(path)
+    assert module.btn not in bundle and module.icon in bundle
+    assert bundle.image(module.btn) is None
@@ -0,0 +1,86 @@
+import json
+import pytest
+
+# 资源清单通过ImageProc读取图片，依赖numpy和OpenCV
+pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+import ResourceManifest
+
+LEGACY = '''resolution = (2560, 1440)
+exit = "./img/exit.png"
+exit_pos = {'x0': 0.8, 'y0': 0.9, 'x1': 1.0, 'y1': 1.0}
+exit_confirm = "./img/exit_confirm.png"
+exit_confirm_click = ((100, 200), (300, 400))
+exit_confirm_sig = [(10, 20, (255, 255, 255), 8)]
+swipe = ((0, 0), (100, 0))
+start = (640, 360)
+retries = 3
+_private = 1
+'''
+
+def test_save_load_round_trip(tmp_path):
+    path = str(tmp_path / "dict.json")
+    manifest = ResourceManifest.Manifest(path)
+    manifest.resolution = (1920, 1080)
+    manifest.add("start", "point", [640, 360])
+    manifest.add("start_sig", "signature", [[1, 2, [3, 4, 5], 6]])
+    with pytest.raises(KeyError):
+        manifest.add("start", "point", [0, 0])
+    with pytest.raises(ValueError):
+        manifest.add("other", "unknown", 0)
+
+    loaded = ResourceManifest.Manifest(path)
+    assert loaded.resolution == (1920, 1080)
+    assert loaded.entries == manifest.entries
+    assert len(loaded) == 2 and "start" in loaded
+
+    loaded.remove("start_sig")
+    assert "start_sig" not in ResourceManifest.Manifest(path)
+    # 写入后不留下临时文件
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["dict.json"]
+
+def test_resources_attribute_lookup(tmp_path):
+    path = str(tmp_path / "dict.json")
+    manifest = ResourceManifest.Manifest(path)
+    manifest.resolution = (2560, 1440)
+    manifest.add("exit", "image", "./img/exit.png")
+    manifest.add("exit_click", "rect", [[1, 2], [3, 4]])
+    manifest.add("swipe", "vector", [[0, 0], [100, 0]])
+    manifest.add("exit_sig", "signature", [[10, 20, [255, 255, 255], 8]])
+
+    rd = ResourceManifest.load(path)
+    assert rd.__name__ == "dict"
+    assert rd.resolution == (2560, 1440)
+    assert isinstance(rd.exit, ResourceManifest.Template) and rd.exit == "./img/exit.png"
+    assert rd.exit_click == ((1, 2), (3, 4))
+    assert rd.swipe == ((0, 0), (100, 0))
+    assert rd.exit_sig == [(10, 20, (255, 255, 255), 8)]
+    with pytest.raises(AttributeError):
+        rd.exit_confirm
+
+def test_convert_legacy_dictionary(tmp_path):
+    source = tmp_path / "legacyDict.py"
+    source.write_text(LEGACY, encoding="utf-8")
+    path = str(tmp_path / "legacyDict.json")
+    manifest = ResourceManifest.convert(str(source), path)
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    assert data["resolution"] == [2560, 1440]
+    types = {name: entry["type"] for name, entry in data["entries"].items()}
+    # 名称相近的条目各自保留，不会互相覆盖
+    assert types == {
+        "exit": "image", "exit_pos": "pos",
+        "exit_confirm": "image", "exit_confirm_click": "rect", "exit_confirm_sig": "signature",
+        "swipe": "vector", "start": "point", "retries": "value",
+    }
+    assert len(manifest) == 8
+
+    rd = ResourceManifest.load(path)
+    assert rd.exit == "./img/exit.png"
+    assert rd.exit_confirm == "./img/exit_confirm.png"
+    assert rd.exit_pos == {'x0': 0.8, 'y0': 0.9, 'x1': 1.0, 'y1': 1.0}
+    assert rd.exit_confirm_click == ((100, 200), (300, 400))
+    assert rd.exit_confirm_sig == [(10, 20, (255, 255, 255), 8)]
+    assert rd.start == (640, 360)
+    assert rd.retries == 3
@@ -0,0 +1,66 @@
+import os, types
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+import ResourceScaler
+
+def test_fit_scale_centers_with_offset():
+    assert ResourceScaler.fitScale((1000, 500), (2000, 1000)) == (2.0, (0.0, 0.0))
+    # 设备更高：按宽度缩放，上下各留100像素黑边
+    assert ResourceScaler.fitScale((1000, 500), (2000, 1200)) == (2.0, (0.0, 100.0))
+    # 设备更宽：按高度缩放，左右各留黑边
+    assert ResourceScaler.fitScale((1000, 500), (1200, 500)) == (1.0, (100.0, 0.0))
+
+@pytest.fixture
+def module(tmp_path):
+    """按1000x500截取的资源字典模块"""
+    template = str(tmp_path / "btn.png")
+    cv2.imwrite(template, np.full((20, 40, 3), 128, np.uint8))
+    source = tmp_path / "res.py"
+    source.write_text("")
+    module = types.ModuleType("res")
+    module.__file__ = str(source)
+    module.resolution = (1000, 500)
+    module.btn = template
+    module.btn_point = (100, 50)
+    module.btn_pos = {"x0": 0.1, "y0": 0.1, "x1": 0.14, "y1": 0.14, "w": 0.04, "h": 0.04}
+    module.btn_sig = [(100, 50, (128, 128, 128), 10), (0.5, 0.5, (0, 0, 0), 10)]
+    return module
+
+def test_scale_resources_with_offset(module, tmp_path):
+    rd = ResourceScaler.scaleResources(module, (1200, 2000), str(tmp_path / "cache"))
+    # wm size返回竖屏尺寸，按资源方向换算为2000x1200
+    assert rd.resolution == (2000, 1200)
+    assert rd.btn_point == (200, 200)
+    assert rd.scale(((0, 0), (10, 10))) == ((0, 100), (20, 120))
+    assert rd.scaleLength(400) == 800
+    assert rd.btn_pos["x0"] == 0.1 and rd.btn_pos["y0"] == round((50 * 2 + 100) / 1200, 4)
+    assert rd.btn_pos["h"] == round(20 * 2 / 1200, 4)
+    assert rd.btn_sig == [(200, 200, (128, 128, 128), 10), (0.5, 0.5, (0, 0, 0), 10)]
+    assert rd.btn.startswith(str(tmp_path / "cache" / "2000x1200"))
+    assert cv2.imread(rd.btn).shape[:2] == (40, 80)
+
+def test_scale_resources_reuses_cache(module, tmp_path, monkeypatch):
+    cachePath = str(tmp_path / "cache")
+    first = ResourceScaler.scaleResources(module, (2000, 1200), cachePath)
+    # 缓存未过期时不再缩放图片
+    monkeypatch.setattr(ResourceScaler, "_scaleImage", lambda *args, **kwargs: pytest.fail("缓存未被复用"))
+    second = ResourceScaler.scaleResources(module, (2000, 1200), cachePath)
+    assert second.values() == first.values()
+    assert second.scale((10, 10)) == first.scale((10, 10))
+
+def test_scale_resources_regenerates_stale_cache(module, tmp_path):
+    cachePath = str(tmp_path / "cache")
+    first = ResourceScaler.scaleResources(module, (2000, 1200), cachePath)
+    # 原图比缓存新时重新生成
+    mtime = os.path.getmtime(first.btn)
+    os.utime(module.btn, (mtime + 10, mtime + 10))
+    cv2.imwrite(module.btn, np.full((10, 10, 3), 128, np.uint8))
+    os.utime(module.btn, (mtime + 10, mtime + 10))
+    second = ResourceScaler.scaleResources(module, (2000, 1200), cachePath)
+    assert cv2.imread(second.btn).shape[:2] == (20, 20)
+
+def test_scale_resources_same_size_and_unknown_device(module):
+    assert ResourceScaler.scaleResources(module, (1000, 500)).btn == module.btn
+    assert ResourceScaler.scaleResources(module, None).btn_point == (100, 50)
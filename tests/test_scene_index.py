@@ -0,0 +1,39 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+import SceneIndex
+import settings as st
+
+def make_scene(seed):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 255, (90, 160, 3), dtype=np.uint8)
+
+@pytest.fixture
+def index():
+    index = SceneIndex.SceneIndex()
+    index.add("a", make_scene(1))
+    index.add("b", make_scene(2))
+    return index
+
+def test_nearest_at_threshold(index):
+    image = make_scene(1).copy()
+    # 反转左上角一个分块，与a的距离变大但仍远小于与b的距离
+    image[:30, :53] = 255 - image[:30, :53]
+    distance = index.classify(image, 1)[0]
+    assert distance[0] == "a" and distance[1] > 0
+    # 距离等于阈值时仍返回标签，超过阈值时返回None
+    assert index.nearest(image, distance[1]) == "a"
+    assert index.nearest(image, distance[1] - 1) is None
+
+def test_nearest_uses_settings_threshold(index, monkeypatch):
+    monkeypatch.setattr(st, "sceneMaxDistance", 0)
+    assert index.nearest(make_scene(2)) == "b"
+    assert index.nearest(255 - make_scene(2)) is None
+
+def test_save_and_load(index, tmp_path):
+    path = str(tmp_path / "index.npz")
+    index.save(path)
+    loaded = SceneIndex.SceneIndex.load(path)
+    assert loaded.labels == ["a", "b"]
+    assert loaded.nearest(make_scene(2), 0) == "b"
@@ -0,0 +1,191 @@
+import itertools
+import pytest
+
+# 场景配置依赖numpy和OpenCV，未安装时跳过
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+from scene_config import Scene, SceneElement, SceneRegistry, merge_regions
+
+SCREEN = (0, 0, 1000, 1000)
+
+def test_merge_regions_merges_nearby_rects():
+    rects = [(0, 0, 10, 10), (12, 0, 20, 10)]
+    assert merge_regions(rects, SCREEN, grab_cost=1000) == [(0, 0, 20, 10)]
+
+def test_merge_regions_keeps_distant_rects():
+    rects = [(0, 0, 10, 10), (500, 500, 510, 510)]
+    assert sorted(merge_regions(rects, SCREEN, grab_cost=1000)) == rects
+
+def test_merge_regions_falls_back_to_full_screen():
+    rects = [(0, 0, 1000, 500), (0, 501, 1000, 1000)]
+    assert merge_regions(rects, SCREEN, grab_cost=1000) == [SCREEN]
+
+def test_merge_regions_single_rect():
+    assert merge_regions([[5, 5, 50, 50]], SCREEN, grab_cost=1000) == [(5, 5, 50, 50)]
+
+def make_registry(elements, scenes, overlays=None):
+    """
+    不经过SceneManager构建注册表
+
+    参数:
+        elements: [(名称, 检查耗时), ...]，编号按顺序
+        scenes: [(场景, 需要的元素, 不能出现的元素), ...]，靠前的场景优先
+        overlays: {场景: [可能弹出在其上的场景, ...]}
+    """
+    registry = SceneRegistry.__new__(SceneRegistry)
+    registry.elements = [SceneElement(name, bit, None, None, None, None, 0.7, cost)
+                         for bit, (name, cost) in enumerate(elements)]
+    registry.by_name = {e.name: e for e in registry.elements}
+    registry.scenes = [scene for scene, _, _ in scenes]
+
+    def mask(names):
+        return sum(1 << registry.by_name[n].bit for n in names)
+
+    registry.required = np.array([mask(req) for _, req, _ in scenes], dtype=np.uint64)
+    registry.forbidden = np.array([mask(forb) for _, _, forb in scenes], dtype=np.uint64)
+    registry.order = sorted(registry.elements, key=lambda e: e.cost)
+    registry.set_overlays(overlays or {})
+    return registry
+
+ELEMENTS = [("mainline", 3), ("inter", 1), ("skip", 2), ("pause", 4)]
+SCENES = [
+    (Scene.PAUSE, ["pause"], []),
+    (Scene.INTERACTION, ["mainline", "inter"], []),
+    (Scene.MAINLINE, ["mainline"], ["skip"]),
+    (Scene.DIALOGUE, ["skip"], []),
+]
+# PAUSE可能弹出在其余场景之上
+OVERLAYS = {scene: [Scene.PAUSE] for scene, _, _ in SCENES[1:]}
+
+def checker(detected, calls):
+    def check(element):
+        calls.append(element.name)
+        return element.name in detected
+    return check
+
+def bits(registry, names):
+    return sum(1 << registry.by_name[n].bit for n in names)
+
+def consistent(registry, detected):
+    """检测结果中同时匹配的场景是否都互在对方的排除范围内"""
+    value = np.uint64(bits(registry, detected))
+    ok = np.flatnonzero(((registry.required & value) == registry.required) & ((registry.forbidden & value) == 0))
+    return all(j in registry.conflicts[i] for i in ok for j in ok if j < i)
+
+def test_select_prefers_earlier_scene():
+    registry = make_registry(ELEMENTS, SCENES)
+    assert registry.select(bits(registry, ["mainline", "inter", "pause"])) == Scene.PAUSE
+    assert registry.select(bits(registry, ["mainline", "inter"])) == Scene.INTERACTION
+    assert registry.select(bits(registry, ["mainline"])) == Scene.MAINLINE
+    # 不能出现的元素被检测到时跳过该场景
+    assert registry.select(bits(registry, ["mainline", "skip"])) == Scene.DIALOGUE
+    assert registry.select(0) == Scene.UNKNOWN
+
+def test_overlays_move_ahead_of_base_scene():
+    scenes = [(Scene.DIALOGUE, ["skip"], []), (Scene.CONFIRM, ["mainline"], [])]
+    registry = make_registry(ELEMENTS, scenes, {Scene.DIALOGUE: [Scene.CONFIRM]})
+    assert registry.scenes == [Scene.CONFIRM, Scene.DIALOGUE]
+    assert list(registry.conflicts[1]) == [0]
+    assert registry.select(bits(registry, ["skip", "mainline"])) == Scene.CONFIRM
+
+def test_overlay_cycle_is_rejected():
+    with pytest.raises(ValueError):
+        make_registry(ELEMENTS, SCENES, {Scene.PAUSE: [Scene.DIALOGUE], Scene.DIALOGUE: [Scene.PAUSE]})
+
+def test_decide_agrees_with_select():
+    registry = make_registry(ELEMENTS, SCENES, OVERLAYS)
+    names = [name for name, _ in ELEMENTS]
+    for n in range(len(names) + 1):
+        for detected in itertools.combinations(names, n):
+            if not consistent(registry, detected):
+                continue
+            calls = []
+            result = registry.decide(checker(detected, calls))
+            assert result == registry.select(bits(registry, detected)), detected
+            assert len(calls) == len(set(calls))
+
+def test_decide_stops_at_first_confirmed_scene():
+    registry = make_registry(ELEMENTS, SCENES, OVERLAYS)
+    calls = []
+    assert registry.decide(checker(["pause"], calls)) == Scene.PAUSE
+    # 按 场景权重之和/耗时 依次检查，pause耗时最高最后检查；pause确认后不需要排除其它场景
+    assert calls == ["inter", "skip", "mainline", "pause"]
+
+    calls = []
+    assert registry.decide(checker(["mainline", "inter"], calls)) == Scene.INTERACTION
+    # skip涉及两个候选场景，先于mainline检查；确认INTERACTION前还需排除弹出在其上的PAUSE
+    assert calls == ["inter", "skip", "mainline", "pause"]
+
+def test_decide_orders_checks_across_scenes():
+    # 12个互不相同的场景，排在最后的场景不需要先逐个排除前面的场景
+    names = [scene.name for scene in Scene if scene != Scene.UNKNOWN]
+    elements = [(name, 10) for name in names[:-1]] + [(names[-1], 1)]
+    scenes = [(Scene[name], [name], []) for name in names]
+    registry = make_registry(elements, scenes)
+    calls = []
+    assert registry.decide(checker([names[-1]], calls)) == Scene[names[-1]]
+    assert calls == [names[-1]]
+
+    # 权重高的场景涉及的元素先检查
+    registry.set_weights({names[3]: 50.0})
+    calls = []
+    assert registry.decide(checker([names[3]], calls)) == Scene[names[3]]
+    assert calls == [names[3]]
+
+def test_decide_with_known_elements_keeps_priority():
+    registry = make_registry(ELEMENTS, SCENES, OVERLAYS)
+    # 快速路径已确定mainline存在、skip不存在，弹出在其上的PAUSE仍需检查
+    known = bits(registry, ["mainline", "skip"])
+    detected = bits(registry, ["mainline"])
+    calls = []
+    assert registry.decide(checker(["mainline", "pause"], calls), known, detected) == Scene.PAUSE
+    assert "pause" in calls and "mainline" not in calls and "skip" not in calls
+
+def test_try_scene_stops_on_contradiction():
+    registry = make_registry(ELEMENTS, SCENES)
+    calls = []
+    matched, known, detected = registry.try_scene(Scene.INTERACTION, checker(["mainline"], calls), 0, 0)
+    assert not matched
+    assert calls == ["inter"]
+    assert known == bits(registry, ["inter"]) and detected == 0
+
+    calls = []
+    matched, known, detected = registry.try_scene(Scene.MAINLINE, checker(["mainline"], calls), 0, 0)
+    assert matched
+    # 排在前面、同样需要mainline的INTERACTION需要排除
+    assert calls == ["skip", "mainline", "inter"]
+    assert detected == bits(registry, ["mainline"])
+
+def make_game_registry():
+    """与BrownDust2相同的场景顺序和弹出场景，每个场景一个元素"""
+    names = ["mainline", "skip", "skipChat", "war", "exit", "confirm", "autoMove", "pause"]
+    scenes = [(Scene.MAINLINE, ["mainline"], []), (Scene.DIALOGUE, ["skip"], []),
+              (Scene.DEEP_DIALOGUE, ["skipChat"], []), (Scene.BATTLE, ["war"], []),
+              (Scene.BATTLE_END, ["exit"], []), (Scene.CONFIRM, ["confirm"], []),
+              (Scene.AUTOMOVE, ["autoMove"], []), (Scene.PAUSE, ["pause"], [])]
+    overlays = {scene: [Scene.CONFIRM] for scene, _, _ in scenes if scene != Scene.CONFIRM}
+    return make_registry([(name, 1) for name in names], scenes, overlays)
+
+def test_try_scene_transition_hit_checks_only_overlays():
+    registry = make_game_registry()
+    # battle -> battle_end：只检查exit和弹出在其上的confirm，不检查排在前面的mainline、skip等
+    calls = []
+    matched, _, _ = registry.try_scene(Scene.BATTLE_END, checker(["exit"], calls), 0, 0)
+    assert matched
+    assert calls == ["exit", "confirm"]
+
+    # dialogue -> confirm：确认框没有弹出场景，一次匹配
+    calls = []
+    matched, _, _ = registry.try_scene(Scene.CONFIRM, checker(["skip", "confirm"], calls), 0, 0)
+    assert matched
+    assert calls == ["confirm"]
+
+def test_try_scene_rejects_scene_under_overlay():
+    registry = make_game_registry()
+    calls = []
+    matched, known, detected = registry.try_scene(Scene.DIALOGUE, checker(["skip", "confirm"], calls), 0, 0)
+    assert not matched
+    assert calls == ["skip", "confirm"]
+    # 已检查的结果交给decide复用，不再重复匹配
+    assert registry.decide(checker(["skip", "confirm"], calls), known, detected) == Scene.CONFIRM
+    assert calls == ["skip", "confirm"]
@@ -0,0 +1,81 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+import Clock
+import DeviceBackend
+import ImageProc
+import RaphaelScriptHelper as rsh
+import SessionRecorder
+import settings as st
+
+def make_screen():
+    """噪声背景的画面和从(200, 100)处截取的模板"""
+    rng = np.random.default_rng(0)
+    screen = cv2.GaussianBlur(rng.integers(0, 255, (300, 400, 3), dtype=np.uint8), (3, 3), 0)
+    return screen, np.ascontiguousarray(screen[100:140, 200:260])
+
+@pytest.fixture
+def session(image_state, monkeypatch):
+    """录制一段脚本：先学到位置先验，再在FakeBackend上查找、点击并延时，返回(会话目录, 模板路径, 录制结果, 录制时的状态)"""
+    monkeypatch.setattr(st, "usePrior", True)
+    monkeypatch.setattr(st, "multiScale", False)
+    monkeypatch.setattr(rsh, "_backendKey", None)
+    monkeypatch.setattr(Clock, "current", Clock.current)
+    screen, template = make_screen()
+    path = str(image_state / "t.png")
+    cv2.imwrite(path, template)
+    ImageProc.locate(screen, path, 0.9)
+    state = ImageProc.snapshotState()
+
+    inner = DeviceBackend.create("fake", screen=screen)
+    recorder = SessionRecorder.record(inner, str(image_state / "session"), seed=7)
+    monkeypatch.setattr(rsh, "backend", recorder)
+    result = script(path)
+    recorder.close()
+    return recorder.path, path, (result, inner.actions), state
+
+def script(path):
+    pos = rsh.find_pic(path, returnCenter=True)
+    rsh.touch(pos)
+    rsh.delay(0.01)
+    return pos, rsh.find_pic(path)
+
+def test_replay_reproduces_recorded_results(session, monkeypatch):
+    path, target, (result, actions), _ = session
+    replay = SessionRecorder.replay(path)
+    monkeypatch.setattr(rsh, "backend", replay)
+    try:
+        assert script(target) == result
+        assert replay.actions == actions
+        assert replay.now == pytest.approx(0.01)
+        replay.verify()
+        with pytest.raises(SessionRecorder.ReplayFinished):
+            rsh.screenshot()
+    finally:
+        replay.close()
+
+def test_replay_detects_different_input(session, monkeypatch):
+    path, target, _, _ = session
+    replay = SessionRecorder.replay(path)
+    monkeypatch.setattr(rsh, "backend", replay)
+    try:
+        pos = rsh.find_pic(target, returnCenter=True)
+        with pytest.raises(SessionRecorder.ReplayMismatch):
+            replay.touch((pos[0] + 100, pos[1]))
+    finally:
+        replay.close()
+
+def test_replay_uses_recorded_state_and_restores(session):
+    path, _, _, recorded = session
+    local = {"priors": {}, "scales": {"fake|t": 1.25}, "thresholds": {}}
+    ImageProc.useState(local, persist=True)
+    replay = SessionRecorder.replay(path)
+    try:
+        # 回放期间使用录制时的位置先验快照，不写入本机的文件
+        assert ImageProc.snapshotState() == recorded
+        assert not ImageProc._persist
+    finally:
+        replay.close()
+    assert ImageProc.snapshotState() == local
+    assert ImageProc._persist
@@ -0,0 +1,35 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+import ImageProc
+
+def make_screen():
+    """200x100的黑色画面，(150, 50)处为红点"""
+    screen = np.zeros((100, 200, 3), np.uint8)
+    screen[50, 150] = (0, 0, 255)
+    return screen
+
+def test_relative_probes_follow_screen_size():
+    screen = make_screen()
+    signature = [(0.75, 0.5, (0, 0, 255), 10), (10, 10, (0, 0, 0), 10)]
+    assert ImageProc.resolveSignature(signature, (200, 100)) == [(150, 50, (0, 0, 255), 10), (10, 10, (0, 0, 0), 10)]
+    assert ImageProc.matchSignature(screen, signature)
+    # 同一签名在两倍分辨率的画面上落在(300, 100)
+    big = np.zeros((200, 400, 3), np.uint8)
+    big[100, 300] = (0, 0, 250)
+    assert ImageProc.matchSignature(big, signature)
+    assert not ImageProc.matchSignature(screen, [(0.75, 0.5, (0, 0, 200), 10)])
+
+def test_relative_probe_at_edge_is_clamped():
+    screen = make_screen()
+    screen[99, 199] = (255, 255, 255)
+    assert ImageProc.matchSignature(screen, [(1.0, 1.0, (255, 255, 255), 0)])
+
+def test_relative_probes_on_region_use_full_size():
+    screen = make_screen()
+    signature = [(0.75, 0.5, (0, 0, 255), 10)]
+    region = screen[40:60, 140:160]
+    # 局部区域需给定整屏尺寸，否则相对坐标按区域尺寸换算
+    assert ImageProc.matchSignature(region, signature, offset=(140, 40), size=(200, 100))
+    assert not ImageProc.matchSignature(region, signature, offset=(140, 40))
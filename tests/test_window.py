@@ -0,0 +1,84 @@
+import pytest
+from window import FakeWindowProvider, GameWindow, WindowNotFound
+
+TITLE = "BrownDust II"
+
+def test_lookup_matches_title_substring():
+    provider = FakeWindowProvider({"BrownDust II (DX11)": (100, 50, 2560, 1440)})
+    window = GameWindow(TITLE, provider)
+    assert window.geometry() == (100, 50, 2560, 1440)
+    assert window.size() == (2560, 1440)
+    assert window.to_screen(10, 20) == (110, 70)
+    # 位置缓存后不再查询
+    window.geometry()
+    assert provider.queries == 1
+
+def test_lookup_missing_window():
+    window = GameWindow(TITLE, FakeWindowProvider({"Notepad": (0, 0, 800, 600)}))
+    with pytest.raises(WindowNotFound):
+        window.geometry()
+
+def test_refresh_picks_up_resize():
+    provider = FakeWindowProvider({TITLE: (100, 50, 2560, 1440)})
+    window = GameWindow(TITLE, provider)
+    window.geometry()
+    provider.windows[TITLE] = (0, 0, 1280, 720)
+    # 缓存的位置在refresh之前不变
+    assert window.size() == (2560, 1440)
+    assert window.refresh() == (0, 0, 1280, 720)
+    assert provider.queries == 2
+
+@pytest.fixture
+def make_manager(tmp_path, monkeypatch):
+    """创建使用fake后端和模拟窗口的SceneManager，缓存写入临时目录"""
+    pytest.importorskip("numpy")
+    pytest.importorskip("cv2")
+    import DeviceBackend
+    import settings as st
+    import scene_config
+    monkeypatch.setattr(st, "cache_path", str(tmp_path) + "/")
+    monkeypatch.setattr(scene_config.Config, "TRANSITION_PATH", str(tmp_path / "transitions.json"))
+
+    def make(provider):
+        # 屏幕足够大，窗口移动后截图不会失败，只能靠连续无法识别时重新查询
+        backend = DeviceBackend.create("fake", size=(3840, 2160))
+        return scene_config.SceneManager(backend=backend, window=GameWindow(TITLE, provider))
+    return make
+
+def test_manager_refresh_window_on_resize(make_manager):
+    provider = FakeWindowProvider({TITLE: (100, 50, 2560, 1440)})
+    manager = make_manager(provider)
+    assert manager.get_screen_rect() == (100, 50, 2560, 1440)
+    manager.templates["stale"] = object()
+    provider.windows[TITLE] = (100, 50, 1280, 720)
+    assert manager.refresh_window()
+    assert manager.get_screen_size() == (1280, 720)
+    # 分辨率变化后按旧分辨率读取的模板不再使用
+    assert manager.templates == {}
+    # 位置未变化
+    assert not manager.refresh_window()
+
+def test_manager_rechecks_window_after_unknown_cycles(make_manager):
+    import scene_config
+    provider = FakeWindowProvider({TITLE: (0, 0, 2560, 1440)})
+    manager = make_manager(provider)
+    manager.get_screen_rect()
+    provider.windows[TITLE] = (300, 200, 2560, 1440)
+    for _ in range(scene_config.Config.WINDOW_RECHECK_UNKNOWN - 1):
+        assert manager.identify_scene() == scene_config.Scene.UNKNOWN
+    assert manager.get_screen_rect() == (0, 0, 2560, 1440)
+    manager.identify_scene()
+    assert manager.get_screen_rect() == (300, 200, 2560, 1440)
+
+def test_manager_retries_window_missing_at_startup(make_manager):
+    import scene_config
+    provider = FakeWindowProvider()
+    manager = make_manager(provider)
+    # 启动时找不到窗口：暂时使用整个屏幕，但保留窗口以便之后重新查询
+    assert manager.get_screen_rect() == (0, 0, 3840, 2160)
+    assert manager.window is not None
+    assert not manager.refresh_window()
+    provider.windows[TITLE] = (100, 50, 2560, 1440)
+    for _ in range(scene_config.Config.WINDOW_RECHECK_UNKNOWN):
+        manager.identify_scene()
+    assert manager.get_screen_rect() == (100, 50, 2560, 1440)